@@ -17,7 +17,10 @@
 # Tim Fischer <fischeti@iis.ee.ethz.ch>
 
 import os
+import sys
 import argparse
+import hashlib
+from array import array
 
 # Parse arguments.
 parser = argparse.ArgumentParser(description="Generate thestral_bootrom.sv")
@@ -43,59 +46,226 @@ parser.add_argument(
 parser.add_argument("--arm-rom",
                     action="store_true",
                     help="Generate am Arm ROM code file.")
+parser.add_argument(
+    "--sv-output",
+    metavar="FILE",
+    default="-",
+    help="Write the SystemVerilog module to FILE instead of stdout.")
+parser.add_argument(
+    "--arm-rom-output",
+    metavar="FILE",
+    default="-",
+    help="Write the Arm ROM code file to FILE instead of stdout.")
+parser.add_argument(
+    "--dedup",
+    action="store_true",
+    help=
+    "Share one case item between the words with the same value and leave the zero words to the default item"
+)
+parser.add_argument("--hex",
+                    metavar="FILE",
+                    help="Generate a $readmemh file with one word per line.")
+parser.add_argument(
+    "--mem",
+    metavar="FILE",
+    help="Generate a Verilog .mem file with the word address of each word.")
+parser.add_argument(
+    "--c-array",
+    metavar="FILE",
+    help=
+    "Generate a C array of the words for Verilator, named after the SystemVerilog module (bootrom by default)"
+)
+parser.add_argument(
+    "--stamp",
+    metavar="FILE",
+    help=
+    "Record a hash of the inputs in FILE and do nothing if it did not change since the last run"
+)
 args = parser.parse_args()
 
+HEADER = "AUTOMATICALLY GENERATED by {}; edit the script instead.".format(
+    os.path.basename(__file__))
+
+
 # Read the bootrom binary.
-with open(args.BINARY, "rb") as file:
-    binary = file.read()
+def read_words(path, pad):
+    """
+    Read the binary once into a buffer padded to its final size, and view it as
+    little-endian 32-bit words without copying it.
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+
+        # Calculate length of bootrom.
+        # Fill up the binary with zeroes to the next power of two.
+        length = 8
+        while length < max(size, pad):
+            length *= 2
+
+        binary = bytearray(length)
+        view = memoryview(binary)
+        read = 0
+        while read < size:
+            count = file.readinto(view[read:size])
+            if not count:
+                break
+            read += count
 
-# Calculate length of bootrom.
-# Fill up the binary with zeroes to the next power of two.
-length = 8
-while length < max(len(binary), args.pad):
-    length *= 2
+    typecode = next(code for code in "IL" if array(code).itemsize == 4)
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    words = array(typecode, binary)
+    words.byteswap()
+    return words
 
-binary += b"\0" * (length - len(binary))
 
+def get_stamp(words):
+    """
+    Hash the script, its arguments and the words of the binary.
+    """
+    digest = hashlib.sha256()
+    with open(__file__, "rb") as file:
+        digest.update(file.read())
+    digest.update(repr(sorted(vars(args).items())).encode())
+    digest.update(words)
+    return digest.hexdigest()
 
-# Generate the words to be emitted.
-def chunks(seq, size):
-    return (seq[pos:pos + size] for pos in range(0, len(seq), size))
 
+def is_up_to_date(stamp):
+    """
+    Check if the stamp file has the same hash and all the outputs are files that exist.
+    """
+    outputs = [
+        args.sv_module and args.sv_output, args.arm_rom and args.arm_rom_output,
+        args.hex, args.mem, args.c_array
+    ]
+    outputs = [path for path in outputs if path]
+    if "-" in outputs or not all(os.path.isfile(path) for path in outputs):
+        return False
+    try:
+        with open(args.stamp) as file:
+            return file.read().strip() == stamp
+    except FileNotFoundError:
+        return False
 
-def format_word_bin(word):
-    hex = ["{:08b}".format(int(x)) for x in word]
-    return "".join(reversed(hex))
 
+words = read_words(args.BINARY, args.pad)
+num_words = len(words)
 
-def format_word_hex(word):
-    hex = ["{:02x}".format(int(x)) for x in word]
-    hex += ["00"] * (4 - len(word))
-    return "".join(reversed(hex))
+if args.stamp:
+    stamp = get_stamp(words)
+    if is_up_to_date(stamp):
+        sys.exit(0)
+module_name = args.sv_module or "bootrom"
 
+# Generate the words to be emitted, in one pass for every requested output.
+arm_rom = [] if args.arm_rom else None
+hex_words = [] if args.hex else None
+mem_words = [] if args.mem else None
+c_words = [] if args.c_array else None
+sv_words = [] if args.sv_module and not args.dedup else None
+sv_addresses = {} if args.sv_module and args.dedup else None
 
-def format_arm_rom(binary):
-    words = list(enumerate(chunks(binary, 4)))
-    return "\n".join(("{}".format(format_word_bin(x)) for i, x in words))
+for i, word in enumerate(words):
+    if arm_rom is not None:
+        arm_rom.append("{:032b}".format(word))
+    if hex_words is not None:
+        hex_words.append("{:08x}".format(word))
+    if mem_words is not None:
+        mem_words.append("@{:08x} {:08x}".format(i, word))
+    if c_words is not None:
+        c_words.append("0x{:08x}".format(word))
+    if sv_words is not None:
+        sv_words.append("{:03}: data_o = 32'h{:08x} /* 0x{:04x} */".format(
+            i, word, i * 4))
+    if sv_addresses is not None and word:
+        sv_addresses.setdefault(word, []).append("{:03}".format(i))
 
+if sv_addresses is not None:
+    sv_words = [
+        "{}: data_o = 32'h{:08x}".format(", ".join(addresses), word)
+        for word, addresses in sv_addresses.items()
+    ]
 
-def format_binary(binary):
-    words = list(enumerate(chunks(binary, 4)))
-    num_words = len(words)
-    return num_words, ";\n            ".join(
-        ("{:03}: data_o = 32'h{} /* 0x{:04x} */".format(
-            i, format_word_hex(x), i * 4) for i, x in words))
+
+def get_generated_hash_path(path):
+    """
+    Get the file holding the hash of the text last generated for path, in the folder of
+    the stamp.
+    """
+    key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(os.path.dirname(os.path.abspath(args.stamp)),
+                        ".generated-hashes", key)
+
+
+def write_output(path, text):
+    """
+    Print the text, or write it to path unless the file already has the same content,
+    so its timestamp does not trigger rebuilds. "make format" reformats the
+    SystemVerilog once generated, so with --stamp the hash of the text last generated
+    for path is also kept to compare with.
+    """
+    if path == "-":
+        print(text)
+        return
+    text += "\n"
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    hash_path = get_generated_hash_path(path) if args.stamp else None
+    try:
+        with open(path) as file:
+            up_to_date = file.read() == text
+        if not up_to_date and hash_path:
+            with open(hash_path) as file:
+                up_to_date = file.read() == digest
+    except FileNotFoundError:
+        up_to_date = False
+
+    if not up_to_date:
+        with open(path, "w") as file:
+            file.write(text)
+    if hash_path:
+        os.makedirs(os.path.dirname(hash_path), exist_ok=True)
+        with open(hash_path, "w") as file:
+            file.write(digest)
+
+
+def format_c_array(name, c_words):
+    return """
+// {header}
+
+#include <stdint.h>
+
+#define {macro}_NUM_WORDS {num_words}
+
+const uint32_t {name}[{macro}_NUM_WORDS] = {{
+{words}
+}};
+    """.strip().format(
+        header=HEADER,
+        macro=name.upper(),
+        name=name,
+        num_words=len(c_words),
+        words="\n".join("    " + ", ".join(c_words[pos:pos + 4]) + ","
+                        for pos in range(0, len(c_words), 4)),
+    )
 
 
 if args.arm_rom:
-    words = format_arm_rom(binary)
-    print(words)
+    write_output(args.arm_rom_output, "\n".join(arm_rom))
 
-if args.sv_module:
-    num_words, words = format_binary(binary)
+if args.hex:
+    write_output(args.hex, "\n".join(hex_words))
+
+if args.mem:
+    write_output(args.mem, "\n".join(mem_words))
 
+if args.c_array:
+    write_output(args.c_array, format_c_array(module_name, c_words))
+
+if args.sv_module:
     # Emit the code.
-    print("""
+    write_output(
+        args.sv_output, """
 // Copyright 2022 ETH Zurich and University of Bologna.
 // Solderpad Hardware License, Version 0.51, see LICENSE for details.
 // SPDX-License-Identifier: SHL-0.51
@@ -107,7 +277,7 @@ if args.sv_module:
 // Paul Scheffler <paulsc@iis.ee.ethz.ch>
 // Wolfgang Roenninger <wroennin@iis.ee.ethz.ch>
 //
-// AUTOMATICALLY GENERATED by {script}; edit the script instead.
+// {header}
 
 module {module_name} #(
     parameter int unsigned AddrWidth = 32,
@@ -132,8 +302,7 @@ module {module_name} #(
     always_comb begin
         data_o = '0;
         unique case (word)
-        {words};
-            default: data_o = '0;
+        {words}default: data_o = '0;
         endcase
     end
           
@@ -143,8 +312,13 @@ module {module_name} #(
           
 endmodule
     """.strip().format(
-        script=os.path.basename(__file__),
-        module_name=args.sv_module,
-        num_words=num_words,
-        words=words,
-    ))
+            header=HEADER,
+            module_name=args.sv_module,
+            num_words=num_words,
+            words="".join(word + ";\n            " for word in sv_words),
+        ))
+
+if args.stamp:
+    os.makedirs(os.path.dirname(os.path.abspath(args.stamp)), exist_ok=True)
+    with open(args.stamp, "w") as file:
+        file.write(stamp + "\n")
@@ -9,21 +9,40 @@ PERIPHERAL_NAME=soc_ctrl
 
 REG_DIR=$(dirname -- $0)
 ROOT="$(dirname -- $0)/../../.."
-REGTOOL=$ROOT/hw/vendor/pulp_platform/register_interface/vendor/lowrisc_opentitan/util/regtool.py
+REGGEN_DIR=$ROOT/hw/vendor/pulp_platform/register_interface/vendor/lowrisc_opentitan/util/reggen
+REGTOOL_CACHED=$ROOT/util/regtool_cached.py
 PERIPH_STRUCTS_GEN=$ROOT/util/periph_structs_gen/periph_structs_gen.py
 HJSON_FILE=$REG_DIR/data/$PERIPHERAL_NAME.hjson
 TEMPLATE_FILE=$ROOT/util/periph_structs_gen/periph_structs.tpl
 RTL_DIR=$REG_DIR/rtl
 SW_DIR=$ROOT/sw/device/lib/drivers/$PERIPHERAL_NAME
-
-mkdir -p $RTL_DIR $SW_DIR
-
-printf -- "Generating $PERIPHERAL_NAME registers RTL..."
-$REGTOOL -r -t $RTL_DIR $HJSON_FILE
-[ $? -eq 0 ] && printf " OK\n" || exit $?
-
-printf -- "Generating $PERIPHERAL_NAME software header..."
-$REGTOOL --cdefines -o ${SW_DIR}/${PERIPHERAL_NAME}_regs.h $HJSON_FILE
+STAMP_FILE=$ROOT/build/.$PERIPHERAL_NAME-gen-stamp
+
+OUTPUT_FILES="$RTL_DIR/${PERIPHERAL_NAME}_reg_pkg.sv $RTL_DIR/${PERIPHERAL_NAME}_reg_top.sv
+              ${SW_DIR}/${PERIPHERAL_NAME}_regs.h ${SW_DIR}/${PERIPHERAL_NAME}_structs.h
+              ${SW_DIR}/${PERIPHERAL_NAME}_regs.md"
+
+# Skip the generation if none of the inputs changed since the last one
+INPUTS_HASH=$(cat $0 $HJSON_FILE $TEMPLATE_FILE $PERIPH_STRUCTS_GEN $REGTOOL_CACHED \
+              $(find $REGGEN_DIR -type f -not -name '*.pyc' | sort) | sha256sum | cut -d ' ' -f 1)
+UP_TO_DATE=1
+for OUTPUT_FILE in $OUTPUT_FILES; do
+    [ -f $OUTPUT_FILE ] || UP_TO_DATE=0
+done
+if [ $UP_TO_DATE -eq 1 ] && [ "$(cat $STAMP_FILE 2> /dev/null)" = "$INPUTS_HASH" ]; then
+    printf -- "$PERIPHERAL_NAME registers are up to date\n"
+    exit 0
+fi
+
+mkdir -p $RTL_DIR $SW_DIR $(dirname -- $STAMP_FILE)
+
+# The outputs are only written when their content changes, so their timestamps do not
+#   trigger rebuilds. The hjson is parsed once and cached for periph_structs_gen.py.
+printf -- "Generating $PERIPHERAL_NAME registers RTL, software header and documentation..."
+python $REGTOOL_CACHED --rtl $RTL_DIR \
+                       --cdefines ${SW_DIR}/${PERIPHERAL_NAME}_regs.h \
+                       --doc ${SW_DIR}/${PERIPHERAL_NAME}_regs.md \
+                       $HJSON_FILE
 [ $? -eq 0 ] && printf " OK\n" || exit $?
 
 printf -- "Generating $PERIPHERAL_NAME software header structs..."
@@ -32,7 +51,4 @@ python $PERIPH_STRUCTS_GEN --template_filename $TEMPLATE_FILE \
                            --output_filename ${SW_DIR}/${PERIPHERAL_NAME}_structs.h
 [ $? -eq 0 ] && printf " OK\n" || exit $?
 
-printf -- "Generating $PERIPHERAL_NAME documentation..."
-$REGTOOL -d $HJSON_FILE > ${SW_DIR}/${PERIPHERAL_NAME}_regs.md
-[ $? -eq 0 ] && printf " OK\n" || exit $?
-
+echo $INPUTS_HASH > $STAMP_FILE
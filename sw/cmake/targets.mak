@@ -15,19 +15,19 @@
 
 # Author: Jose Miranda, Juan Sapriza (jose.mirandacalero / juan.sapriza @epfl.ch)
 
-build : build/Makefile
+build : ${SW_BUILD_DIR}/Makefile
 	@echo Build 
-	${MAKE} -s -C build
-	@cp build/main.elf build/main.spm.elf
+	${MAKE} -s -C ${SW_BUILD_DIR}
+	@cp ${SW_BUILD_DIR}/main.elf ${SW_BUILD_DIR}/main.spm.elf
 
-setup : build/Makefile
+setup : ${SW_BUILD_DIR}/Makefile
 
-build/Makefile : CMakeLists.txt ${CMAKE_DIR}/riscv.cmake
-	@if [ ! -d build ] ; then mkdir build ; fi
-	@cd build;  \
+${SW_BUILD_DIR}/Makefile : CMakeLists.txt ${CMAKE_DIR}/riscv.cmake
+	@mkdir -p ${SW_BUILD_DIR}
+	@cd ${SW_BUILD_DIR};  \
 		${CMAKE} \
 		    -G "Unix Makefiles" \
-			-DCMAKE_TOOLCHAIN_FILE=../${CMAKE_DIR}/riscv.cmake \
+			-DCMAKE_TOOLCHAIN_FILE=${mkfile_path}/${CMAKE_DIR}/riscv.cmake \
 			-DROOT_PROJECT=${ROOT_PROJECT} \
 			-DSOURCE_PATH=${SOURCE_PATH} \
 			-DTARGET=${TARGET} \
@@ -40,10 +40,10 @@ build/Makefile : CMakeLists.txt ${CMAKE_DIR}/riscv.cmake
 			-DCOMPILER_FLAGS:STRING=${COMPILER_FLAGS}\
 			-DCLANG_LINKER_USE_LD:BOOL=${CLANG_LINKER_USE_LD}\
 			-DVERBOSE:STRING=${VERBOSE} \
-		    ../ 
+		    ${mkfile_path} 
 
 clean:
-	rm -rf build
+	rm -rf ${SW_BUILD_DIR}
 
 .PHONY: setup build
 .SUFFIXES:
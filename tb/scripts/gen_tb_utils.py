@@ -1,24 +1,92 @@
 # Generate tb_util.svh with the correct number of sets for the LLC
 # starting from a mako template.
+# With --sweep, one tb_util.svh is generated for every combination of the given template
+# values, each one in a folder named after the hash of its content.
+# Note: tb/src/verilator/tb_util.svh.tpl is still the Cheshire template (cheshire_pkg,
+# i_cheshire_soc), so its output does not match tb/src/verilator/tb_util.svh and cannot
+# be built with the x-alp testharness.
+import argparse
+import hashlib
+import itertools
+import json
+import os
 import pathlib
 import re
-import argparse
 from mako.template import Template
 
 # Compile a regex to trim trailing whitespaces on lines
 re_trailws = re.compile(r'[ \t\r]+$', re.MULTILINE)
 
+# Folder of the compiled Mako templates, reused as long as the template does not change
+MAKO_CACHE_DIR = '~/.cache/xalp/mako'
+
+def load_template(tpl_path, module_directory=MAKO_CACHE_DIR):
+    tpl_path = pathlib.Path(tpl_path).absolute()
+    if not tpl_path.exists():
+        raise FileNotFoundError(f'Template file {tpl_path} not found')
+    if module_directory is not None:
+        module_directory = os.path.expanduser(module_directory)
+    return Template(filename=str(tpl_path), module_directory=module_directory)
+
+def render_template(tpl, **kwargs):
+    code = tpl.render_unicode(**kwargs)
+    return re_trailws.sub('', code)
+
 def write_template(tpl_path, outdir, **kwargs):
     if tpl_path is not None:
-        tpl_path = pathlib.Path(tpl_path).absolute()
-        if tpl_path.exists():
-            tpl = Template(filename=str(tpl_path))
-            with open(outdir / tpl_path.with_suffix("").name, 'w', encoding='utf-8') as f:
-                code = tpl.render_unicode(**kwargs)
-                code = re_trailws.sub('', code)
+        tpl = load_template(tpl_path)
+        with open(outdir / pathlib.Path(tpl_path).with_suffix("").name, 'w', encoding='utf-8') as f:
+            f.write(render_template(tpl, **kwargs))
+
+def parse_sweep(sweep):
+    """
+    Parse a "Name=Value1,Value2,..." sweep. Integer values are converted to int.
+    """
+    name, sep, values = sweep.partition('=')
+    if not sep or not name or not values:
+        raise ValueError(f'Sweep {sweep!r} is not of the form Name=Value1,Value2,...')
+    return name, [int(value) if value.lstrip('-').isdigit() else value
+                  for value in values.split(',')]
+
+def sweep_template(tpl_path, outdir, sweeps, **kwargs):
+    """
+    Render the template for every combination of the values of sweeps, each one in the
+    folder outdir/cfg-<hash of the rendered file>. Existing folders are left untouched, so
+    their files keep their modification time. The list of configurations is written to
+    outdir/sweep.json.
+
+    :param sweeps: List of (name, values) tuples of the template arguments to sweep.
+    :param kwargs: Template arguments shared by every configuration.
+
+    :return: The list of configurations, as dicts with the template arguments (kwargs) and
+        the folder (dir).
+    """
+    tpl = load_template(tpl_path)
+    out_name = pathlib.Path(tpl_path).with_suffix("").name
+    names = [name for name, _ in sweeps]
+
+    configs = []
+    for values in itertools.product(*(values for _, values in sweeps)):
+        config_kwargs = dict(kwargs, **dict(zip(names, values)))
+        code = render_template(tpl, **config_kwargs)
+        digest = hashlib.sha256(code.encode('utf-8')).hexdigest()[:16]
+        config_dir = outdir / f'cfg-{digest}'
+
+        out_path = config_dir / out_name
+        if not out_path.exists():
+            config_dir.mkdir(parents=True, exist_ok=True)
+            # Write a temporary file first, so a concurrent sweep never sees a partial one
+            tmp_path = config_dir / f'.{out_name}.{os.getpid()}'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 f.write(code)
-        else:
-            raise FileNotFoundError(f'Template file {tpl_path} not found')
+            os.replace(tmp_path, out_path)
+
+        configs.append({'kwargs': config_kwargs, 'dir': str(config_dir)})
+
+    with open(outdir / 'sweep.json', 'w', encoding='utf-8') as f:
+        json.dump(configs, f, indent=2)
+        f.write('\n')
+    return configs
 
 def main():
   parser = argparse.ArgumentParser(description="Generate tb_util.svh")
@@ -37,6 +105,12 @@ def main():
                       type=pathlib.Path,
                       required=True,
                       help='Output directory')
+  parser.add_argument('--sweep',
+                      metavar='NAME=V1,V2,...',
+                      action='append',
+                      default=[],
+                      help='Template argument to sweep (e.g., LlcSetAssoc=1,2,4,8). '
+                      'Every combination of the sweeps is generated in its own folder')
   args = parser.parse_args()
 
 
@@ -44,10 +118,21 @@ def main():
       'LlcSetAssoc': args.sets_assoc
   }
 
+  if args.sweep:
+    if args.tpl_sv is None:
+      parser.error('--sweep requires --tpl-sv')
+    try:
+      sweeps = [parse_sweep(sweep) for sweep in args.sweep]
+    except ValueError as e:
+      parser.error(str(e))
+    for config in sweep_template(args.tpl_sv, args.outdir, sweeps, **kwargs):
+      print(config['dir'], ' '.join(f'{k}={v}' for k, v in config['kwargs'].items()))
+    return
+
   # Generate SystemVerilog package
   if args.tpl_sv is not None:
     write_template(args.tpl_sv, args.outdir, **kwargs)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -4,6 +4,7 @@
 
 import os
 import subprocess
+import time
 
 from simulator import SimResult
 from bcolors import BColors
@@ -31,6 +32,22 @@ class Application:
         # indicating the result of the simulation.
         self.simulation_results: dict = {}
 
+        # Build folder used for each compiler. Key is the compiler and value is the folder
+        # holding the generated ELF. Empty when the app is built in the default sw/build.
+        self.build_dirs: dict = {}
+
+        # Fingerprint of the inputs of the build with each compiler. Key is the compiler and
+        # value is the hash of the sources and configuration the app is built from.
+        self.fingerprints: dict = {}
+
+        # Compilation wall time with each compiler. Key is the compiler and value is the time in
+        # seconds, including restoring the app from the cache.
+        self.compile_times: dict = {}
+
+        # Metrics of the simulation with each simulator. Key is the simulator and value is a
+        # dict with the wall time in seconds and the simulated cycles (None if unknown).
+        self.simulation_metrics: dict = {}
+
     def set_compilation_status(self, compiler: str, success: bool):
         """
         Set if the compilation with the compiler was successful or not.
@@ -43,6 +60,43 @@ class Application:
         """
         self.simulation_results[simulator] = result
 
+    def set_fingerprint(self, compiler: str, fingerprint: str):
+        """
+        Set the fingerprint of the inputs of the build with the compiler.
+        """
+        self.fingerprints[compiler] = fingerprint
+
+    def set_compile_time(self, compiler: str, wall_time_s: float):
+        """
+        Set the wall time of the compilation with the compiler.
+        """
+        self.compile_times[compiler] = wall_time_s
+
+    def set_simulation_metrics(self, simulator: str, wall_time_s: float, cycles: int):
+        """
+        Set the wall time and the simulated cycles of the simulation with the simulator.
+        """
+        self.simulation_metrics[simulator] = {
+            "wall_time_s": wall_time_s,
+            "cycles": cycles,
+        }
+
+    def set_build_dir(self, compiler: str, build_dir: str):
+        """
+        Set the folder where the app was built with the compiler.
+        """
+        self.build_dirs[compiler] = build_dir
+
+    def get_binary(self):
+        """
+        Get the ELF to simulate, i.e. the one built by the last compiler. Returns None if the
+        app was built in the default sw/build folder.
+        """
+        if not self.build_dirs:
+            return None
+        last_build_dir = list(self.build_dirs.values())[-1]
+        return os.path.abspath(os.path.join(last_build_dir, "main.spm.elf"))
+
     def compilation_succeeded(self):
         """
         Check if the compilation was successful with every compiler.
@@ -58,6 +112,8 @@ class Application:
         extra_parameters: str,
         dry_run: bool = False,
         verbose: bool = True,
+        build_dir: str = None,
+        elf_cache=None,
     ):
         """
         Compile the application with the compiler and linker. Outputs if it finishes with errors or
@@ -70,6 +126,10 @@ class Application:
         :param str extra_parameters: Extra parameters to pass to the "make app" command.
         :param bool dry_run: If True, only print the compilation command without executing it.
         :param bool verbose: If True, print detailed messages about the compilation process.
+        :param str build_dir: The folder where to build the application. If None, the default
+            sw/build folder is used.
+        :param ElfCache elf_cache: The cache to restore the build from, and to store it in
+            after compiling. If None, the application is always compiled.
 
         :return: True if the compilation succeded and False otherwise.
         """
@@ -91,6 +151,8 @@ class Application:
                 compile_command.append(f"LINKER={linker}")
             if extra_parameters:
                 compile_command.append(extra_parameters)
+            if build_dir:
+                compile_command.append(f"SW_BUILD_DIR={os.path.abspath(build_dir)}")
 
             if dry_run:
                 if verbose:
@@ -103,8 +165,37 @@ class Application:
                     )
                 return True
 
+            start_time = time.monotonic()
+            cache_key = None
+            out_dir = build_dir or os.path.join("sw", "build")
+            if elf_cache:
+                cache_key = elf_cache.get_key(
+                    self.name,
+                    compiler_path,
+                    compiler_prefix,
+                    compiler,
+                    linker,
+                    extra_parameters,
+                )
+                if elf_cache.restore(cache_key, out_dir):
+                    self.set_compile_time(compiler, time.monotonic() - start_time)
+                    if build_dir:
+                        self.set_build_dir(compiler, build_dir)
+                    if verbose:
+                        print(
+                            BColors.OKGREEN
+                            + f"Restored {self.name} with {compiler} ({compiler_prefix}) and linker {linker} from the cache."
+                            + BColors.ENDC,
+                            flush=True,
+                        )
+                    return True
+
             _ = subprocess.run(compile_command, capture_output=True, check=True)
+            self.set_compile_time(compiler, time.monotonic() - start_time)
+            if elf_cache:
+                elf_cache.store(cache_key, out_dir)
         except subprocess.CalledProcessError as exc:
+            self.set_compile_time(compiler, time.monotonic() - start_time)
             print(
                 BColors.FAIL
                 + f"Error compiling {self.name} with {compiler} ({compiler_prefix}) and linker {linker}."
@@ -113,6 +204,8 @@ class Application:
             print(exc.stderr.decode("utf-8"), flush=True)
             return False
         else:
+            if build_dir:
+                self.set_build_dir(compiler, build_dir)
             if verbose:
                 print(
                     BColors.OKGREEN
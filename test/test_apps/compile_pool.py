@@ -0,0 +1,79 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import signal
+
+from application import Application
+
+
+class CompileJob:
+    """
+    Represents the compilation of an application with a compiler. Every job builds
+    into its own folder so that several jobs can run at the same time.
+    """
+
+    def __init__(
+        self,
+        app_name: str,
+        compiler_path: str,
+        compiler_prefix: str,
+        compiler: str,
+        linker: str,
+        build_dir: str,
+    ):
+        """
+        Constructor for CompileJob.
+
+        :param str app_name: The name of the application to compile.
+        :param str compiler_path: The path to the RISC-V compiler toolchain.
+        :param str compiler_prefix: The prefix for the compiler binaries.
+        :param str compiler: The compiler to use (e.g., "gcc" or "clang").
+        :param str linker: The linker to use (e.g., "on_chip").
+        :param str build_dir: The folder where the application is built.
+        """
+        self.app_name = app_name
+        self.compiler_path = compiler_path
+        self.compiler_prefix = compiler_prefix
+        self.compiler = compiler
+        self.linker = linker
+        self.build_dir = build_dir
+
+
+def job_build_dir(jobs_build_dir: str, app_name: str, compiler: str):
+    """
+    Get the folder where a compilation job builds an application.
+    """
+    return os.path.join(jobs_build_dir, f"{app_name}-{compiler}")
+
+
+def run_compile_job(job: CompileJob, dry_run: bool, verbose: bool, elf_cache=None):
+    """
+    Compile the application of a job. Runs in a worker process, so the result is
+    returned instead of being stored in the Application.
+
+    :return: True if the compilation succeeded and False otherwise, and the compilation
+        wall time in seconds (None if unknown).
+    """
+    an_app = Application(job.app_name)
+    success = an_app.compile(
+        job.compiler_path,
+        job.compiler_prefix,
+        job.compiler,
+        job.linker,
+        None,
+        dry_run,
+        verbose=verbose,
+        build_dir=job.build_dir,
+        elf_cache=elf_cache,
+    )
+    return success, an_app.compile_times.get(job.compiler)
+
+
+def init_compile_worker():
+    """
+    Initialize a worker process of the compilation pool. Ctrl-C is left to the main
+    process, which drops the queued jobs and lets the running ones finish.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
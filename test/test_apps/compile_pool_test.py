@@ -0,0 +1,86 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import stat
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from compile_pool import (  # noqa: E402
+    CompileJob,
+    init_compile_worker,
+    job_build_dir,
+    run_compile_job,
+)
+
+# Stand-in for "make app": writes the project and compiler it was called with into the
+# ELF of the SW_BUILD_DIR it was given.
+FAKE_MAKE = """#!/bin/sh
+for arg in "$@"; do
+  case $arg in
+    PROJECT=*) project=${arg#PROJECT=};;
+    COMPILER=*) compiler=${arg#COMPILER=};;
+    SW_BUILD_DIR=*) build_dir=${arg#SW_BUILD_DIR=};;
+  esac
+done
+[ -n "$build_dir" ] || exit 1
+mkdir -p "$build_dir"
+sleep 0.1
+echo "$project $compiler" > "$build_dir/main.elf"
+cp "$build_dir/main.elf" "$build_dir/main.spm.elf"
+"""
+
+
+def test_job_build_dir():
+    jobs_build_dir = os.path.join("sw", "build", "jobs")
+    assert job_build_dir(jobs_build_dir, "hello_world", "gcc") == os.path.join(
+        jobs_build_dir, "hello_world-gcc"
+    )
+    build_dirs = {
+        job_build_dir(jobs_build_dir, app_name, compiler)
+        for app_name in ("hello_world", "matadd")
+        for compiler in ("gcc", "clang")
+    }
+    assert len(build_dirs) == 4
+
+
+def test_compile_jobs_build_in_their_own_folder(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    fake_make = bin_dir / "make"
+    fake_make.write_text(FAKE_MAKE)
+    fake_make.chmod(fake_make.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    jobs_build_dir = tmp_path / "jobs"
+    jobs = [
+        CompileJob(
+            app_name,
+            "",
+            "riscv64-unknown-",
+            compiler,
+            "on_chip",
+            job_build_dir(str(jobs_build_dir), app_name, compiler),
+        )
+        for app_name in ("hello_world", "matadd")
+        for compiler in ("gcc", "clang")
+    ]
+
+    # All the jobs run at the same time, so a shared build folder would be overwritten
+    with ProcessPoolExecutor(
+        max_workers=len(jobs), initializer=init_compile_worker
+    ) as executor:
+        results = list(
+            executor.map(
+                run_compile_job, jobs, [False] * len(jobs), [False] * len(jobs)
+            )
+        )
+
+    for job, (success, compile_time) in zip(jobs, results):
+        assert success
+        assert compile_time is not None
+        with open(os.path.join(job.build_dir, "main.elf")) as elf:
+            assert elf.read() == f"{job.app_name} {job.compiler}\n"
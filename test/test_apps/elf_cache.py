@@ -0,0 +1,226 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import functools
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+# Files of a build that are stored in the cache
+CACHED_FILES = ["main.elf", "main.spm.elf", "main.map"]
+
+# Sources shared by every application. Any change in them invalidates every entry. The
+# Makefiles hold the default build configuration (ARCH, COMPILER_FLAGS, LINKER, ...).
+SHARED_SOURCES = [
+    "Makefile",
+    "sw/Makefile",
+    "sw/device",
+    "sw/linker",
+    "sw/cmake",
+    "sw/CMakeLists.txt",
+]
+
+# Build variables read from the environment by the Makefile
+BUILD_VARIABLES = ["ARCH", "COMPILER_FLAGS", "TARGET", "SOURCE", "RISCV_XALP"]
+
+
+def hash_path(hasher, path: str):
+    """
+    Add the relative path and the content of every file under path to hasher, in a
+    stable order.
+    """
+    if os.path.isfile(path):
+        file_list = [path]
+    else:
+        file_list = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            file_list += [os.path.join(root, name) for name in sorted(files)]
+
+    for file_path in file_list:
+        hasher.update(file_path.encode("utf-8") + b"\0")
+        with open(file_path, "rb") as file:
+            hasher.update(hashlib.sha256(file.read()).digest())
+
+
+@functools.lru_cache(maxsize=None)
+def get_toolchain_version(compiler_prefix: str, compiler: str):
+    """
+    Get the version of the toolchain the sw Makefile builds with, as printed by the
+    compilers. GCC is always used to link, and clang to compile if selected.
+
+    :return: The output of --version of every compiler, empty for the ones not found.
+    """
+    bin_dir = os.path.join(
+        os.path.expanduser(os.environ.get("RISCV_XALP", "~/.riscv")), "bin"
+    )
+    prefix = compiler_prefix or os.environ.get("COMPILER_PREFIX", "")
+    compiler_names = [f"{prefix}elf-gcc"]
+    if compiler == "clang":
+        compiler_names.append("clang")
+
+    version = b""
+    for name in compiler_names:
+        try:
+            version += subprocess.run(
+                [os.path.join(bin_dir, name), "--version"],
+                capture_output=True,
+                check=False,
+            ).stdout
+        except OSError:
+            pass
+        version += b"\0"
+    return version
+
+
+def get_app_fingerprint(
+    app_name: str,
+    compiler_path: str,
+    compiler_prefix: str,
+    compiler: str,
+    linker: str,
+    extra_parameters: str,
+    apps_dir="sw/applications",
+):
+    """
+    Get a hash of everything the build of an application depends on: its sources, the
+    shared sw sources, the build configuration and the version of the toolchain.
+    """
+    hasher = hashlib.sha256()
+    config = [
+        app_name,
+        compiler_path or "",
+        compiler_prefix or "",
+        compiler or "",
+        linker or "",
+        extra_parameters or "",
+    ]
+    config += [f"{var}={os.environ.get(var, '')}" for var in BUILD_VARIABLES]
+    hasher.update("\0".join(config).encode("utf-8") + b"\0")
+    hasher.update(get_toolchain_version(compiler_prefix, compiler))
+
+    hash_path(hasher, os.path.join(apps_dir, app_name))
+    for path in SHARED_SOURCES:
+        if os.path.exists(path):
+            hash_path(hasher, path)
+
+    return hasher.hexdigest()
+
+
+class ElfCache:
+    """
+    Content-addressed cache of compiled applications. Entries are keyed on the sources of
+    the application, the shared sw sources, the build configuration and the toolchain
+    version, and the least recently used ones are evicted when the cache exceeds its size.
+    """
+
+    def __init__(self, cache_dir: str, max_size_MB: int, apps_dir="sw/applications"):
+        """
+        Constructor for ElfCache.
+
+        :param str cache_dir: The folder where the cache entries are stored.
+        :param int max_size_MB: The maximum size of the cache in MB.
+        :param str apps_dir: The folder where the applications are located.
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size_B = max_size_MB * 1024 * 1024
+        self.apps_dir = apps_dir
+
+    def get_key(
+        self,
+        app_name: str,
+        compiler_path: str,
+        compiler_prefix: str,
+        compiler: str,
+        linker: str,
+        extra_parameters: str,
+    ):
+        """
+        Get the key of an application built with the given configuration.
+        """
+        return get_app_fingerprint(
+            app_name,
+            compiler_path,
+            compiler_prefix,
+            compiler,
+            linker,
+            extra_parameters,
+            self.apps_dir,
+        )
+
+    def restore(self, key: str, build_dir: str):
+        """
+        Copy the files of the entry into build_dir.
+
+        :return: True if the entry was in the cache and False otherwise.
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        if not os.path.isdir(entry_dir):
+            return False
+
+        try:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            os.makedirs(build_dir)
+            for name in CACHED_FILES:
+                src = os.path.join(entry_dir, name)
+                if os.path.exists(src):
+                    shutil.copy(src, os.path.join(build_dir, name))
+            # Mark the entry as recently used
+            os.utime(entry_dir)
+        except OSError:
+            # The entry was evicted by another process in the meantime
+            return False
+        return True
+
+    def store(self, key: str, build_dir: str):
+        """
+        Store the files in build_dir as the entry of key and evict the least recently
+        used entries if the cache got too large.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry_dir):
+            return
+
+        # Fill a temporary folder first, so other processes never see a partial entry
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        for name in CACHED_FILES:
+            src = os.path.join(build_dir, name)
+            if os.path.exists(src):
+                shutil.copy(src, os.path.join(tmp_dir, name))
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits its size.
+        """
+        entries = []
+        total_size_B = 0
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(entry_dir):
+                continue
+            try:
+                size_B = sum(
+                    os.path.getsize(os.path.join(entry_dir, file))
+                    for file in os.listdir(entry_dir)
+                )
+                entries.append((os.path.getmtime(entry_dir), size_B, entry_dir))
+            except OSError:
+                continue
+            total_size_B += size_B
+
+        for _, size_B, entry_dir in sorted(entries):
+            if total_size_B <= self.max_size_B:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size_B -= size_B
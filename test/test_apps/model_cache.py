@@ -0,0 +1,104 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+from elf_cache import hash_path
+
+
+class ModelCache:
+    """
+    Pool of prebuilt simulator models. Every model is keyed on a fingerprint of the
+    FuseSoC sources it was built from, the FuseSoC arguments and the version of the
+    simulator, so models of several configurations can be kept side by side. The least
+    recently used models are evicted when the pool is full.
+    """
+
+    def __init__(self, cache_dir: str, sources: list, max_models: int):
+        """
+        Constructor for ModelCache.
+
+        :param str cache_dir: The folder where the models are stored.
+        :param list sources: The files and folders the models are built from (RTL, testbench
+            and .core files).
+        :param int max_models: The maximum number of models kept in the pool.
+        """
+        self.cache_dir = cache_dir
+        self.sources = sources
+        self.max_models = max_models
+
+    def get_fingerprint(self, simulator_name: str):
+        """
+        Get the fingerprint of the model the simulator would build now.
+        """
+        hasher = hashlib.sha256()
+        hasher.update(simulator_name.encode("utf-8") + b"\0")
+        hasher.update(os.environ.get("FUSESOC_ARGS", "").encode("utf-8") + b"\0")
+
+        try:
+            version = subprocess.run(
+                [simulator_name, "--version"], capture_output=True, check=False
+            ).stdout
+        except FileNotFoundError:
+            version = b""
+        hasher.update(version + b"\0")
+
+        for path in self.sources:
+            if os.path.exists(path):
+                hash_path(hasher, path)
+
+        return hasher.hexdigest()
+
+    def restore(self, fingerprint: str, model_path: str):
+        """
+        Copy the model of the fingerprint to model_path.
+
+        :return: True if the model was in the pool and False otherwise.
+        """
+        entry_dir = os.path.join(self.cache_dir, fingerprint)
+        cached_model = os.path.join(entry_dir, os.path.basename(model_path))
+        if not os.path.isfile(cached_model):
+            return False
+
+        # Replace the model atomically, as it may be running in another simulation
+        model_dir = os.path.dirname(os.path.abspath(model_path))
+        os.makedirs(model_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=model_dir, prefix=".tmp-")
+        os.close(fd)
+        try:
+            shutil.copy2(cached_model, tmp_path)
+            os.replace(tmp_path, model_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        # Mark the model as recently used
+        os.utime(entry_dir)
+        return True
+
+    def store(self, fingerprint: str, model_path: str):
+        """
+        Store the model at model_path as the one of the fingerprint and evict the least
+        recently used models if the pool is full.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = os.path.join(self.cache_dir, fingerprint)
+        if os.path.isdir(entry_dir) or not os.path.isfile(model_path):
+            return
+
+        # Fill a temporary folder first, so a partial model is never used
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        shutil.copy2(model_path, os.path.join(tmp_dir, os.path.basename(model_path)))
+        os.rename(tmp_dir, entry_dir)
+
+        entries = sorted(
+            (os.path.getmtime(os.path.join(self.cache_dir, name)), name)
+            for name in os.listdir(self.cache_dir)
+            if not name.startswith(".")
+        )
+        for _, name in entries[: max(len(entries) - self.max_models, 0)]:
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
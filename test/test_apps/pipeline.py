@@ -0,0 +1,153 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bcolors import BColors
+from compile_pool import init_compile_worker, run_compile_job
+from sim_farm import SimFarm
+from simulator import SimResult
+
+
+def run_pipeline(
+    jobs: list,
+    app_list: list,
+    num_jobs: int,
+    sim_farm: SimFarm,
+    get_simulations,
+    on_app_done,
+    dry_run=False,
+    verbose=True,
+    elf_cache=None,
+):
+    """
+    Compile the jobs in a pool of num_jobs processes and simulate every application in the
+    sim_farm as soon as all its compilations are done, so the simulations of an app overlap
+    with the compilations of the next ones.
+
+    The compilation results of an app are stored in the order of its jobs, so the ELF
+    selected for simulation is the same one as when compiling sequentially.
+
+    A compilation or simulation that raises (e.g., an OSError in the ELF cache, a missing
+    ELF to copy into the simulation folder or a crashed worker) is reported as failed, and
+    the other jobs go on.
+
+    On Ctrl-C, or any other exception escaping the loop, the queued compilations and
+    simulations are dropped and the exception is raised again. The running simulations,
+    started in their own session, are killed. The running compilations are let finish,
+    as the compilation workers ignore SIGINT and so do the make and compiler processes
+    they start, which inherit it.
+
+    :param list jobs: The list of CompileJob to run.
+    :param list app_list: The list of Application to test. Apps without jobs (e.g., every
+        compiler was skipped) go straight to the simulation stage.
+    :param int num_jobs: The maximum number of compilations running at the same time.
+    :param SimFarm sim_farm: The farm running the simulations. If None, the apps are only
+        compiled.
+    :param get_simulations: Called with an Application whose compilations are done. Returns
+        the list of (Simulator, timeout) tuples to run it with.
+    :param on_app_done: Called with every Application once its compilations and simulations
+        are done.
+    :param bool dry_run: If True, only print the commands without executing them.
+    :param bool verbose: If True, print detailed messages about the compilations.
+    :param ElfCache elf_cache: The cache shared by the jobs. If None, every job compiles.
+    """
+    apps = {an_app.name: an_app for an_app in app_list}
+
+    # Jobs of every app and their results once they are done. Key is the application name.
+    app_jobs: dict = {name: [] for name in apps}
+    job_results: dict = {name: {} for name in apps}
+    for job in jobs:
+        app_jobs[job.app_name].append(job)
+
+    # Pending simulations. Key is the future and value is the (Application, simulator
+    # name) tuple. The value of pending_sims is the number of simulations left per app.
+    sim_futures: dict = {}
+    pending_sims: dict = {}
+
+    def start_simulations(an_app):
+        simulations = []
+        if sim_farm and an_app.compilation_succeeded():
+            simulations = get_simulations(an_app)
+        pending_sims[an_app.name] = len(simulations)
+        for simulator, simulation_timeout in simulations:
+            try:
+                future = sim_farm.submit(simulator, an_app, simulation_timeout)
+            except Exception as exc:
+                print(
+                    BColors.FAIL
+                    + f"Error simulating {an_app.name} with {simulator.name}: {exc!r}"
+                    + BColors.ENDC,
+                    flush=True,
+                )
+                an_app.add_simulation_result(simulator.name, SimResult.FAILED)
+                pending_sims[an_app.name] -= 1
+                continue
+            sim_futures[future] = (an_app, simulator.name)
+        if pending_sims[an_app.name] == 0:
+            on_app_done(an_app)
+
+    executor = ProcessPoolExecutor(
+        max_workers=num_jobs, initializer=init_compile_worker
+    )
+    cancel = True
+    try:
+        compile_futures = {
+            executor.submit(run_compile_job, job, dry_run, verbose, elf_cache): job
+            for job in jobs
+        }
+        for name, an_app in apps.items():
+            if not app_jobs[name]:
+                start_simulations(an_app)
+
+        while compile_futures or sim_futures:
+            done, _ = wait(
+                list(compile_futures) + list(sim_futures), return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                if future in compile_futures:
+                    job = compile_futures.pop(future)
+                    try:
+                        job_results[job.app_name][job] = future.result()
+                    except Exception as exc:
+                        print(
+                            BColors.FAIL
+                            + f"Error compiling {job.app_name} with {job.compiler}: {exc!r}"
+                            + BColors.ENDC,
+                            flush=True,
+                        )
+                        job_results[job.app_name][job] = (False, None)
+                    if len(job_results[job.app_name]) < len(app_jobs[job.app_name]):
+                        continue
+
+                    an_app = apps[job.app_name]
+                    for app_job in app_jobs[job.app_name]:
+                        success, compile_time = job_results[job.app_name][app_job]
+                        an_app.set_compilation_status(app_job.compiler, success)
+                        if compile_time is not None:
+                            an_app.set_compile_time(app_job.compiler, compile_time)
+                        if success:
+                            an_app.set_build_dir(app_job.compiler, app_job.build_dir)
+                    start_simulations(an_app)
+                else:
+                    an_app, simulator_name = sim_futures.pop(future)
+                    try:
+                        simulation_result = future.result()
+                    except Exception as exc:
+                        print(
+                            BColors.FAIL
+                            + f"Error simulating {an_app.name} with {simulator_name}: {exc!r}"
+                            + BColors.ENDC,
+                            flush=True,
+                        )
+                        simulation_result = SimResult.FAILED
+                    an_app.add_simulation_result(simulator_name, simulation_result)
+                    pending_sims[an_app.name] -= 1
+                    if pending_sims[an_app.name] == 0:
+                        on_app_done(an_app)
+        cancel = False
+    finally:
+        executor.shutdown(wait=not cancel, cancel_futures=cancel)
+        if sim_farm:
+            sim_farm.shutdown(cancel=cancel)
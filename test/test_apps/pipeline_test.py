@@ -0,0 +1,54 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from application import Application  # noqa: E402
+from pipeline import run_pipeline  # noqa: E402
+from sim_farm import SimFarm  # noqa: E402
+from simulator import SimResult  # noqa: E402
+
+
+class FakeSimulator:
+    """
+    Stand-in for Simulator: passes if the ELF was copied into the simulation folder.
+    """
+
+    name = "verilator"
+
+    def run_app(self, an_app, simulation_timeout, dry_run, verbose, work_dir):
+        if os.path.isfile(os.path.join(work_dir, "main.spm.elf")):
+            return SimResult.PASSED
+        return SimResult.FAILED
+
+
+def test_missing_elf_fails_only_its_app(tmp_path):
+    apps = []
+    for name in ("hello_world", "matadd"):
+        an_app = Application(name)
+        an_app.set_compilation_status("gcc", True)
+        an_app.set_build_dir("gcc", str(tmp_path / "jobs" / f"{name}-gcc"))
+        apps.append(an_app)
+    os.makedirs(tmp_path / "jobs" / "matadd-gcc")
+    (tmp_path / "jobs" / "matadd-gcc" / "main.spm.elf").write_text("elf")
+
+    sim_farm = SimFarm(str(tmp_path / "sim-farm"), 2, verbose=False)
+    done_apps = []
+    run_pipeline(
+        [],
+        apps,
+        1,
+        sim_farm,
+        lambda an_app: [(FakeSimulator(), 10)],
+        done_apps.append,
+        verbose=False,
+    )
+
+    # The ELF of hello_world cannot be copied, so only its simulation fails
+    assert sorted(an_app.name for an_app in done_apps) == ["hello_world", "matadd"]
+    assert apps[0].simulation_results == {"verilator": SimResult.FAILED}
+    assert apps[1].simulation_results == {"verilator": SimResult.PASSED}
@@ -0,0 +1,86 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from simulator import SimResult
+
+
+def export_json(records: list, path: str):
+    """
+    Write the records of a run to a JSON file.
+
+    :param list records: The records of the run, as returned by get_records.
+    :param str path: The JSON file to write.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(records, file, indent=2, sort_keys=True)
+
+
+def load_json(path: str):
+    """
+    Read the records of a run from a JSON file written by export_json.
+    """
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def export_junit(records: list, path: str):
+    """
+    Write the records of a run to a JUnit XML file. Each record is a test case of the
+    application, named after the compiler or the simulator.
+
+    :param list records: The records of the run, as returned by get_records.
+    :param str path: The JUnit XML file to write.
+    """
+    suite = ET.Element("testsuite", name="test_apps")
+    failures = 0
+    skipped = 0
+    total_time_s = 0.0
+
+    for record in records:
+        if record["simulator"] is None:
+            name = f"compile[{record['compiler']}]"
+        else:
+            name = f"simulate[{record['simulator']}]"
+        wall_time_s = record["wall_time_s"] or 0.0
+        total_time_s += wall_time_s
+
+        case = ET.SubElement(
+            suite,
+            "testcase",
+            classname=record["app"],
+            name=name,
+            time=f"{wall_time_s:.3f}",
+        )
+        if record["verdict"] == SimResult.SKIPPED:
+            skipped += 1
+            ET.SubElement(case, "skipped")
+        elif record["verdict"] != SimResult.PASSED:
+            failures += 1
+            ET.SubElement(case, "failure", message=record["verdict"])
+
+        if record["cycles"] is not None:
+            properties = ET.SubElement(case, "properties")
+            ET.SubElement(
+                properties, "property", name="cycles", value=str(record["cycles"])
+            )
+            if record["cycles_per_s"] is not None:
+                ET.SubElement(
+                    properties,
+                    "property",
+                    name="cycles_per_s",
+                    value=f"{record['cycles_per_s']:.0f}",
+                )
+
+    suite.set("tests", str(len(records)))
+    suite.set("failures", str(failures))
+    suite.set("skipped", str(skipped))
+    suite.set("time", f"{total_time_s:.3f}")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
@@ -0,0 +1,175 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import time
+
+from application import Application
+from simulator import SimResult
+from utils import in_list, get_cycles_per_s
+
+
+class ResultsDB:
+    """
+    Persistent store of the results of the test runs, as one JSON record per line. Each
+    record holds the result of compiling an app with a compiler (simulator is None) or of
+    simulating it with a simulator (compiler is the one that built the simulated ELF).
+    """
+
+    def __init__(self, path: str):
+        """
+        Constructor for ResultsDB.
+
+        :param str path: The JSON-lines file holding the records.
+        """
+        self.path = path
+
+    def load(self):
+        """
+        Get every record in the store, oldest first.
+        """
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def append(self, records: list):
+        """
+        Add records at the end of the store.
+        """
+        if not records:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as file:
+            for record in records:
+                file.write(json.dumps(record, sort_keys=True) + "\n")
+
+    def latest(self):
+        """
+        Get the last record of every (app, compiler, simulator).
+
+        :return: A dict whose key is the (app, compiler, simulator) tuple and whose value is
+            the last record stored for it.
+        """
+        return {
+            (record["app"], record["compiler"], record["simulator"]): record
+            for record in self.load()
+        }
+
+    def failed_apps(self):
+        """
+        Get the names of the apps whose last compilation or simulation did not pass.
+        """
+        return {
+            app
+            for (app, _, _), record in self.latest().items()
+            if record["verdict"] not in (SimResult.PASSED, SimResult.SKIPPED)
+        }
+
+    def changed_apps(self, app_list: list):
+        """
+        Get the names of the apps of app_list whose inputs changed since they were last
+        compiled, or that were never compiled.
+
+        :param list app_list: The list of Application, with their fingerprints set.
+        """
+        latest = self.latest()
+        changed = set()
+        for an_app in app_list:
+            for compiler, fingerprint in an_app.fingerprints.items():
+                record = latest.get((an_app.name, compiler, None))
+                if record is None or record["fingerprint"] != fingerprint:
+                    changed.add(an_app.name)
+        return changed
+
+
+def get_records(app_list: list, blacklist: list):
+    """
+    Get the records of the results of the apps that were not skipped.
+
+    :param list app_list: The list of all the apps.
+    :param list blacklist: The list of apps that were skipped.
+
+    :return: A list of records, ready to be stored in a ResultsDB.
+    """
+    timestamp = time.time()
+    records = []
+    for an_app in app_list:
+        if in_list(an_app.name, blacklist):
+            continue
+
+        for compiler, success in an_app.compilation_success.items():
+            if success is None:
+                verdict = SimResult.SKIPPED
+            elif success:
+                verdict = SimResult.PASSED
+            else:
+                verdict = SimResult.FAILED
+            records.append(
+                {
+                    "timestamp": timestamp,
+                    "app": an_app.name,
+                    "compiler": compiler,
+                    "simulator": None,
+                    "verdict": verdict,
+                    "wall_time_s": an_app.compile_times.get(compiler),
+                    "cycles": None,
+                    "cycles_per_s": None,
+                    "fingerprint": an_app.fingerprints.get(compiler),
+                }
+            )
+
+        for simulator, result in an_app.simulation_results.items():
+            # The simulated ELF is the one built by the last compiler
+            sim_compiler = list(an_app.compilation_success)[-1]
+            metrics = an_app.simulation_metrics.get(simulator, {})
+            records.append(
+                {
+                    "timestamp": timestamp,
+                    "app": an_app.name,
+                    "compiler": sim_compiler,
+                    "simulator": simulator,
+                    "verdict": result,
+                    "wall_time_s": metrics.get("wall_time_s"),
+                    "cycles": metrics.get("cycles"),
+                    "cycles_per_s": get_cycles_per_s(metrics),
+                    "fingerprint": an_app.fingerprints.get(sim_compiler),
+                }
+            )
+
+    return records
+
+
+def get_apps_from_records(records: list):
+    """
+    Rebuild the applications from the records of a run, e.g. to merge the results of
+    several shards. The compilers and simulators keep the order of the records, so the
+    last compiler is still the one that built the simulated ELF.
+
+    :param list records: The records of the run, as returned by get_records.
+
+    :return: A list of Application with their results and metrics, sorted by name.
+    """
+    apps = {}
+    for record in records:
+        an_app = apps.setdefault(record["app"], Application(record["app"]))
+        if record["simulator"] is None:
+            if record["verdict"] == SimResult.SKIPPED:
+                success = None
+            else:
+                success = record["verdict"] == SimResult.PASSED
+            an_app.set_compilation_status(record["compiler"], success)
+            if record["wall_time_s"] is not None:
+                an_app.set_compile_time(record["compiler"], record["wall_time_s"])
+            if record["fingerprint"] is not None:
+                an_app.set_fingerprint(record["compiler"], record["fingerprint"])
+        else:
+            an_app.add_simulation_result(record["simulator"], record["verdict"])
+            if record["wall_time_s"] is not None:
+                an_app.set_simulation_metrics(
+                    record["simulator"], record["wall_time_s"], record["cycles"]
+                )
+
+    return [apps[name] for name in sorted(apps)]
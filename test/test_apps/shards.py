@@ -0,0 +1,74 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import statistics
+
+
+def parse_shard(shard: str):
+    """
+    Parse a shard given as "i/N", where i goes from 1 to N.
+
+    :return: The shard index i and the number of shards N, or None if the shard is not
+        valid.
+    """
+    try:
+        index, count = (int(value) for value in shard.split("/"))
+    except ValueError:
+        return None
+    if count < 1 or not 1 <= index <= count:
+        return None
+    return index, count
+
+
+def get_app_costs(records: list):
+    """
+    Get the cost of testing every app, i.e. the sum of the wall times of the last
+    compilation with every compiler and the last simulation with every simulator.
+
+    :param list records: The records of the previous runs, oldest first.
+
+    :return: A dict whose key is the app name and whose value is its cost in seconds.
+    """
+    latest = {}
+    for record in records:
+        if record.get("wall_time_s") is not None:
+            latest[(record["app"], record["compiler"], record["simulator"])] = record[
+                "wall_time_s"
+            ]
+
+    costs = {}
+    for (app, _, _), wall_time_s in latest.items():
+        costs[app] = costs.get(app, 0) + wall_time_s
+    return costs
+
+
+def select_shard(app_names: list, costs: dict, index: int, count: int):
+    """
+    Split the apps into count shards of similar cost and get the ones of shard index.
+
+    An app is the unit of the split, since its simulations run on the ELF built by its
+    compilations. The apps are assigned from the most to the least expensive to the
+    cheapest shard so far. Apps without history get the median cost of the others. The
+    split only depends on its inputs, so every shard computes the same one as long as
+    they share the same results history.
+
+    :param list app_names: The names of the apps to split.
+    :param dict costs: The cost of each app, as returned by get_app_costs.
+    :param int index: The shard to select, from 1 to count.
+    :param int count: The number of shards.
+
+    :return: The set of app names of the shard.
+    """
+    known_costs = [costs[name] for name in app_names if name in costs]
+    default_cost = statistics.median(known_costs) if known_costs else 1.0
+
+    loads = [0.0] * count
+    shards = [set() for _ in range(count)]
+    app_costs = {name: costs.get(name, default_cost) for name in app_names}
+    for name in sorted(app_names, key=lambda name: (-app_costs[name], name)):
+        shard = min(range(count), key=lambda i: (loads[i], i))
+        loads[shard] += app_costs[name]
+        shards[shard].add(name)
+
+    return shards[index - 1]
@@ -0,0 +1,123 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import random
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from shards import get_app_costs, parse_shard, select_shard  # noqa: E402
+
+# test_apps.py runs from the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TEST_APPS = os.path.join(ROOT, "test", "test_apps", "test_apps.py")
+
+# The dry runs do not use the toolchain, but the compilations need a path to set
+DRY_RUN_ARGS = ["--dry-run", "--no-cache", "--compiler-paths", "/opt/riscv"]
+
+
+def test_parse_shard():
+    assert parse_shard("1/1") == (1, 1)
+    assert parse_shard("3/4") == (3, 4)
+    for shard in ["0/4", "5/4", "1/0", "1", "a/b", "1/2/3"]:
+        assert parse_shard(shard) is None
+
+
+def test_select_shard():
+    app_names = [f"app_{i}" for i in range(13)]
+    # Some apps have no history and get the median cost of the others
+    records = [
+        {
+            "app": name,
+            "compiler": compiler,
+            "simulator": simulator,
+            "wall_time_s": float(i % 5 + 1),
+        }
+        for i, name in enumerate(app_names[:10])
+        for compiler, simulator in [
+            ("gcc", None),
+            ("clang", None),
+            ("gcc", "verilator"),
+        ]
+    ]
+    costs = get_app_costs(records)
+
+    for count in range(1, len(app_names) + 2):
+        shards = [
+            select_shard(app_names, costs, index, count)
+            for index in range(1, count + 1)
+        ]
+        # Every app is in exactly one shard
+        assert sum(len(shard) for shard in shards) == len(app_names)
+        assert set().union(*shards) == set(app_names)
+
+        # Every shard computes the same split, whatever the order it found the apps in
+        shuffled = list(app_names)
+        random.Random(count).shuffle(shuffled)
+        assert shards == [
+            select_shard(shuffled, costs, index, count) for index in range(1, count + 1)
+        ]
+
+
+def run_test_apps(args: list):
+    return subprocess.run(
+        [sys.executable, TEST_APPS] + args,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+def get_summary(stdout: str):
+    """
+    Get the results printed at the end of a run.
+    """
+    return stdout[stdout.rindex("Results:") :]
+
+
+def get_verdicts(path: str):
+    with open(path, "r") as file:
+        return sorted(
+            (
+                record["app"],
+                record["compiler"],
+                record["simulator"] or "",
+                record["verdict"],
+            )
+            for record in json.load(file)
+        )
+
+
+def test_merge_shard_dry_runs(tmp_path):
+    results_db = str(tmp_path / "results.jsonl")
+    unsharded_json = str(tmp_path / "unsharded.json")
+    unsharded = run_test_apps(
+        DRY_RUN_ARGS + ["--results-db", results_db, "--export-json", unsharded_json]
+    )
+
+    # More shards than apps, so some shards have nothing to test
+    count = len(os.listdir(os.path.join(ROOT, "sw", "applications"))) + 1
+    shard_jsons = [str(tmp_path / f"shard-{i}.json") for i in range(1, count + 1)]
+    for index, shard_json in enumerate(shard_jsons, start=1):
+        run_test_apps(
+            DRY_RUN_ARGS
+            + ["--results-db", results_db]
+            + ["--shard", f"{index}/{count}", "--export-json", shard_json]
+        )
+
+    merged_db = str(tmp_path / "merged.jsonl")
+    merged = run_test_apps(["merge-results", "--results-db", merged_db] + shard_jsons)
+
+    assert get_summary(merged) == get_summary(unsharded)
+    assert sorted(
+        verdict for shard_json in shard_jsons for verdict in get_verdicts(shard_json)
+    ) == get_verdicts(unsharded_json)
+
+    # Neither the dry runs nor their merge store results
+    assert not os.path.exists(results_db)
+    assert not os.path.exists(merged_db)
@@ -0,0 +1,84 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from simulator import Simulator, kill_running_simulations
+
+
+class SimFarm:
+    """
+    Runs several simulations at the same time on the prebuilt simulator models. Every
+    simulation runs in its own working folder, which holds its copy of the ELF, its
+    uart0.log and its waveform.
+    """
+
+    def __init__(
+        self,
+        work_dir: str,
+        max_sims: int,
+        dry_run: bool = False,
+        verbose: bool = True,
+    ):
+        """
+        Constructor for SimFarm.
+
+        :param str work_dir: The folder holding the working folders of the simulations.
+        :param int max_sims: The maximum number of simulations running at the same time.
+        :param bool dry_run: If True, only print the simulation commands without executing them.
+        :param bool verbose: If True, print detailed messages about the simulation process.
+        """
+        self.work_dir = work_dir
+        self.dry_run = dry_run
+        self.verbose = verbose
+
+        # The simulations are run by subprocesses, so threads are enough to wait for them
+        self.executor = ThreadPoolExecutor(max_workers=max_sims)
+
+    def sim_work_dir(self, an_app, simulator: Simulator):
+        """
+        Get the working folder of the simulation of an_app with the simulator.
+        """
+        return os.path.join(self.work_dir, f"{an_app.name}-{simulator.name}")
+
+    def submit(self, simulator: Simulator, an_app, simulation_timeout: float):
+        """
+        Copy the ELF of an_app into a fresh working folder and queue its simulation. The
+        copy is taken now, so the app can be rebuilt in sw/build while it is simulated.
+
+        :param Simulator simulator: The simulator to run the app with.
+        :param Application an_app: The application to run.
+        :param float simulation_timeout: The timeout for the simulation in seconds.
+
+        :return: The future of the SimResult of the simulation.
+        """
+        sim_dir = self.sim_work_dir(an_app, simulator)
+        if not self.dry_run:
+            shutil.rmtree(sim_dir, ignore_errors=True)
+            os.makedirs(sim_dir)
+            binary = an_app.get_binary() or os.path.join("sw", "build", "main.spm.elf")
+            shutil.copy(binary, os.path.join(sim_dir, "main.spm.elf"))
+
+        return self.executor.submit(
+            simulator.run_app,
+            an_app,
+            simulation_timeout,
+            self.dry_run,
+            self.verbose,
+            sim_dir,
+        )
+
+    def shutdown(self, cancel: bool = False):
+        """
+        Wait for every pending simulation and release the workers.
+
+        :param bool cancel: If True, drop the queued simulations and kill the running ones
+            instead of waiting for them.
+        """
+        if cancel:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            kill_running_simulations()
+        self.executor.shutdown(wait=True)
@@ -2,11 +2,73 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
+import collections
+import os
+import signal
 import subprocess
 import re
+import shlex
+import shutil
+import threading
+import time
 
 from bcolors import BColors
 
+# Number of lines of the simulation output kept to report failures
+OUTPUT_TAIL_LINES = 200
+
+# Time in seconds given to a simulation to finish once its exit code was received
+EXIT_GRACE_S = 5
+
+# Simulations currently running, so they can be killed when the run is interrupted. They
+# are started in their own session, so they do not receive the Ctrl-C of the terminal.
+running_processes = set()
+running_processes_lock = threading.Lock()
+
+
+def kill_process_group(process):
+    """
+    Kill a process started in its own session, together with its children (e.g., the
+    simulator launched by make and FuseSoC).
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def kill_running_simulations():
+    """
+    Kill every simulation currently running.
+    """
+    with running_processes_lock:
+        for process in running_processes:
+            kill_process_group(process)
+
+
+def get_model_command(make_target):
+    """
+    Get the command running a prebuilt model directly, as printed by make_target. The
+    Makefile resolves the model path and the simulation arguments, so the command matches
+    the one of "make <simulator>-run". "{binary}" in the command is replaced by the ELF to
+    simulate.
+
+    :return: The command as a list, or None if make failed.
+    """
+    try:
+        result = subprocess.run(
+            ["make", "-s", "--no-print-directory", make_target, "BINARY={binary}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+    # Included makefiles may print some information before the command
+    lines = result.stdout.strip().splitlines()
+    return shlex.split(lines[-1]) if lines else None
+
 
 class SimResult:
     """
@@ -24,7 +86,13 @@ class Simulator:
     Represents a simulator.
     """
 
-    def __init__(self, name: str, error_pattern: str):
+    def __init__(
+        self,
+        name: str,
+        error_pattern: str,
+        model_command: list = None,
+        cycles_pattern: str = None,
+    ):
         """
         Constructor for Simulator.
 
@@ -32,13 +100,26 @@ class Simulator:
         :param str error_pattern: The pattern to look for in the output of the simulator. This
             pattern should contain a group that captures the return value of the program. For
             example, "Program Finished with value (\d+)".
+        :param list model_command: The command to run the prebuilt model directly, without
+            going through make. The first element is the path to the model and "{binary}" is
+            replaced by the ELF to simulate. If None, the model can only be run through make.
+        :param str cycles_pattern: The pattern to look for in the output of the simulator to get
+            the number of simulated cycles, captured by its first group. If None, the cycles
+            are not reported.
         """
         self.name = name
         self.error_pattern = error_pattern
+        self.model_command = model_command
+        self.cycles_pattern = cycles_pattern
 
-    def build(self, dry_run=False, verbose=True):
+    def build(self, dry_run=False, verbose=True, model_cache=None):
         """
-        Build the simulator model.
+        Build the simulator model. If model_cache holds a model built from the same sources
+        and configuration, it is copied to the path of the model instead.
+
+        :param bool dry_run: If True, only print the build command without executing it.
+        :param bool verbose: If True, print detailed messages about the build process.
+        :param ModelCache model_cache: The pool of prebuilt models. Requires a model_command.
         """
         if verbose:
             print(
@@ -54,6 +135,20 @@ class Simulator:
                 )
             return
 
+        fingerprint = None
+        if model_cache and self.model_command:
+            fingerprint = model_cache.get_fingerprint(self.name)
+            if model_cache.restore(fingerprint, self.model_command[0]):
+                if verbose:
+                    print(
+                        BColors.OKGREEN
+                        + f"Reusing cached {self.name} model {fingerprint[:12]}."
+                        + BColors.ENDC,
+                        flush=True,
+                    )
+                return
+
+        build_start = time.time()
         try:
             _ = subprocess.run(
                 ["make", f"{self.name}-build"], capture_output=True, check=True
@@ -63,6 +158,14 @@ class Simulator:
             print(str(exc.stderr.decode("utf-8")), flush=True)
             exit(1)
         else:
+            # Only store a model this build produced, not one left over by another build
+            model = self.model_command[0] if fingerprint else None
+            if (
+                model
+                and os.path.isfile(model)
+                and os.path.getmtime(model) >= build_start
+            ):
+                model_cache.store(fingerprint, model)
             print(
                 BColors.OKGREEN
                 + f"Generated {self.name} model successfully."
@@ -70,7 +173,111 @@ class Simulator:
                 flush=True,
             )
 
-    def run_app(self, an_app, simulation_timeout, dry_run=False, verbose=True):
+    def copy_model(self, model_dir):
+        """
+        Copy the prebuilt model into model_dir and run the copy from now on, so the
+        simulations are not affected when the model is rebuilt or restored at its path.
+        """
+        os.makedirs(model_dir, exist_ok=True)
+        model = os.path.abspath(
+            os.path.join(model_dir, os.path.basename(self.model_command[0]))
+        )
+        shutil.copy2(self.model_command[0], model)
+        self.model_command = [model] + self.model_command[1:]
+
+    def stream_output(self, run_command, simulation_timeout, work_dir=None):
+        """
+        Run the simulation and match the error pattern on its output line by line, without
+        buffering the whole output. Once the exit code is found, the simulation is given
+        EXIT_GRACE_S seconds to finish on its own (e.g., to close the waveform) and is then
+        killed.
+
+        :param list run_command: The command running the simulation.
+        :param int simulation_timeout: The timeout for the simulation in seconds.
+        :param str work_dir: The folder where to run the command.
+
+        :return: The exit code captured by the error pattern (or None if it was not found),
+            the number of simulated cycles (or None if they were not found), the last
+            OUTPUT_TAIL_LINES lines of the output, and whether the simulation timed out.
+        """
+        process = subprocess.Popen(
+            run_command,
+            cwd=work_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        with running_processes_lock:
+            running_processes.add(process)
+
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            kill_process_group(process)
+
+        watchdog = threading.Timer(simulation_timeout, on_timeout)
+        watchdog.start()
+
+        exit_code = None
+        cycles = None
+        output_tail = collections.deque(maxlen=OUTPUT_TAIL_LINES)
+        error_regex = re.compile(self.error_pattern)
+        cycles_regex = re.compile(self.cycles_pattern) if self.cycles_pattern else None
+        try:
+            for raw_line in process.stdout:
+                line = raw_line.decode("utf-8", errors="replace")
+                output_tail.append(line)
+                if cycles_regex and cycles is None:
+                    match = cycles_regex.search(line)
+                    if match:
+                        cycles = int(match.group(1))
+                if exit_code is None:
+                    match = error_regex.search(line)
+                    if match:
+                        # The verdict is known, no need to wait for the timeout anymore
+                        exit_code = match.group(1)
+                        watchdog.cancel()
+                        watchdog = threading.Timer(
+                            EXIT_GRACE_S, kill_process_group, [process]
+                        )
+                        watchdog.start()
+        finally:
+            watchdog.cancel()
+            kill_process_group(process)
+            process.stdout.close()
+            process.wait()
+            with running_processes_lock:
+                running_processes.discard(process)
+
+        return (
+            exit_code,
+            cycles,
+            list(output_tail),
+            timed_out.is_set() and exit_code is None,
+        )
+
+    def get_run_command(self, an_app, work_dir=None):
+        """
+        Get the command to simulate an_app. If work_dir is given, the prebuilt model is run
+        directly on the ELF copied into work_dir. Otherwise, the simulation goes through make.
+        """
+        if work_dir:
+            binary = os.path.abspath(os.path.join(work_dir, "main.spm.elf"))
+            model = os.path.abspath(self.model_command[0])
+            return [model] + [
+                arg.format(binary=binary) for arg in self.model_command[1:]
+            ]
+
+        run_command = ["make", f"{self.name}-run"]
+        binary = an_app.get_binary()
+        if binary:
+            run_command.append(f"BINARY={binary}")
+        return run_command
+
+    def run_app(
+        self, an_app, simulation_timeout, dry_run=False, verbose=True, work_dir=None
+    ):
         """
         Runs an_app with the simulator. Checks if it times out. Outputs if it finishes with errors or
         without.
@@ -79,6 +286,9 @@ class Simulator:
         :param int simulation_timeout: The timeout for the simulation in seconds.
         :param bool dry_run: If True, only print the simulation command without executing it.
         :param bool verbose: If True, print detailed messages about the simulation process.
+        :param str work_dir: The folder where to run the prebuilt model. It must hold the ELF
+            to simulate and receives the logs and waveforms. If None, the simulation runs
+            through make in the shared FuseSoC build folder.
 
         :return: SimResult for the simulation of an_app.
         """
@@ -90,22 +300,25 @@ class Simulator:
                 flush=True,
             )
 
+        run_command = self.get_run_command(an_app, work_dir)
+
         if dry_run:
             if verbose:
                 print(
-                    BColors.OKCYAN + f"[DRY RUN] make {self.name}-run" + BColors.ENDC,
+                    BColors.OKCYAN
+                    + f"[DRY RUN] {' '.join(run_command)}"
+                    + BColors.ENDC,
                     flush=True,
                 )
             return SimResult.PASSED
 
-        try:
-            run_output = subprocess.run(
-                ["make", f"{self.name}-run"],
-                capture_output=True,
-                timeout=simulation_timeout,
-                check=False,
-            )
-        except subprocess.TimeoutExpired:
+        start_time = time.monotonic()
+        exit_code, cycles, output_tail, timed_out = self.stream_output(
+            run_command, simulation_timeout, work_dir
+        )
+        an_app.set_simulation_metrics(self.name, time.monotonic() - start_time, cycles)
+
+        if timed_out:
             print(
                 BColors.FAIL
                 + f"Simulation of {an_app.name} with {self.name} timed out."
@@ -113,26 +326,32 @@ class Simulator:
                 flush=True,
             )
             return SimResult.TIMED_OUT
+        elif exit_code == "0":
+            if verbose:
+                print(
+                    BColors.OKGREEN
+                    + f"Ran {an_app.name} with {self.name} successfully."
+                    + BColors.ENDC,
+                    flush=True,
+                )
+            return SimResult.PASSED
         else:
-            match = re.search(
-                self.error_pattern, str(run_output.stdout.decode("utf-8"))
+            print(
+                BColors.FAIL
+                + f"Simulation of {an_app.name} with {self.name} failed."
+                + BColors.ENDC
             )
-            if match and match.group(1) == "0":
-                if verbose:
-                    print(
-                        BColors.OKGREEN
-                        + f"Ran {an_app.name} with {self.name} successfully."
-                        + BColors.ENDC,
-                        flush=True,
-                    )
-                return SimResult.PASSED
-            else:
+            print(
+                BColors.FAIL
+                + f"Last {len(output_tail)} lines of the output:\n"
+                + "".join(output_tail)
+                + BColors.ENDC
+            )
+            if work_dir:
                 print(
                     BColors.FAIL
-                    + f"Simulation of {an_app.name} with {self.name} failed."
-                    + BColors.ENDC
-                )
-                print(
-                    BColors.FAIL + str(run_output.stdout.decode("utf-8")) + BColors.ENDC
+                    + f"Logs and waveforms of the simulation are in {work_dir}."
+                    + BColors.ENDC,
+                    flush=True,
                 )
-                return SimResult.FAILED
+            return SimResult.FAILED
@@ -10,10 +10,21 @@ FUTURE WORK:
 """
 
 import argparse
+import fcntl
 import os
 
-from simulator import Simulator, SimResult
+from simulator import Simulator, SimResult, get_model_command
+from application import Application
 from bcolors import BColors
+from compile_pool import CompileJob, job_build_dir
+from pipeline import run_pipeline
+from sim_farm import SimFarm
+from elf_cache import ElfCache, get_app_fingerprint
+from model_cache import ModelCache
+from results_db import ResultsDB, get_records, get_apps_from_records
+from report import export_json, export_junit, load_json
+from shards import parse_shard, get_app_costs, select_shard
+from timeouts import TimeoutPolicy
 from utils import (
     in_list,
     get_apps,
@@ -38,9 +49,56 @@ ERROR_PATTERN_DICT = {
     "verilator": r"Exit code received: (\d+)",
 }
 
-# Timeout for the simulation in seconds
+# Pattern to look for when simulating an app to get the number of simulated cycles
+CYCLES_PATTERN_DICT = {
+    "verilator": r"Executed cycles:\s+(\d+)",
+}
+
+# Make target printing the command that runs the prebuilt model of each simulator without
+# going through make. Used when running several simulations in parallel.
+MODEL_COMMAND_TARGET_DICT = {
+    "verilator": "verilator-print-cmd",
+}
+
+# Timeout for the simulation in seconds. Used for the apps without enough history in the
+# results database, or for every app with --sim-timeout.
 SIM_TIMEOUT_S = 180
 
+# Adaptive timeouts: p95 of the last SIM_TIMEOUT_MAX_SAMPLES passing simulations times
+# SIM_TIMEOUT_FACTOR, clamped between the floor and the ceiling. Apps can override their
+# timeout in a test_config.json next to their sources.
+SIM_TIMEOUT_FACTOR = 3
+SIM_TIMEOUT_FLOOR_S = 30
+SIM_TIMEOUT_CEILING_S = 1800
+SIM_TIMEOUT_MIN_SAMPLES = 3
+SIM_TIMEOUT_MAX_SAMPLES = 20
+
+# Folder where each compilation job builds its app when compiling in parallel. Every
+# shard uses its own subfolder.
+JOBS_BUILD_DIR = "sw/build/jobs"
+
+# Cache of compiled apps, reused across runs when nothing they depend on changed
+ELF_CACHE_DIR = "~/.cache/xalp/elf-cache"
+ELF_CACHE_MAX_SIZE_MB = 1024
+
+# Pool of prebuilt simulator models, keyed on a fingerprint of the sources below
+MODEL_CACHE_DIR = "build/model-cache"
+MODEL_CACHE_SOURCES = ["hw", "tb", "xalp.core", "fusesoc.conf"]
+MODEL_CACHE_MAX_MODELS = 4
+
+# Folder where each simulation runs when simulating in parallel. Every shard uses its own
+# subfolder, which also holds its copy of the models.
+SIM_FARM_DIR = "build/sim-farm"
+
+# Lock taken by the shards sharing a checkout to build or restore the models one at a time
+MODEL_BUILD_LOCK = "build/.model-build.lock"
+
+# Results of every run, used to select the apps to rerun
+RESULTS_DB_PATH = "build/test-apps/results.jsonl"
+
+# Results of a shard, when --export-json is not given
+SHARD_RESULTS_PATH = "build/test-apps/shard-{index}-of-{count}.json"
+
 # Whitelist of apps. Has priority over the blacklist.
 # Useful if you only want to test certain apps
 WHITELIST = []
@@ -64,15 +122,36 @@ def main():
     If the --compile-only flag is set, it only compiles the apps.
     The script outputs the results of the tests.
     It exits with error if any app failed to compile or run.
+
+    The merge-results subcommand prints the results of several shards instead.
     """
     parser = argparse.ArgumentParser(description="Test script")
+    subparsers = parser.add_subparsers(dest="command")
+    merge_parser = subparsers.add_parser(
+        "merge-results",
+        help="Merge the results of several shards, written with --export-json, and print them",
+    )
+    merge_parser.add_argument(
+        "files",
+        nargs="+",
+        help="JSON files written by the shards with --export-json. Default of every shard: "
+        + SHARD_RESULTS_PATH,
+    )
+    merge_parser.add_argument(
+        "--table", action="store_true", help="Print results in a table format"
+    )
+    merge_parser.add_argument(
+        "--results-db",
+        default=RESULTS_DB_PATH,
+        help=f"JSON-lines file where the merged results are stored. Default: {RESULTS_DB_PATH}.",
+    )
     parser.add_argument(
         "--compile-only", action="store_true", help="Only compile the applications"
     )
     parser.add_argument(
         "--dry-run",
         action="store_true",
-        help="Print the commands that would be run without executing them",
+        help="Print the commands that would be run without executing them. The results of a dry run are only written to the --export-json and --export-junit files given.",
     )
     parser.add_argument(
         "--table", action="store_true", help="Print results in a table format"
@@ -89,8 +168,103 @@ def main():
         "--compiler-prefixes",
         help="Override default compiler prefixes. Can be a single prefix (shared among all the compilers) or a comma-separated list (a different prefix for each compiler).",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of apps to compile in parallel. Each job builds in its own folder under "
+        + JOBS_BUILD_DIR
+        + " and every app is simulated as soon as it is built. Default: 1 (sequential build in sw/build).",
+    )
+    parser.add_argument(
+        "--sim-jobs",
+        type=int,
+        default=1,
+        help="Number of simulations to run in parallel on the prebuilt model. Each simulation runs in its own folder under "
+        + SIM_FARM_DIR
+        + " while the next apps are compiled. Default: 1 (sequential simulation through make, unless --jobs is greater than 1).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always compile the applications and build the simulator models instead of restoring them from "
+        + ELF_CACHE_DIR
+        + " and "
+        + MODEL_CACHE_DIR,
+    )
+    parser.add_argument(
+        "--results-db",
+        default=RESULTS_DB_PATH,
+        help=f"JSON-lines file where the results are stored. Default: {RESULTS_DB_PATH}.",
+    )
+    parser.add_argument(
+        "--rerun-failed",
+        action="store_true",
+        help="Only test the apps whose last compilation or simulation in the results database failed",
+    )
+    parser.add_argument(
+        "--only-changed",
+        action="store_true",
+        help="Only test the apps whose sources or build configuration changed since they were last compiled",
+    )
+    parser.add_argument(
+        "--export-json",
+        help="Write the results and metrics (compile time, simulation time, cycles and cycles/s) of the run to this JSON file",
+    )
+    parser.add_argument(
+        "--export-junit",
+        help="Write the results and metrics of the run to this JUnit XML file",
+    )
+    parser.add_argument(
+        "--sim-timeout",
+        type=float,
+        help="Timeout in seconds for every simulation, instead of the timeouts learned from the results database. Overrides in test_config.json still apply.",
+    )
+    parser.add_argument(
+        "--shard",
+        help="Only test the apps of shard i out of N, given as i/N with i from 1 to N. The apps are split by their runtime in the results database, so every shard must use the same one. The shards do not store their results, merge-results does. Shards sharing a checkout can run at the same time: each one builds its apps and runs its simulations in its own folders under "
+        + JOBS_BUILD_DIR
+        + " and "
+        + SIM_FARM_DIR
+        + ", on its own copy of the models.",
+    )
     args = parser.parse_args()
 
+    if args.command == "merge-results":
+        merge_results(args.files, args.table, args.results_db)
+        return
+
+    shard = None
+    if args.shard:
+        shard = parse_shard(args.shard)
+        if shard is None:
+            print(
+                BColors.FAIL
+                + f"Error: Invalid shard {args.shard}, expected i/N with i from 1 to N."
+                + BColors.ENDC
+            )
+            exit(1)
+
+    # Every shard builds, simulates and exports its results in its own folders and file
+    jobs_build_dir = JOBS_BUILD_DIR
+    sim_farm_dir = SIM_FARM_DIR
+    export_json_path = args.export_json
+    if shard:
+        jobs_build_dir = os.path.join(JOBS_BUILD_DIR, f"shard-{shard[0]}")
+        sim_farm_dir = os.path.join(SIM_FARM_DIR, f"shard-{shard[0]}")
+        if not args.dry_run:
+            export_json_path = export_json_path or SHARD_RESULTS_PATH.format(
+                index=shard[0], count=shard[1]
+            )
+
+    if args.jobs < 1 or args.sim_jobs < 1:
+        print(
+            BColors.FAIL
+            + "Error: --jobs and --sim-jobs must be at least 1."
+            + BColors.ENDC
+        )
+        exit(1)
+
     # Override the default list of compilers if specified
     compilers = COMPILERS
     if args.compilers:
@@ -132,9 +306,95 @@ def main():
             )
             exit(1)
 
+    elf_cache = None
+    model_cache = None
+    if not args.no_cache:
+        elf_cache = ElfCache(ELF_CACHE_DIR, ELF_CACHE_MAX_SIZE_MB)
+        model_cache = ModelCache(
+            MODEL_CACHE_DIR, MODEL_CACHE_SOURCES, MODEL_CACHE_MAX_MODELS
+        )
+
     # Get a list with all the applications we want to test
     app_list = get_apps("sw/applications", WHITELIST, BLACKLIST)
 
+    for an_app in app_list:
+        if in_list(an_app.name, BLACKLIST):
+            continue
+        for compiler_path, compiler_prefix, compiler in zip(
+            compiler_paths, compiler_prefixes, compilers
+        ):
+            an_app.set_fingerprint(
+                compiler,
+                get_app_fingerprint(
+                    an_app.name,
+                    compiler_path,
+                    compiler_prefix,
+                    compiler,
+                    "on_chip",
+                    None,
+                ),
+            )
+
+    results_db = ResultsDB(args.results_db)
+    history = results_db.load()
+
+    # Learn the simulation timeouts from the previous runs, unless a fixed one is given
+    timeout_policy = TimeoutPolicy(
+        [] if args.sim_timeout else history,
+        args.sim_timeout or SIM_TIMEOUT_S,
+        SIM_TIMEOUT_FACTOR,
+        SIM_TIMEOUT_FLOOR_S,
+        SIM_TIMEOUT_CEILING_S,
+        SIM_TIMEOUT_MIN_SAMPLES,
+        SIM_TIMEOUT_MAX_SAMPLES,
+    )
+
+    # Only keep the apps that failed or changed since the last run if requested
+    if args.rerun_failed or args.only_changed:
+        selected_apps = set()
+        if args.rerun_failed:
+            selected_apps |= results_db.failed_apps()
+        if args.only_changed:
+            selected_apps |= results_db.changed_apps(app_list)
+        app_list = [an_app for an_app in app_list if an_app.name in selected_apps]
+
+        print(BColors.OKCYAN + "Apps selected from previous runs:" + BColors.ENDC)
+        for an_app in app_list:
+            if not in_list(an_app.name, BLACKLIST):
+                print(BColors.OKCYAN + f"    - {an_app.name}" + BColors.ENDC)
+
+    # Only keep the apps of the shard, balanced by their runtime in the previous runs.
+    #   The skipped apps are not split, every shard reports them.
+    if shard:
+        shard_apps = select_shard(
+            [an_app.name for an_app in app_list if not in_list(an_app.name, BLACKLIST)],
+            get_app_costs(history),
+            *shard,
+        )
+        app_list = [
+            an_app
+            for an_app in app_list
+            if an_app.name in shard_apps or in_list(an_app.name, BLACKLIST)
+        ]
+
+        print(BColors.OKCYAN + f"Apps of shard {args.shard}:" + BColors.ENDC)
+        for an_app in app_list:
+            if not in_list(an_app.name, BLACKLIST):
+                print(BColors.OKCYAN + f"    - {an_app.name}" + BColors.ENDC)
+
+    if not any(not in_list(an_app.name, BLACKLIST) for an_app in app_list):
+        print(BColors.OKGREEN + "Nothing to test." + BColors.ENDC)
+        # Still write the exports, so merge-results finds the file of every shard
+        if export_json_path:
+            export_json([], export_json_path)
+        if args.export_junit:
+            export_junit([], args.export_junit)
+        return
+
+    # Compile and simulate the apps at the same time, each stage with its own limit. The
+    #   shards always do, so they never share a build or simulation folder.
+    pipelined = args.jobs > 1 or args.sim_jobs > 1 or shard is not None
+
     simulators = []
     for simulator_name in SIMULATORS:
         error_pattern = ERROR_PATTERN_DICT.get(simulator_name)
@@ -145,11 +405,52 @@ def main():
                 + BColors.ENDC
             )
             exit(1)
-        simulators.append(Simulator(simulator_name, error_pattern))
+        model_command_target = MODEL_COMMAND_TARGET_DICT.get(simulator_name)
+        model_command = model_command_target and get_model_command(model_command_target)
+        if pipelined and not args.compile_only and not model_command:
+            print(
+                BColors.FAIL
+                + f"Error: Could not get the model command of simulator {simulator_name}."
+                + BColors.ENDC
+            )
+            exit(1)
+        simulators.append(
+            Simulator(
+                simulator_name,
+                error_pattern,
+                model_command,
+                CYCLES_PATTERN_DICT.get(simulator_name),
+            )
+        )
 
     if not args.compile_only:
-        for simulator in simulators:
-            simulator.build(args.dry_run, verbose=not args.table)
+        # The shards sharing a checkout build or restore the models one at a time, and
+        #   simulate on their own copy, which the next builds and restores do not touch
+        lock_file = None
+        if shard and not args.dry_run:
+            os.makedirs(os.path.dirname(MODEL_BUILD_LOCK), exist_ok=True)
+            lock_file = open(MODEL_BUILD_LOCK, "w")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            for simulator in simulators:
+                simulator.build(
+                    args.dry_run, verbose=not args.table, model_cache=model_cache
+                )
+                if lock_file:
+                    simulator.copy_model(os.path.join(sim_farm_dir, "models"))
+        finally:
+            if lock_file:
+                lock_file.close()
+
+    # Run the simulations in parallel on the models built above
+    sim_farm = None
+    if not args.compile_only and pipelined:
+        sim_farm = SimFarm(
+            sim_farm_dir,
+            args.sim_jobs,
+            args.dry_run,
+            verbose=not args.table,
+        )
 
     if args.table:
         max_app_name_len, max_col_width = print_table_header(
@@ -161,18 +462,75 @@ def main():
             simulators,
         )
 
-    # Compile every app and run with the simulators
+    def print_row(an_app):
+        if args.table:
+            print_table_row(
+                an_app,
+                max_app_name_len,
+                max_col_width,
+                compilers,
+                args.dry_run,
+                args.compile_only,
+                simulators,
+            )
+
+    # If an app is in the blacklist, print a message and skip it
     for an_app in app_list:
-        # If the app is in the blacklist, print a message and skip it
-        if in_list(an_app.name, BLACKLIST):
-            if not args.table:
-                print(
-                    BColors.WARNING + f"Skipping {an_app.name}..." + BColors.ENDC,
-                    flush=True,
-                )
-        else:
-            # Compile the app with every compiler, leaving gcc for last
-            #   so the simulation is done with gcc
+        if in_list(an_app.name, BLACKLIST) and not args.table:
+            print(
+                BColors.WARNING + f"Skipping {an_app.name}..." + BColors.ENDC,
+                flush=True,
+            )
+    tested_apps = [an_app for an_app in app_list if not in_list(an_app.name, BLACKLIST)]
+
+    if pipelined:
+        # Every app is simulated as soon as all its compilations are done, and its table
+        #   row is printed as soon as its simulations are done
+        compile_jobs = []
+        for an_app in tested_apps:
+            for compiler_path, compiler_prefix, compiler in zip(
+                compiler_paths, compiler_prefixes, compilers
+            ):
+                if in_list(an_app.name, CLANG_BLACKLIST) and compiler == "clang":
+                    an_app.set_compilation_status(compiler, None)  # Mark as skipped
+                else:
+                    compile_jobs.append(
+                        CompileJob(
+                            an_app.name,
+                            compiler_path,
+                            compiler_prefix,
+                            compiler,
+                            "on_chip",
+                            job_build_dir(jobs_build_dir, an_app.name, compiler),
+                        )
+                    )
+        try:
+            run_pipeline(
+                compile_jobs,
+                tested_apps,
+                args.jobs,
+                sim_farm,
+                lambda an_app: get_simulations(
+                    an_app, simulators, timeout_policy, verbose=not args.table
+                ),
+                print_row,
+                args.dry_run,
+                verbose=not args.table,
+                elf_cache=elf_cache,
+            )
+        except KeyboardInterrupt:
+            print(
+                BColors.WARNING
+                + "Interrupted, the pending compilations and simulations were cancelled."
+                + BColors.ENDC,
+                flush=True,
+            )
+            exit(130)
+    else:
+        # Compile every app and run with the simulators
+        for an_app in tested_apps:
+            # Compile the app with every compiler, leaving gcc for last so the simulation
+            #   is done with gcc
             for compiler_path, compiler_prefix, compiler in zip(
                 compiler_paths, compiler_prefixes, compilers
             ):
@@ -194,41 +552,40 @@ def main():
                         None,
                         args.dry_run,
                         verbose=not args.table,
+                        elf_cache=elf_cache,
                     )
                     an_app.set_compilation_status(compiler, compilation_result)
 
             # Run the app with every simulator if the compilation was successful
             if not args.compile_only and an_app.compilation_succeeded():
-                for simulator in simulators:
-                    # Only run the app with verilator if it is not in the verilator_blacklist
-                    if simulator.name == "verilator" and in_list(
-                        an_app.name, VERILATOR_BLACKLIST
-                    ):
-                        an_app.add_simulation_result(simulator.name, SimResult.SKIPPED)
-                        if not args.table:
-                            print(
-                                BColors.WARNING
-                                + f"Skipping running {an_app.name} with verilator..."
-                                + BColors.ENDC,
-                                flush=True,
-                            )
-                    else:
-                        simulation_result = simulator.run_app(
-                            an_app, SIM_TIMEOUT_S, args.dry_run, verbose=not args.table
-                        )
-                        an_app.add_simulation_result(simulator.name, simulation_result)
+                for simulator, simulation_timeout in get_simulations(
+                    an_app, simulators, timeout_policy, verbose=not args.table
+                ):
+                    simulation_result = simulator.run_app(
+                        an_app,
+                        simulation_timeout,
+                        args.dry_run,
+                        verbose=not args.table,
+                    )
+                    an_app.add_simulation_result(simulator.name, simulation_result)
 
             # Print table row if table mode is enabled
-            if args.table:
-                print_table_row(
-                    an_app,
-                    max_app_name_len,
-                    max_col_width,
-                    compilers,
-                    args.dry_run,
-                    args.compile_only,
-                    simulators,
-                )
+            print_row(an_app)
+
+    # Store the results to select the apps of the next runs, and export them. The
+    #   shards leave the results database untouched, so they all split the apps the same
+    #   way, and merge-results stores their results. The records of a dry run are only
+    #   exported, marked so that merge-results does not store them either.
+    records = get_records(app_list, BLACKLIST)
+    if args.dry_run:
+        for record in records:
+            record["dry_run"] = True
+    elif not shard:
+        results_db.append(records)
+    if export_json_path:
+        export_json(records, export_json_path)
+    if args.export_junit:
+        export_junit(records, args.export_junit)
 
     # Filter and print the results
     (
@@ -263,5 +620,148 @@ def main():
         exit(1)
 
 
+def get_simulations(
+    an_app: Application, simulators: list, timeout_policy: TimeoutPolicy, verbose: bool
+):
+    """
+    Get the simulations to run an_app with. The simulators the app is blacklisted for are
+    marked as skipped in an_app instead.
+
+    :param Application an_app: The application to simulate.
+    :param list simulators: The list of simulators to test the app with.
+    :param TimeoutPolicy timeout_policy: The policy giving the timeout of each simulation.
+    :param bool verbose: If True, print a message for every skipped simulation.
+
+    :return: A list of (Simulator, timeout in seconds) tuples.
+    """
+    simulations = []
+    for simulator in simulators:
+        # Only run the app with verilator if it is not in the verilator_blacklist
+        if simulator.name == "verilator" and in_list(an_app.name, VERILATOR_BLACKLIST):
+            an_app.add_simulation_result(simulator.name, SimResult.SKIPPED)
+            if verbose:
+                print(
+                    BColors.WARNING
+                    + f"Skipping running {an_app.name} with verilator..."
+                    + BColors.ENDC,
+                    flush=True,
+                )
+        else:
+            simulation_timeout = timeout_policy.get_timeout(
+                an_app.name, simulator.name, "sw/applications"
+            )
+            simulations.append((simulator, simulation_timeout))
+    return simulations
+
+
+def merge_results(files: list, table: bool, results_db_path: str):
+    """
+    Merge the results of several shards and print them as if they came from a single run.
+    It exits with error if any app failed to compile or run.
+
+    :param list files: The JSON files written by the shards with --export-json.
+    :param bool table: If True, print the results in a table format.
+    :param str results_db_path: The results database where the merged results are
+        stored.
+    """
+    records = []
+    seen = set()
+    duplicated_apps = set()
+    for path in files:
+        for record in load_json(path):
+            key = (record["app"], record["compiler"], record["simulator"])
+            if key in seen:
+                duplicated_apps.add(record["app"])
+            seen.add(key)
+            records.append(record)
+    for name in sorted(duplicated_apps):
+        print(
+            BColors.WARNING
+            + f"Warning: {name} was tested by several shards, keeping the last result."
+            + BColors.ENDC
+        )
+
+    # The records of dry runs are only merged to be printed
+    ResultsDB(results_db_path).append(
+        [record for record in records if not record.get("dry_run")]
+    )
+
+    # Every shard reports the skipped apps, so they are taken from the apps folder once
+    app_list = get_apps_from_records(records)
+    tested_apps = {an_app.name for an_app in app_list}
+    app_list += [
+        Application(name)
+        for name in sorted(os.listdir("sw/applications"))
+        if in_list(name, BLACKLIST)
+        and (not WHITELIST or in_list(name, WHITELIST))
+        and name not in tested_apps
+    ]
+
+    (
+        skipped_apps,
+        ok_apps,
+        compilation_failed_apps,
+        simulation_failed_apps,
+        simulation_timed_out_apps,
+    ) = filter_results(app_list, BLACKLIST)
+
+    if not table:
+        print_results(
+            app_list,
+            skipped_apps,
+            ok_apps,
+            compilation_failed_apps,
+            simulation_failed_apps,
+            simulation_timed_out_apps,
+        )
+    else:
+        compilers = []
+        simulator_names = []
+        for record in records:
+            if record["simulator"] is None and record["compiler"] not in compilers:
+                compilers.append(record["compiler"])
+            elif record["simulator"] and record["simulator"] not in simulator_names:
+                simulator_names.append(record["simulator"])
+        prefixes = dict(zip(COMPILERS, COMPILER_PREFIXES))
+        compiler_prefixes = [prefixes.get(compiler, "") for compiler in compilers]
+        simulators = [
+            Simulator(name, ERROR_PATTERN_DICT.get(name)) for name in simulator_names
+        ]
+        compile_only = not simulators
+
+        if any(not in_list(an_app.name, BLACKLIST) for an_app in app_list):
+            max_app_name_len, max_col_width = print_table_header(
+                app_list,
+                BLACKLIST,
+                compilers,
+                compiler_prefixes,
+                compile_only,
+                simulators,
+            )
+            for an_app in app_list:
+                if not in_list(an_app.name, BLACKLIST):
+                    print_table_row(
+                        an_app,
+                        max_app_name_len,
+                        max_col_width,
+                        compilers,
+                        False,
+                        compile_only,
+                        simulators,
+                    )
+        print_table_summary(
+            app_list,
+            skipped_apps,
+            ok_apps,
+            compilation_failed_apps,
+            simulation_failed_apps,
+            simulation_timed_out_apps,
+        )
+
+    # Exit with error if any app failed to compile or run
+    if len(compilation_failed_apps) > 0 or len(simulation_failed_apps) > 0:
+        exit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import math
+import os
+
+from simulator import SimResult
+
+# File next to the sources of an app that overrides its simulation timeout. It holds
+# {"sim_timeout_s": <seconds>} or {"sim_timeout_s": {"<simulator>": <seconds>}}.
+APP_CONFIG_FILE = "test_config.json"
+
+
+def percentile(values: list, pct: float):
+    """
+    Get the pct percentile of values with the nearest-rank method.
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class TimeoutPolicy:
+    """
+    Derives the simulation timeout of every (app, simulator) from the wall time of its
+    previous passing simulations, so hung short apps fail fast while long apps get
+    enough time. Apps without enough history get the default timeout.
+    """
+
+    def __init__(
+        self,
+        records: list,
+        default_s: float,
+        factor: float,
+        floor_s: float,
+        ceiling_s: float,
+        min_samples: int,
+        max_samples: int,
+    ):
+        """
+        Constructor for TimeoutPolicy.
+
+        :param list records: The records of the previous runs, oldest first.
+        :param float default_s: The timeout of the simulations without enough history.
+        :param float factor: The factor applied to the p95 of the previous wall times.
+        :param float floor_s: The minimum timeout derived from the history.
+        :param float ceiling_s: The maximum timeout derived from the history.
+        :param int min_samples: The number of previous simulations needed to derive a
+            timeout.
+        :param int max_samples: The number of most recent simulations considered.
+        """
+        self.default_s = default_s
+        self.factor = factor
+        self.floor_s = floor_s
+        self.ceiling_s = ceiling_s
+        self.min_samples = min_samples
+
+        # Wall times of the passing simulations. Key is the (app, simulator) tuple.
+        self.history: dict = {}
+        for record in records:
+            if record["simulator"] is None or record["verdict"] != SimResult.PASSED:
+                continue
+            if record.get("wall_time_s") is None:
+                continue
+            key = (record["app"], record["simulator"])
+            self.history.setdefault(key, []).append(record["wall_time_s"])
+        for key, wall_times in self.history.items():
+            self.history[key] = wall_times[-max_samples:]
+
+    def get_timeout(self, app_name: str, simulator_name: str, apps_dir: str):
+        """
+        Get the timeout in seconds for simulating the app with the simulator. An override
+        in the APP_CONFIG_FILE of the app has priority over the history.
+        """
+        override = get_timeout_override(app_name, simulator_name, apps_dir)
+        if override is not None:
+            return override
+
+        wall_times = self.history.get((app_name, simulator_name), [])
+        if len(wall_times) < self.min_samples:
+            return self.default_s
+
+        timeout_s = percentile(wall_times, 95) * self.factor
+        return min(max(timeout_s, self.floor_s), self.ceiling_s)
+
+
+def get_timeout_override(app_name: str, simulator_name: str, apps_dir: str):
+    """
+    Get the simulation timeout declared in the APP_CONFIG_FILE of the app, or None if it
+    does not declare one for the simulator.
+    """
+    config_path = os.path.join(apps_dir, app_name, APP_CONFIG_FILE)
+    if not os.path.exists(config_path):
+        return None
+
+    with open(config_path, "r") as file:
+        timeout_s = json.load(file).get("sim_timeout_s")
+    if isinstance(timeout_s, dict):
+        timeout_s = timeout_s.get(simulator_name)
+    return timeout_s
@@ -44,6 +44,55 @@ def get_apps(apps_dir: str, whitelist: list, blacklist: list):
     return app_list
 
 
+def get_cycles_per_s(metrics: dict):
+    """
+    Get the simulation speed in cycles per second from the metrics of a simulation, or
+    None if the cycles or the wall time are unknown.
+    """
+    if not metrics.get("cycles") or not metrics.get("wall_time_s"):
+        return None
+    return metrics["cycles"] / metrics["wall_time_s"]
+
+
+def get_metric_columns(compile_only: bool, simulators: list):
+    """
+    Get the labels of the metric columns of the results table.
+
+    :param bool compile_only: If True, only the compilation metrics are shown.
+    :param list simulators: The list of simulators used for testing.
+    """
+    columns = ["compile(s)"]
+    if not compile_only:
+        for simulator in simulators:
+            columns += [
+                f"{simulator.name}(s)",
+                f"{simulator.name} cycles",
+                f"{simulator.name} cyc/s",
+            ]
+    return columns
+
+
+def get_metric_values(an_app: Application, compile_only: bool, simulators: list):
+    """
+    Get the values of the metric columns of the results table for an application, in the
+    order of get_metric_columns. Unknown values are shown as "-".
+    """
+    compile_time = sum(an_app.compile_times.values())
+    values = [f"{compile_time:.1f}" if an_app.compile_times else "-"]
+    if not compile_only:
+        for simulator in simulators:
+            metrics = an_app.simulation_metrics.get(simulator.name, {})
+            wall_time_s = metrics.get("wall_time_s")
+            cycles = metrics.get("cycles")
+            cycles_per_s = get_cycles_per_s(metrics)
+            values += [
+                f"{wall_time_s:.1f}" if wall_time_s is not None else "-",
+                str(cycles) if cycles is not None else "-",
+                f"{cycles_per_s:.0f}" if cycles_per_s is not None else "-",
+            ]
+    return values
+
+
 def filter_results(app_list: list, blacklist: list):
     """
     Filters the results from compiling or running the apps and divides
@@ -191,7 +240,7 @@ def print_table_header(
     :param list simulators: The list of simulators to use for testing.
 
     :return: The maximum width of the application name column and the maximum width of
-        the compiler/simulator result columns.
+        the compiler/simulator result and metric columns.
     """
     # Calculate column widths
     max_app_name_len = max(
@@ -204,6 +253,8 @@ def print_table_header(
     for compiler, prefix in zip(compilers, compiler_prefixes):
         col_name = f"{compiler}({prefix})"
         max_col_width = max(max_col_width, len(col_name))
+    for column in get_metric_columns(compile_only, simulators):
+        max_col_width = max(max_col_width, len(column))
 
     # Print header
     header = f"{'Application':<{max_app_name_len}}"
@@ -213,6 +264,8 @@ def print_table_header(
     if not compile_only:
         for simulator in simulators:
             header += f" | {simulator.name:>{max_col_width}}"
+    for column in get_metric_columns(compile_only, simulators):
+        header += f" | {column:>{max_col_width}}"
     print(BColors.BOLD + header + BColors.ENDC)
     print(BColors.BOLD + "-" * len(header) + BColors.ENDC)
 
@@ -280,6 +333,9 @@ def print_table_row(
                 color = BColors.FAIL
             row += f" | {color}{status:>{max_col_width}}{BColors.ENDC}"
 
+    for value in get_metric_values(an_app, compile_only, simulators):
+        row += f" | {value:>{max_col_width}}"
+
     print(row, flush=True)
 
 
@@ -5,6 +5,11 @@ import os
 import re
 import subprocess
 import hashlib
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
@@ -13,6 +18,8 @@ except ImportError:
     print("Error: 'hjson' module is required. Install with 'pip install hjson'.")
     sys.exit(1)
 
+from vendor import get_git_ignored, get_mirror_path
+
 # Terminal coloring
 RED = "\033[91m"
 GREEN = "\033[92m"
@@ -22,8 +29,52 @@ RESET = "\033[0m"
 # Global cache for resolved revisions to avoid redundant network calls
 REVISION_CACHE = {}
 
-def resolve_to_hash(url, rev):
-    """Resolve a git revision (tag, branch, or short hash) to a full commit hash."""
+# On-disk cache of the resolved revisions, shared between runs.
+# Format: { 'url rev': {'hash': str, 'time': float}, ... }
+REVISION_CACHE_FILE = "~/.cache/xalp/check-vendor-revisions.json"
+# Resolved branches and tags are fetched again after this many seconds
+REVISION_CACHE_TTL = 24 * 60 * 60
+
+def load_revision_cache(cache_file=REVISION_CACHE_FILE):
+    """Load the on-disk cache of resolved revisions. Returns an empty one if it is missing or broken."""
+    try:
+        with open(os.path.expanduser(cache_file), 'r') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_revision_cache(cache, cache_file=REVISION_CACHE_FILE):
+    """Write the on-disk cache of resolved revisions atomically."""
+    cache_file = os.path.expanduser(cache_file)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_file), prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        print(f"{YELLOW}Warning: Could not write revision cache {cache_file}: {e}{RESET}")
+
+def resolve_in_mirror(url, rev):
+    """Resolve a revision with the local mirror of util/vendor.py, without network access."""
+    mirror_dir = get_mirror_path(url)
+    if not mirror_dir.is_dir():
+        return None
+    result = subprocess.run(
+        ['git', '-C', str(mirror_dir), 'rev-parse', '-q', '--verify', rev + '^{commit}'],
+        capture_output=True, text=True
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def resolve_to_hash(url, rev, disk_cache=None, offline=False, ttl=REVISION_CACHE_TTL):
+    """
+    Resolve a git revision (tag, branch, or short hash) to a full commit hash.
+
+    Fresh entries of disk_cache are used instead of calling git ls-remote, and new
+    resolutions are added to it. In offline mode, only disk_cache (at any age) and the
+    local mirror of util/vendor.py are used.
+    """
     cache_key = (url, rev)
     if cache_key in REVISION_CACHE:
         return REVISION_CACHE[cache_key]
@@ -33,25 +84,155 @@ def resolve_to_hash(url, rev):
         REVISION_CACHE[cache_key] = rev
         return rev
 
+    disk_key = f"{url} {rev}"
+    cached = disk_cache.get(disk_key) if disk_cache is not None else None
+    if cached is not None and (offline or time.time() - cached['time'] < ttl):
+        REVISION_CACHE[cache_key] = cached['hash']
+        return cached['hash']
+
+    resolved = None
+    if offline:
+        resolved = resolve_in_mirror(url, rev)
+    else:
+        try:
+            # Try to resolve via git ls-remote
+            result = subprocess.run(
+                ['git', 'ls-remote', url, rev],
+                capture_output=True, text=True, timeout=10,
+                env=dict(os.environ, GIT_TERMINAL_PROMPT='0')
+            )
+            if result.returncode == 0 and result.stdout:
+                lines = result.stdout.strip().split('\n')
+                # Prefer the peeled tag (hash^{}) if it exists
+                peeled = [l for l in lines if l.endswith('^{}')]
+                resolved = peeled[0].split('\t')[0] if peeled else lines[0].split('\t')[0]
+        except Exception:
+            pass
+
+    if resolved is None:
+        # Fall back to a stale cache entry, then to the original rev
+        resolved = cached['hash'] if cached is not None else rev
+    elif disk_cache is not None:
+        disk_cache[disk_key] = {'hash': resolved, 'time': time.time()}
+
+    REVISION_CACHE[cache_key] = resolved
+    return resolved
+
+def resolve_all(revisions, disk_cache=None, offline=False, ttl=REVISION_CACHE_TTL, jobs=16):
+    """
+    Resolve a list of (url, rev) tuples at the same time, filling REVISION_CACHE.
+
+    Every git ls-remote runs in its own thread, so the total time is the one of the
+    slowest remote instead of the sum of all of them.
+    """
+    pending = sorted(set(revisions) - set(REVISION_CACHE))
+    if not pending:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(pending)))) as executor:
+        list(executor.map(
+            lambda revision: resolve_to_hash(*revision, disk_cache, offline, ttl), pending
+        ))
+
+# Local index of the vendored files, one per target directory.
+# Format: { 'time': int, 'files': { 'relative/path': [size, mtime_ns, sha256], ... } }
+INDEX_DIR = "~/.cache/xalp/vendor-index"
+# Files modified this close (in ns) to the index write are hashed again, as a later
+# change within the timestamp granularity of the file system would not be visible
+INDEX_RACY_NS = 2 * 10**9
+
+def load_lock_manifest(v_file, project_name, is_multi, lock_cache):
+    """
+    Get the manifest ('files' field) of the lock entry of a vendored project, written by
+    util/vendor.py --manifest. Returns None if the lock entry has none.
+
+    lock_cache maps the lock file paths to their parsed content, so the lock file of a
+    multi-entry vendor file is only parsed once.
+    """
+    if is_multi:
+        lock_path = v_file.with_name("vendor.lock.hjson")
+    else:
+        lock_path = v_file.with_name(v_file.name.rsplit(".", 2)[0] + ".lock.hjson")
+    if lock_path not in lock_cache:
+        try:
+            with open(lock_path, 'r') as f:
+                lock_cache[lock_path] = hjson.load(f)
+        except (OSError, ValueError):
+            lock_cache[lock_path] = {}
+    data = lock_cache[lock_path]
+    entry = data if not is_multi and "upstream" in data else data.get(project_name)
+    if not isinstance(entry, dict):
+        return None
+    return entry.get("files")
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def verify_vendor_tree(target_path, manifest, executor, index_dir=INDEX_DIR):
+    """
+    Compare the files of a vendored tree with the manifest of its lock entry.
+
+    The files git ignores (e.g. the __pycache__ of the tools run from the tree) are
+    skipped. The size, mtime and hash of every other file are kept in a local index, so
+    only the files whose size or mtime changed since the last run are hashed again, in
+    executor.
+
+    Returns the (modified, missing, added) sorted lists of relative paths.
+    """
+    target_path = Path(target_path).resolve()
+    index_dir = os.path.expanduser(index_dir)
+    index_key = hashlib.sha256(str(target_path).encode()).hexdigest()[:16]
+    index_path = os.path.join(index_dir, f"{target_path.name}-{index_key}.json")
+    try:
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        index_time = index['time']
+        index_files = index['files']
+    except (OSError, ValueError, KeyError, TypeError):
+        index_time = 0
+        index_files = {}
+
+    rel_paths = [
+        Path(root, name).relative_to(target_path).as_posix()
+        for root, _, names in os.walk(target_path)
+        for name in names
+    ]
+    ignored = get_git_ignored(target_path, rel_paths)
+
+    # Stat every file and reuse the hash of the ones that did not change
+    stats = {}
+    hashes = {}
+    for rel_path in rel_paths:
+        if rel_path in ignored:
+            continue
+        st = os.stat(target_path / rel_path)
+        stats[rel_path] = [st.st_size, st.st_mtime_ns]
+        entry = index_files.get(rel_path)
+        if (entry is not None and entry[:2] == stats[rel_path]
+                and st.st_mtime_ns + INDEX_RACY_NS < index_time):
+            hashes[rel_path] = entry[2]
+
+    to_hash = sorted(stats.keys() - hashes.keys())
+    for rel_path, digest in zip(to_hash, executor.map(
+            lambda rel_path: hash_file(target_path / rel_path), to_hash)):
+        hashes[rel_path] = digest
+
     try:
-        # Try to resolve via git ls-remote
-        result = subprocess.run(
-            ['git', 'ls-remote', url, rev],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode == 0 and result.stdout:
-            lines = result.stdout.strip().split('\n')
-            # Prefer the peeled tag (hash^{}) if it exists
-            peeled = [l for l in lines if l.endswith('^{}')]
-            resolved = peeled[0].split('\t')[0] if peeled else lines[0].split('\t')[0]
-            REVISION_CACHE[cache_key] = resolved
-            return resolved
-    except Exception:
-        pass
-
-    # Fallback to original rev if resolution fails
-    REVISION_CACHE[cache_key] = rev
-    return rev
+        os.makedirs(index_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'time': time.time_ns(),
+                'files': {rel_path: stats[rel_path] + [hashes[rel_path]] for rel_path in sorted(stats)},
+            }, f)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"{YELLOW}Warning: Could not write vendor index {index_path}: {e}{RESET}")
+
+    modified = sorted(p for p in manifest if p in hashes and hashes[p] != manifest[p])
+    missing = sorted(manifest.keys() - hashes.keys())
+    added = sorted(hashes.keys() - manifest.keys())
+    return modified, missing, added
 
 def normalize_url(url):
     """Normalize URL to ensure accurate duplicate matching."""
@@ -68,12 +249,13 @@ def normalize_url(url):
         url = url[:-1]
     return url
 
-def check_dependencies(search_path="."):
+def check_dependencies(search_path=".", offline=False, ttl=REVISION_CACHE_TTL, jobs=16):
     vendor_files = list(Path(search_path).rglob("*.vendor.hjson"))
 
     # Dictionary to group dependencies by normalized URL
     # Format: { 'url': [ {'path': Path, 'rev': str, 'target': str, 'pulled_in': bool, 'patches': list}, ... ] }
     deps_by_url = {}
+    lock_cache = {}
 
     for v_file in vendor_files:
         try:
@@ -145,18 +327,41 @@ def check_dependencies(search_path="."):
                     'rev': rev,
                     'target': target_path,
                     'pulled_in': is_pulled_in,
-                    'patches': patches
+                    'patches': patches,
+                    'manifest': load_lock_manifest(v_file, project_name, is_multi, lock_cache),
+                    'tree_changes': None
                 })
             
         except Exception as e:
             print(f"{YELLOW}Warning: Could not parse {v_file}: {e}{RESET}")
 
     global_errors = 0
+    tree_errors = 0
+
+    # Verify the vendored trees against the manifest of their lock entry
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for entries in deps_by_url.values():
+            for entry in entries:
+                if entry['pulled_in'] and entry['manifest'] is not None:
+                    changes = verify_vendor_tree(entry['target'], entry['manifest'], executor)
+                    if any(changes):
+                        entry['tree_changes'] = changes
+                        tree_errors += 1
 
     print(f"Checking {len(deps_by_url)} unique dependencies...\n")
     print(f"{'STATUS':<15} {'REPOSITORY':<60} {'REVISION':<40} {'LOCATION'}")
     print("-" * 180)
 
+    # Resolve the revisions of all the duplicates at once
+    disk_cache = load_revision_cache()
+    resolve_all(
+        [(entry['url'], entry['rev'])
+         for entries in deps_by_url.values() if len(entries) > 1
+         for entry in entries],
+        disk_cache, offline, ttl, jobs
+    )
+    save_revision_cache(disk_cache)
+
     # Evaluate dependencies
     for norm_url in sorted(deps_by_url.keys()):
         entries = deps_by_url[norm_url]
@@ -190,6 +395,8 @@ def check_dependencies(search_path="."):
                 issues.append("MISMATCH")
             if patch_mismatch:
                 issues.append("PATCH MISMATCH")
+            if entry['tree_changes']:
+                issues.append("MODIFIED")
 
             if issues:
                 status_color = RED
@@ -271,6 +478,28 @@ def check_dependencies(search_path="."):
                 print(f"  * Duplicate instantiation: IP is pulled into multiple directories.")
                 
 
+    # Detailed reports of the vendored trees modified since their import
+    for norm_url in sorted(deps_by_url.keys()):
+        for entry in deps_by_url[norm_url]:
+            if not entry['tree_changes']:
+                continue
+            modified, missing, added = entry['tree_changes']
+
+            print(f"\n{'-'*80}")
+            print(f"Local Modifications Detected in: {entry['target']}")
+            print(f"{'-'*80}")
+            for label, paths in (("Modified", modified), ("Missing", missing), ("Added", added)):
+                for path in paths:
+                    print(f"  {RED}{label + ':':<10}{RESET}{path}")
+
+    if tree_errors > 0:
+        print(f"\n{RED}Failure: Found {tree_errors} vendored tree(s) that differ from their lock file.{RESET}")
+        print("\nREQUIRED ACTION:")
+        print("  1. Capture the local changes as patches in the 'patch_dir' of the .vendor.hjson file, or revert them.")
+        print("  2. Run the 'vendor-update' target again.")
+        if global_errors == 0:
+            sys.exit(1)
+
     if global_errors > 0:
         print(f"\n{RED}Failure: Found {global_errors} dependency collision(s) requiring resolution.{RESET}")
         print("\nREQUIRED ACTION:")
@@ -284,5 +513,13 @@ def check_dependencies(search_path="."):
         sys.exit(0)
 
 if __name__ == "__main__":
-    check_dependencies()
+    parser = argparse.ArgumentParser(description="Check the vendored dependencies for collisions")
+    parser.add_argument('--offline', action='store_true',
+                        help="Resolve revisions only from the cache and the local mirrors, without network access")
+    parser.add_argument('--ttl', type=int, default=REVISION_CACHE_TTL,
+                        help="Seconds after which cached branch and tag resolutions are fetched again (default: %(default)s)")
+    parser.add_argument('--jobs', '-j', type=int, default=16,
+                        help="Number of revisions resolved at the same time (default: %(default)s)")
+    args = parser.parse_args()
+    check_dependencies(offline=args.offline, ttl=args.ttl, jobs=args.jobs)
     sys.exit(0)
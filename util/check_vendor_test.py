@@ -0,0 +1,96 @@
+# Copyright 2026 EPFL
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import importlib.util
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vendor import get_git_ignored, get_tree_manifest  # noqa: E402
+
+# check-vendor.py cannot be imported with an import statement
+spec = importlib.util.spec_from_file_location(
+    "check_vendor",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "check-vendor.py"),
+)
+check_vendor = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(check_vendor)
+
+# Modification time of the files of the tree, old enough for the index to trust it
+OLD_MTIME_S = 1000000000
+
+
+class RecordingExecutor:
+    """
+    Runs the hashes in the calling thread and records the files they were called on.
+    """
+
+    def __init__(self):
+        self.hashed = []
+
+    def map(self, function, rel_paths):
+        rel_paths = list(rel_paths)
+        self.hashed += rel_paths
+        return [function(rel_path) for rel_path in rel_paths]
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+    os.utime(path, (OLD_MTIME_S, OLD_MTIME_S))
+
+
+def make_vendored_tree(tmp_path):
+    """
+    Create a git work tree ignoring the Python caches, with a vendored tree in it.
+
+    :return: The vendored tree and the manifest of its files.
+    """
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / ".gitignore").write_text("__pycache__/\n*.pyc\n")
+    target = tmp_path / "hw" / "vendor" / "upstream"
+    for rel_path in ["a.sv", "b.sv", "util/tool.py"]:
+        write_file(str(target / rel_path), rel_path + "\n")
+    return target, get_tree_manifest(target)
+
+
+def test_get_git_ignored(tmp_path):
+    target, _ = make_vendored_tree(tmp_path)
+    rel_paths = ["a.sv", "util/__pycache__/tool.cpython-311.pyc", "util/old.pyc"]
+    assert get_git_ignored(target, rel_paths) == {
+        "util/__pycache__/tool.cpython-311.pyc",
+        "util/old.pyc",
+    }
+    assert get_git_ignored(target, []) == set()
+
+
+def test_verify_vendor_tree(tmp_path):
+    target, manifest = make_vendored_tree(tmp_path)
+    index_dir = str(tmp_path / "index")
+
+    write_file(str(target / "a.sv"), "locally modified\n")
+    os.unlink(str(target / "b.sv"))
+    write_file(str(target / "c.sv"), "added\n")
+    write_file(str(target / "util/__pycache__/tool.cpython-311.pyc"), "cache\n")
+
+    executor = RecordingExecutor()
+    changes = check_vendor.verify_vendor_tree(target, manifest, executor, index_dir)
+    assert changes == (["a.sv"], ["b.sv"], ["c.sv"])
+    assert sorted(executor.hashed) == ["a.sv", "c.sv", "util/tool.py"]
+
+    # The files that did not change since the last run are not hashed again
+    executor = RecordingExecutor()
+    changes = check_vendor.verify_vendor_tree(target, manifest, executor, index_dir)
+    assert changes == (["a.sv"], ["b.sv"], ["c.sv"])
+    assert executor.hashed == []
+
+    # Restoring a file is seen through its new size and modification time
+    write_file(str(target / "a.sv"), "a.sv\n")
+    executor = RecordingExecutor()
+    changes = check_vendor.verify_vendor_tree(target, manifest, executor, index_dir)
+    assert changes == ([], ["b.sv"], ["c.sv"])
+    assert executor.hashed == ["a.sv"]
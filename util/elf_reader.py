@@ -0,0 +1,341 @@
+# Copyright EPFL contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Info: Minimal reader of ELF32 and ELF64 files. It maps the file in memory and decodes the
+# program headers, the section headers and the symbol table with struct, so the memory
+# usage report does not depend on a host readelf.
+
+import mmap
+import struct
+
+ELF_MAGIC = b"\x7fELF"
+
+# e_ident[EI_CLASS] and e_ident[EI_DATA]
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+BYTE_ORDERS = {1: "<", 2: ">"}
+
+# Layout of the file header (after e_ident), of a program header, of a section header and
+# of a symbol for each ELF class, as (struct format, field names).
+FILE_HEADER = {
+    ELFCLASS32: (
+        "HHIIIIIHHHHHH",
+        (
+            "e_type",
+            "e_machine",
+            "e_version",
+            "e_entry",
+            "e_phoff",
+            "e_shoff",
+            "e_flags",
+            "e_ehsize",
+            "e_phentsize",
+            "e_phnum",
+            "e_shentsize",
+            "e_shnum",
+            "e_shstrndx",
+        ),
+    ),
+    ELFCLASS64: (
+        "HHIQQQIHHHHHH",
+        (
+            "e_type",
+            "e_machine",
+            "e_version",
+            "e_entry",
+            "e_phoff",
+            "e_shoff",
+            "e_flags",
+            "e_ehsize",
+            "e_phentsize",
+            "e_phnum",
+            "e_shentsize",
+            "e_shnum",
+            "e_shstrndx",
+        ),
+    ),
+}
+PROGRAM_HEADER = {
+    ELFCLASS32: (
+        "IIIIIIII",
+        (
+            "p_type",
+            "p_offset",
+            "p_vaddr",
+            "p_paddr",
+            "p_filesz",
+            "p_memsz",
+            "p_flags",
+            "p_align",
+        ),
+    ),
+    ELFCLASS64: (
+        "IIQQQQQQ",
+        (
+            "p_type",
+            "p_flags",
+            "p_offset",
+            "p_vaddr",
+            "p_paddr",
+            "p_filesz",
+            "p_memsz",
+            "p_align",
+        ),
+    ),
+}
+SECTION_HEADER = {
+    ELFCLASS32: (
+        "IIIIIIIIII",
+        (
+            "sh_name",
+            "sh_type",
+            "sh_flags",
+            "sh_addr",
+            "sh_offset",
+            "sh_size",
+            "sh_link",
+            "sh_info",
+            "sh_addralign",
+            "sh_entsize",
+        ),
+    ),
+    ELFCLASS64: (
+        "IIQQQQIIQQ",
+        (
+            "sh_name",
+            "sh_type",
+            "sh_flags",
+            "sh_addr",
+            "sh_offset",
+            "sh_size",
+            "sh_link",
+            "sh_info",
+            "sh_addralign",
+            "sh_entsize",
+        ),
+    ),
+}
+SYMBOL = {
+    ELFCLASS32: (
+        "IIIBBH",
+        ("st_name", "st_value", "st_size", "st_info", "st_other", "st_shndx"),
+    ),
+    ELFCLASS64: (
+        "IBBHQQ",
+        ("st_name", "st_info", "st_other", "st_shndx", "st_value", "st_size"),
+    ),
+}
+
+# Names of the segment types, as printed by readelf
+SEGMENT_TYPES = {
+    0: "NULL",
+    1: "LOAD",
+    2: "DYNAMIC",
+    3: "INTERP",
+    4: "NOTE",
+    5: "SHLIB",
+    6: "PHDR",
+    7: "TLS",
+    0x6474E550: "GNU_EH_FRAME",
+    0x6474E551: "GNU_STACK",
+    0x6474E552: "GNU_RELRO",
+    0x6474E553: "GNU_PROPERTY",
+    0x70000003: "RISCV_ATTRIBUTES",
+}
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_NOTE = 4
+PT_PHDR = 6
+PT_TLS = 7
+PT_GNU_EH_FRAME = 0x6474E550
+PT_GNU_STACK = 0x6474E551
+PT_GNU_RELRO = 0x6474E552
+
+# Segments that can only hold allocated sections
+ALLOC_SEGMENT_TYPES = (PT_LOAD, PT_DYNAMIC, PT_GNU_EH_FRAME, PT_GNU_STACK, PT_GNU_RELRO)
+
+# Section types and flags
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+SHF_ALLOC = 0x2
+SHF_TLS = 0x400
+
+# Names of the symbol types and bindings (st_info), as printed by readelf
+SYMBOL_TYPES = {0: "NOTYPE", 1: "OBJECT", 2: "FUNC", 3: "SECTION", 4: "FILE", 6: "TLS"}
+SYMBOL_BINDS = {0: "LOCAL", 1: "GLOBAL", 2: "WEAK"}
+
+# Special section indexes of the symbols
+SHN_UNDEF = 0
+SHN_LORESERVE = 0xFF00
+
+
+def read_string(data, offset):
+    """
+    Read the NUL-terminated string at offset of a string table.
+    """
+    end = data.find(b"\0", offset)
+    return data[offset:end].decode("utf-8", errors="replace")
+
+
+def section_in_segment(section, segment):
+    """
+    Check if a section belongs to a segment, with the rules readelf follows to print the
+    "Section to Segment mapping" (ELF_SECTION_IN_SEGMENT_STRICT in binutils).
+    """
+    p_type = segment["p_type"]
+    is_tls = section["sh_flags"] & SHF_TLS
+    is_alloc = section["sh_flags"] & SHF_ALLOC
+    is_nobits = section["sh_type"] == SHT_NOBITS
+
+    # The .tbss sections only take space in the TLS segment
+    if is_tls and is_nobits and p_type != PT_TLS:
+        return False
+    # Only the TLS, LOAD and RELRO segments hold TLS sections, and the TLS segment only
+    #   holds TLS sections
+    if is_tls and p_type not in (PT_TLS, PT_GNU_RELRO, PT_LOAD):
+        return False
+    if not is_tls and p_type in (PT_TLS, PT_PHDR):
+        return False
+    # The loaded segments only hold allocated sections
+    if not is_alloc and p_type in ALLOC_SEGMENT_TYPES:
+        return False
+
+    # The sections with contents must be within the file image of the segment, and the
+    #   allocated ones within its memory image. Empty sections must start inside.
+    size = section["sh_size"]
+    if not is_nobits:
+        offset = section["sh_offset"] - segment["p_offset"]
+        if offset < 0 or offset + size > segment["p_filesz"]:
+            return False
+        if segment["p_filesz"] and offset > segment["p_filesz"] - 1:
+            return False
+    if is_alloc:
+        address = section["sh_addr"] - segment["p_vaddr"]
+        if address < 0 or address + size > segment["p_memsz"]:
+            return False
+        if segment["p_memsz"] and address > segment["p_memsz"] - 1:
+            return False
+
+    # No empty sections at the edges of the DYNAMIC and NOTE segments
+    if p_type in (PT_DYNAMIC, PT_NOTE) and size == 0 and segment["p_memsz"]:
+        if not is_nobits and not 0 < offset < segment["p_filesz"]:
+            return False
+        if is_alloc and not 0 < address < segment["p_memsz"]:
+            return False
+
+    return True
+
+
+class ElfFile:
+    """
+    Program headers, section headers and symbols of an ELF32 or ELF64 file.
+    """
+
+    def __init__(self, elf_path: str):
+        """
+        Constructor for ElfFile. Reads the whole structure of the file at once.
+
+        :param str elf_path: The ELF file to read.
+
+        :raises ValueError: If the file is not a valid ELF file.
+        """
+        self.path = elf_path
+
+        with open(elf_path, "rb") as file:
+            try:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{elf_path} is empty")
+            with data:
+                try:
+                    self.parse(data)
+                except struct.error:
+                    raise ValueError(f"{elf_path} is truncated")
+
+    def parse(self, data):
+        """
+        Decode the headers, sections and symbols from the mapped file.
+        """
+        if data[:4] != ELF_MAGIC:
+            raise ValueError(f"{self.path} is not an ELF file")
+        self.elf_class = data[4]
+        if self.elf_class not in (ELFCLASS32, ELFCLASS64):
+            raise ValueError(f"{self.path} has an unknown ELF class {self.elf_class}")
+        if data[5] not in BYTE_ORDERS:
+            raise ValueError(f"{self.path} has an unknown byte order {data[5]}")
+        byte_order = BYTE_ORDERS[data[5]]
+
+        def unpack_table(layout, offset, count, entry_size):
+            fmt, names = layout[self.elf_class]
+            fmt = byte_order + fmt
+            return [
+                dict(zip(names, struct.unpack_from(fmt, data, offset + i * entry_size)))
+                for i in range(count)
+            ]
+
+        self.header = unpack_table(FILE_HEADER, 16, 1, 0)[0]
+
+        self.program_headers = unpack_table(
+            PROGRAM_HEADER,
+            self.header["e_phoff"],
+            self.header["e_phnum"],
+            self.header["e_phentsize"],
+        )
+        for segment in self.program_headers:
+            segment["type"] = SEGMENT_TYPES.get(
+                segment["p_type"], f"0x{segment['p_type']:x}"
+            )
+
+        self.section_headers = unpack_table(
+            SECTION_HEADER,
+            self.header["e_shoff"],
+            self.header["e_shnum"] if self.header["e_shoff"] else 0,
+            self.header["e_shentsize"],
+        )
+        if self.section_headers:
+            names = self.section_headers[self.header["e_shstrndx"]]
+            for section in self.section_headers:
+                section["name"] = read_string(
+                    data, names["sh_offset"] + section["sh_name"]
+                )
+
+        self.symbols = []
+        for symtab in self.section_headers:
+            if symtab["sh_type"] != SHT_SYMTAB or not symtab["sh_entsize"]:
+                continue
+            strtab = self.section_headers[symtab["sh_link"]]
+            for symbol in unpack_table(
+                SYMBOL,
+                symtab["sh_offset"],
+                symtab["sh_size"] // symtab["sh_entsize"],
+                symtab["sh_entsize"],
+            ):
+                symbol["name"] = read_string(
+                    data, strtab["sh_offset"] + symbol["st_name"]
+                )
+                symbol["type"] = SYMBOL_TYPES.get(symbol["st_info"] & 0xF, "UNKNOWN")
+                symbol["bind"] = SYMBOL_BINDS.get(symbol["st_info"] >> 4, "UNKNOWN")
+                shndx = symbol["st_shndx"]
+                if shndx == SHN_UNDEF or shndx >= SHN_LORESERVE:
+                    symbol["section"] = None
+                else:
+                    symbol["section"] = self.section_headers[shndx]["name"]
+                self.symbols.append(symbol)
+
+    def get_section_to_segment(self):
+        """
+        Get the names of the sections of every segment, like the "Section to Segment
+        mapping" of readelf -l.
+
+        :return: A dict whose key is the index of the segment and whose value is the list
+            of the names of its sections.
+        """
+        return {
+            index: [
+                section["name"]
+                for section in self.section_headers[1:]
+                if section_in_segment(section, segment)
+            ]
+            for index, segment in enumerate(self.program_headers)
+        }
@@ -15,22 +15,41 @@
 # Later extracts the utilization of those regions by looking for the addresses in which text and data
 # has been written in the main.map file.
 # For the IL data (ildt) only the length is extracted, for simplicity. We assume an homogeneous distribution.
-
-import subprocess
+#
+# It can also be imported: get_mem_usage returns the usage of an (elf, ld, header) tuple as a
+# dict, and get_mem_usage_batch processes many of them, e.g. every app of a sweep, optionally
+# in parallel. The banks and linker regions are parsed once per (ld, header) pair.
+#
+# With --symbols, the usage is broken down by symbol (from the .symtab of the ELF) and by
+# object file, library and section (from the input sections of the linker map, main.map).
+# With --diff, the breakdowns of two ELF files are compared to find what grew.
+
+import argparse
+import bisect
+import csv
+import functools
+import json
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
+from elf_reader import ElfFile, SHF_ALLOC
 
-def is_readelf_available():
-    try:
-        subprocess.run(
-            ["readelf", "--version"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        return True
-    except FileNotFoundError:
-        return False
+# MCU configuration header holding the number and size of the memory banks
+MCU_HEADER_PATH = "sw/device/lib/runtime/core_v_mcu.h"
+
+# The granularity stands for how many Bytes each character of the bank map represents
+GRANULARITY_B = 1024  # To show each division having a value of 1kB
+
+# Number of symbols, objects and libraries listed by the breakdowns and the diffs
+TOP_N = 20
+
+# Symbol types that take memory
+SIZED_SYMBOL_TYPES = {"FUNC", "OBJECT", "TLS"}
+
+# Memory regions of the linker script and the name of the ELF regions stored in them
+REGION_NAMES = {"code": "code", "data": "data", "ildt": "IL data"}
 
 
 def get_banks_and_sizes(mcu_header_path):
@@ -45,6 +64,8 @@ def get_banks_and_sizes(mcu_header_path):
         num_banks    - Total count of memory banks
         num_il_banks - Number of interleaved banks (not used in this platform)
         sizes_B      - Size in bytes of each bank
+
+    Raises ValueError if the header cannot be read.
     """
     num_banks = 0
     num_il_banks = 0
@@ -74,9 +95,8 @@ def get_banks_and_sizes(mcu_header_path):
                     idx = int(end_match.group(1))
                     end_addrs[idx] = int(end_match.group(2).replace("_", ""), 16)
                     continue
-    except FileNotFoundError:
-        print("File not found. Please check the path and try again.")
-        return num_banks, num_il_banks, []
+    except FileNotFoundError as e:
+        raise ValueError(f"Cannot read {mcu_header_path} ({e})")
 
     sizes_B = []
     if start_addrs and not num_banks:
@@ -110,6 +130,8 @@ def get_memory_sections(ld_path):
     Parse the linker script MEMORY block and return all declared regions.
     Works with entries such as:
         RAM (rwx) : ORIGIN = 0x00000000, LENGTH = 0x00010000
+
+    Raises ValueError if the linker script cannot be read.
     """
     sections = {}
     mem_regex = re.compile(
@@ -133,64 +155,32 @@ def get_memory_sections(ld_path):
                         raw_len = match.group(3).split()[0]
                         length = int(raw_len, 16)
                         sections[name] = {"origin": origin, "length": length}
-    except FileNotFoundError:
-        print("File not found. Please check the path and try again.")
+    except FileNotFoundError as e:
+        raise ValueError(f"Cannot read {ld_path} ({e})")
     return sections
 
 
-def get_readelf_output(elf_file):
+def parse_program_headers(elf):
     """
-    Executes the readelf command on the provided ELF file with -lW option to list program headers without wrapping.
+    Get the program headers of the ElfFile, with the fields printed by `readelf -lW`.
     """
-    try:
-        result = subprocess.run(
-            ["readelf", "-lW", elf_file], capture_output=True, text=True
-        )
-        return result.stdout
-    except Exception as e:
-        print(f"Error running readelf: {e}")
-        return None
-
-
-def parse_program_headers(readelf_output):
-    """
-    Parse the program headers emitted by `readelf -lW`.
-    """
-    program_headers = []
-    headers_started = False
-
-    for line in readelf_output.split("\n"):
-        if "Program Headers:" in line:
-            headers_started = True
-            continue
-        if not headers_started:
-            continue
-        if line.strip().startswith("Type"):
-            continue
-        if "Section to Segment mapping:" in line:
-            break
-        if not line.strip():
-            continue
-
-        parts = line.split()
-        if len(parts) < 8:
-            continue
-
-        program_headers.append(
-            {
-                "Type": parts[0],
-                "Offset": int(parts[1], 16),
-                "VirtAddr": int(parts[2], 16),
-                "PhysAddr": int(parts[3], 16),
-                "FileSiz": int(parts[4], 16),
-                "MemSiz": int(parts[5], 16),
-                "Flg": parts[6],
-                "Align": int(parts[7], 16),
-                "Idx": len(program_headers),
-            }
-        )
-
-    return program_headers
+    return [
+        {
+            "Type": segment["type"],
+            "Offset": segment["p_offset"],
+            "VirtAddr": segment["p_vaddr"],
+            "PhysAddr": segment["p_paddr"],
+            "FileSiz": segment["p_filesz"],
+            "MemSiz": segment["p_memsz"],
+            "Flg": "".join(
+                flag if segment["p_flags"] & mask else " "
+                for flag, mask in (("R", 4), ("W", 2), ("E", 1))
+            ),
+            "Align": segment["p_align"],
+            "Idx": idx,
+        }
+        for idx, segment in enumerate(elf.program_headers)
+    ]
 
 
 def get_regions(program_headers, section_to_segment):
@@ -242,71 +232,28 @@ def get_regions(program_headers, section_to_segment):
     return regions
 
 
-def parse_section_to_segment(readelf_output):
+def parse_section_to_segment(elf):
     """
-    Parse the "Section to Segment mapping" from the output of readelf.
+    Get the "Section to Segment mapping" of the ElfFile, as a dict whose key is the index
+    of the segment and whose value is the list of the names of its sections.
     """
-    mapping = {}
-    capture = False
-    for line in readelf_output.split("\n"):
-        if "Section to Segment mapping:" in line:
-            capture = True
-            continue
-        if not capture:
-            continue
-        if line.strip().startswith("Segment") or not line.strip():
-            continue
+    return elf.get_section_to_segment()
 
-        match = re.match(r"\s*(\d+)\s+(.*)", line)
-        if match:
-            segment_index = int(match.group(1))
-            sections = match.group(2).split()
-            mapping[segment_index] = sections
-    return mapping
 
-
-def parse_section_headers(elf_file):
+def parse_section_headers(elf):
     """
-    Parse section headers from the ELF using `readelf -SW`.
+    Get the section headers of the ElfFile.
     Returns a list of dictionaries with name, start address, size, and end address.
     """
-    try:
-        result = subprocess.run(
-            ["readelf", "-SW", elf_file], capture_output=True, text=True
-        )
-        output = result.stdout
-    except Exception as e:
-        print(f"Error running readelf for sections: {e}")
-        return []
-
-    sections = []
-    capture = False
-    for line in output.split("\n"):
-        if line.strip().startswith("[Nr]"):
-            capture = True
-            continue
-        if not capture:
-            continue
-        if line.strip().startswith("Key to Flags:"):
-            break
-
-        match = re.match(
-            r"\s*\[\s*\d+\]\s+(\S+)\s+\S+\s+([0-9A-Fa-f]+)\s+\S+\s+([0-9A-Fa-f]+)", line
-        )
-        if match:
-            name = match.group(1)
-            addr = int(match.group(2), 16)
-            size = int(match.group(3), 16)
-            sections.append(
-                {
-                    "name": name,
-                    "start_add": addr,
-                    "size_B": size,
-                    "end_add": addr + size,
-                }
-            )
-
-    return sections
+    return [
+        {
+            "name": section["name"],
+            "start_add": section["sh_addr"],
+            "size_B": section["sh_size"],
+            "end_add": section["sh_addr"] + section["sh_size"],
+        }
+        for section in elf.section_headers[1:]
+    ]
 
 
 def get_regions_from_sections(section_headers):
@@ -361,209 +308,891 @@ def get_regions_from_sections(section_headers):
     return regions
 
 
-if not is_readelf_available():
-    print("readelf not available. Will not print the memory utilization report.")
-    quit()
-
-# READ THE READELF OUTPUT AND PARSE TO OBTAIN THE DIFFERENT REGIONS
-output = get_readelf_output("sw/build/main.elf")
-if not output:
-    print("readelf output unavailable; cannot compute memory usage.")
-    quit()
-program_headers = parse_program_headers(output)
-section_to_segment = parse_section_to_segment(output)
-regions = get_regions(program_headers, section_to_segment)
-section_headers = parse_section_headers("sw/build/main.elf")
-section_regions = get_regions_from_sections(section_headers)
-if section_regions:
-    regions = section_regions
-elif not regions:
-    print("No regions could be identified in the ELF file.")
-    quit()
-
-# OBTAIN THE NUMBER AND SIZE OF THE BANKS
-num_banks, num_il_banks, bank_sizes_B = get_banks_and_sizes(
-    "sw/device/lib/runtime/core_v_mcu.h"
-)
-total_size_B = sum(bank_sizes_B)
-if total_size_B:
-    cont_sizes = [
-        int(s / 1024) for s in bank_sizes_B[: max(num_banks - num_il_banks, 0)]
-    ]
-    il_sizes = (
-        [int(s / 1024) for s in bank_sizes_B[-num_il_banks:]] if num_il_banks else []
-    )
-    print(
-        f"Total space: {total_size_B/1024:0.1f} kB = Continuous:",
-        cont_sizes,
-        "kB + Interleaved:",
-        il_sizes if il_sizes else [0],
-        "kB",
-    )
-else:
-    print("Could not determine SRAM bank sizes; proceeding with linker regions only.")
-
-# CONVERT THE BANKS INTO A LIST OF DICTIONARIES
-banks = []
-for i in range(num_banks):
-    if i >= len(bank_sizes_B):
-        break
-    bank = {
-        "type": "Cont" if i < (num_banks - num_il_banks) else "IntL",
-        "size": bank_sizes_B[i],
-    }
-    banks.append(bank)
-
-# GET THE MEMORY REGIONS FOR CODE AND DATA, TRANSLATE ramx to code, data, IL
-# If there are no IL banks, create an entry with length 0
-sections = get_memory_sections("sw/build/main.ld")
-if {"ram0", "ram1"}.issubset(sections.keys()):
-    sections["code"] = sections.pop("ram0")
-    sections["data"] = sections.pop("ram1")
-    sections["ildt"] = (
-        sections.pop("ram2")
-        if num_il_banks
-        else {
-            "origin": sections["data"]["origin"] + sections["data"]["length"],
-            "length": 0,
+def get_memory_layout(ld_path, mcu_header_path, layouts=None):
+    """
+    Get the memory banks of the MCU and the code, data and IL data regions of the linker
+    script. If layouts is given, the result is cached in it on the contents of the linker
+    script and the header path, so every ELF linked with the same script (e.g., the main.ld
+    of every app) reuses it and must not modify it.
+
+    Returns a dictionary with:
+        num_banks    - Total count of memory banks
+        num_il_banks - Number of interleaved banks
+        bank_sizes_B - Size in bytes of each bank
+        banks        - List of {"type", "size"} for each bank, "Cont" for continuous and
+                       "IntL" for interleaved
+        sections     - {"origin", "length"} of the "code", "data" and "ildt" regions
+
+    Raises ValueError if the linker script or the header cannot be read, or if the linker
+    script has no MEMORY regions.
+    """
+    if layouts is None:
+        return parse_memory_layout(ld_path, mcu_header_path)
+
+    try:
+        with open(ld_path, "rb") as file:
+            key = (file.read(), mcu_header_path)
+    except FileNotFoundError as e:
+        raise ValueError(f"Cannot read {ld_path} ({e})")
+    if key not in layouts:
+        layouts[key] = parse_memory_layout(ld_path, mcu_header_path)
+    return layouts[key]
+
+
+def parse_memory_layout(ld_path, mcu_header_path):
+    """
+    Parse the memory layout returned by get_memory_layout.
+    """
+    # OBTAIN THE NUMBER AND SIZE OF THE BANKS
+    num_banks, num_il_banks, bank_sizes_B = get_banks_and_sizes(mcu_header_path)
+
+    # CONVERT THE BANKS INTO A LIST OF DICTIONARIES
+    banks = []
+    for i in range(num_banks):
+        if i >= len(bank_sizes_B):
+            break
+        bank = {
+            "type": "Cont" if i < (num_banks - num_il_banks) else "IntL",
+            "size": bank_sizes_B[i],
+        }
+        banks.append(bank)
+
+    # GET THE MEMORY REGIONS FOR CODE AND DATA, TRANSLATE ramx to code, data, IL
+    # If there are no IL banks, create an entry with length 0
+    sections = get_memory_sections(ld_path)
+    if {"ram0", "ram1"}.issubset(sections.keys()):
+        sections["code"] = sections.pop("ram0")
+        sections["data"] = sections.pop("ram1")
+        sections["ildt"] = (
+            sections.pop("ram2")
+            if num_il_banks
+            else {
+                "origin": sections["data"]["origin"] + sections["data"]["length"],
+                "length": 0,
+            }
+        )
+    elif "RAM" in sections:
+        sections = {
+            "code": sections["RAM"],
+            "data": sections["RAM"],
+            "ildt": {
+                "origin": sections["RAM"]["origin"] + sections["RAM"]["length"],
+                "length": 0,
+            },
         }
+    elif sections:
+        first_key = next(iter(sections.keys()))
+        sections = {
+            "code": sections[first_key],
+            "data": sections[first_key],
+            "ildt": {
+                "origin": sections[first_key]["origin"] + sections[first_key]["length"],
+                "length": 0,
+            },
+        }
+    else:
+        raise ValueError(
+            "Memory distribution analysis not available: no MEMORY regions found in linker script."
+        )
+
+    return {
+        "num_banks": num_banks,
+        "num_il_banks": num_il_banks,
+        "bank_sizes_B": bank_sizes_B,
+        "banks": banks,
+        "sections": sections,
+    }
+
+
+def safe_util(required, length):
+    return 0 if length == 0 else 100 * required / length
+
+
+def get_bank_usage(banks, regions, num_il_banks):
+    """
+    Map the regions on the banks, one character per GRANULARITY_B bytes.
+    The area used by code is identified with a C, by data with a d and by IL data with
+    an i.
+
+    Returns a list of dictionaries with the type, size, map ("use") and utilization (%)
+    of each bank.
+    """
+    bank_usage = []
+    address = 0
+    for bank in banks:
+        use = ["-"] * int((bank["size"] / GRANULARITY_B))
+        utilization = 0
+        bank_start_addr = address
+        bank_end_addr = address + bank["size"]
+
+        if bank["type"] == "Cont":
+            for piece in range(len(use)):
+                piece_start = bank_start_addr + piece * GRANULARITY_B
+                piece_end = piece_start + GRANULARITY_B
+
+                for region in regions:
+                    # Check if this piece overlaps with the region
+                    if (
+                        piece_start < region["end_add"]
+                        and piece_end > region["start_add"]
+                    ):
+                        use[piece] = region["symbol"]
+                        utilization += GRANULARITY_B
+                        break
+
+        if bank["type"] == "IntL":
+            for piece in range(len(use)):
+                piece_start = bank_start_addr + piece * GRANULARITY_B
+
+                for region in regions:
+                    used_by_others = (
+                        region["size_B"] * (num_il_banks - 1) / num_il_banks
+                    )
+                    if (
+                        piece_start >= region["start_add"]
+                        and piece_start < region["end_add"] - used_by_others
+                    ):
+                        use[piece] = region["symbol"]
+                        utilization += GRANULARITY_B
+                        break
+
+        bank_usage.append(
+            {
+                "type": bank["type"],
+                "size": bank["size"],
+                "use": "".join(use),
+                "utilization_pct": 100 * (utilization / bank["size"]),
+            }
+        )
+
+        # Update address for next bank
+        address = bank_end_addr
+
+    return bank_usage
+
+
+def get_map_path(elf_path):
+    """
+    Get the linker map of an ELF file: <name>.map next to <name>.elf, or main.map in the
+    same folder (e.g., for main.spm.elf).
+    """
+    map_path = os.path.splitext(elf_path)[0] + ".map"
+    if not os.path.exists(map_path):
+        map_path = os.path.join(os.path.dirname(elf_path), "main.map")
+    return map_path
+
+
+def split_object_path(path):
+    """
+    Split the file of an input section into object and library, e.g.
+    "/opt/riscv/lib/libc.a(lib_a-memcpy.o)" into ("lib_a-memcpy.o", "libc.a").
+    The library is None for objects that do not come from an archive.
+    """
+    match = re.match(r"(.*\.a)\((.*)\)$", path)
+    if match:
+        return match.group(2), os.path.basename(match.group(1))
+    return path, None
+
+
+def parse_linker_map(map_path, allocated_sections):
+    """
+    Parse the input sections of the "Linker script and memory map" of a GNU ld map file.
+    Entries such as:
+        .text.main     0x000001bc       0x20 CMakeFiles/main.elf.dir/main.c.obj
+    or, with long section names, split over two lines:
+        .text.memcpy
+                       0x000001e0       0x40 /opt/riscv/lib/libc.a(lib_a-memcpy.o)
+
+    Only the input sections placed in allocated_sections are kept.
+    Returns a list of dictionaries with the output section, input section, start address,
+    size, object and library of each input section, sorted by address.
+    """
+    input_regex = re.compile(
+        r"\s+0x([0-9A-Fa-f]+)\s+0x([0-9A-Fa-f]+)(?:\s+(\S.*?))?\s*$"
     )
-elif "RAM" in sections:
-    sections = {
-        "code": sections["RAM"],
-        "data": sections["RAM"],
-        "ildt": {
-            "origin": sections["RAM"]["origin"] + sections["RAM"]["length"],
-            "length": 0,
-        },
+    input_sections = []
+    output_section = None
+    pending_name = None
+    in_memory_map = False
+
+    try:
+        with open(map_path, "r") as file:
+            for line in file:
+                line = line.rstrip("\n")
+                if not in_memory_map:
+                    in_memory_map = line.startswith("Linker script and memory map")
+                    continue
+                if not line.strip():
+                    continue
+
+                # Output sections (and LOAD, OUTPUT... statements) start at column 0
+                if not line[0].isspace():
+                    output_section = line.split()[0]
+                    pending_name = None
+                    continue
+
+                if pending_name:
+                    name = pending_name
+                    pending_name = None
+                    match = input_regex.match(line)
+                else:
+                    parts = line.split(None, 1)
+                    name = parts[0]
+                    if name.startswith("*") and name != "*fill*":
+                        continue  # Input section description, e.g. *(.text)
+                    if len(parts) == 1:
+                        pending_name = name
+                        continue
+                    match = input_regex.match(" " + parts[1])
+
+                if not match or output_section not in allocated_sections:
+                    continue
+                size = int(match.group(2), 16)
+                if not size:
+                    continue
+                obj, library = split_object_path(match.group(3) or name)
+                input_sections.append(
+                    {
+                        "output_section": output_section,
+                        "input_section": name,
+                        "start_add": int(match.group(1), 16),
+                        "size_B": size,
+                        "object": obj,
+                        "library": library,
+                    }
+                )
+    except FileNotFoundError:
+        return []
+
+    return sorted(input_sections, key=lambda sec: sec["start_add"])
+
+
+def sum_by(entries, key_names):
+    """
+    Sum the size_B of the entries that share the values of key_names.
+    Returns a list of dictionaries with the key_names and size_B, largest first.
+    """
+    totals = {}
+    for entry in entries:
+        key = tuple(entry[key_name] for key_name in key_names)
+        totals[key] = totals.get(key, 0) + entry["size_B"]
+    return [
+        dict(zip(key_names, key), size_B=size_B)
+        for key, size_B in sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def get_breakdown(elf, map_path):
+    """
+    Break the memory used by the ElfFile down by symbol, object file, library and section.
+    The objects and libraries come from the linker map, and are None if it is missing.
+
+    Returns a dictionary with lists, largest first, of:
+        symbols   - name, type, section, address, size_B, object and library
+        objects   - object, library and size_B (including the code and data without symbol)
+        libraries - library and size_B, None standing for the objects of the app itself
+        sections  - section and size_B of every allocated section
+    """
+    allocated = [
+        section
+        for section in elf.section_headers[1:]
+        if section["sh_flags"] & SHF_ALLOC and section["sh_size"]
+    ]
+    allocated_names = {section["name"] for section in allocated}
+    input_sections = parse_linker_map(map_path, allocated_names)
+    input_starts = [sec["start_add"] for sec in input_sections]
+
+    symbols = []
+    for symbol in elf.symbols:
+        if (
+            symbol["type"] not in SIZED_SYMBOL_TYPES
+            or not symbol["st_size"]
+            or symbol["section"] not in allocated_names
+        ):
+            continue
+        # Find the input section holding the symbol to know its object
+        obj, library = None, None
+        idx = bisect.bisect_right(input_starts, symbol["st_value"]) - 1
+        if idx >= 0:
+            input_section = input_sections[idx]
+            if (
+                symbol["st_value"]
+                < input_section["start_add"] + input_section["size_B"]
+            ):
+                obj, library = input_section["object"], input_section["library"]
+        symbols.append(
+            {
+                "name": symbol["name"],
+                "type": symbol["type"],
+                "section": symbol["section"],
+                "address": symbol["st_value"],
+                "size_B": symbol["st_size"],
+                "object": obj,
+                "library": library,
+            }
+        )
+    symbols.sort(key=lambda sym: (-sym["size_B"], sym["name"]))
+
+    return {
+        "map": map_path if input_sections else None,
+        "symbols": symbols,
+        "objects": sum_by(input_sections, ["object", "library"]),
+        "libraries": sum_by(input_sections, ["library"]),
+        "sections": sum_by(
+            [
+                {"section": section["name"], "size_B": section["sh_size"]}
+                for section in allocated
+            ],
+            ["section"],
+        ),
     }
-elif sections:
-    first_key = next(iter(sections.keys()))
-    sections = {
-        "code": sections[first_key],
-        "data": sections[first_key],
-        "ildt": {
-            "origin": sections[first_key]["origin"] + sections[first_key]["length"],
-            "length": 0,
-        },
+
+
+def get_symbol_usage(elf_path, map_path=None):
+    """
+    Get the breakdown (see get_breakdown) of an ELF file. If map_path is None, the map next
+    to the ELF is used.
+
+    Raises ValueError if the ELF cannot be read.
+    """
+    try:
+        elf = ElfFile(elf_path)
+    except OSError as e:
+        raise ValueError(f"Cannot read {elf_path} ({e})")
+    breakdown = get_breakdown(elf, map_path or get_map_path(elf_path))
+    breakdown["elf"] = elf_path
+    return breakdown
+
+
+def diff_by(old_entries, new_entries, key_names):
+    """
+    Compare the size_B of the entries of two breakdowns that share the values of key_names.
+    Returns a list of dictionaries with the key_names, old_size_B, new_size_B and delta_B
+    of the entries that changed, largest change first.
+    """
+    old_sizes = {
+        tuple(entry[k] for k in key_names): entry["size_B"]
+        for entry in sum_by(old_entries, key_names)
+    }
+    new_sizes = {
+        tuple(entry[k] for k in key_names): entry["size_B"]
+        for entry in sum_by(new_entries, key_names)
     }
-else:
-    print(
-        "Memory distribution analysis not available: no MEMORY regions found in linker script."
+    changes = []
+    for key in set(old_sizes) | set(new_sizes):
+        old_size = old_sizes.get(key, 0)
+        new_size = new_sizes.get(key, 0)
+        if old_size != new_size:
+            changes.append(
+                dict(
+                    zip(key_names, key),
+                    old_size_B=old_size,
+                    new_size_B=new_size,
+                    delta_B=new_size - old_size,
+                )
+            )
+    return sorted(
+        changes,
+        key=lambda change: (
+            -abs(change["delta_B"]),
+            tuple(str(change[k]) for k in key_names),
+        ),
     )
-    quit()
-
-# Compute the total space used for code and data
-total_space_used_code = sum(
-    region["size_B"] for region in regions if region["name"] == "code"
-)
-total_space_used_data = sum(
-    region["size_B"] for region in regions if region["name"] == "data"
-)
-total_space_used_ildt = sum(
-    region["size_B"] for region in regions if region["name"] == "IL data"
-)
-
-# Compute the total space required to store code and data
-code_regions = [region for region in regions if region["name"] == "code"]
-data_regions = [region for region in regions if region["name"] == "data"]
-ildt_regions = [region for region in regions if region["name"] == "IL data"]
-
-min_code_start = (
-    min(region["start_add"] for region in code_regions) if code_regions else 0
-)
-max_code_end = max(region["end_add"] for region in code_regions) if code_regions else 0
-total_space_required_code = max_code_end - min_code_start
-
-min_data_start = (
-    min(region["start_add"] for region in data_regions) if data_regions else 0
-)
-max_data_end = max(region["end_add"] for region in data_regions) if data_regions else 0
-total_space_required_data = max_data_end - min_data_start
-
-min_ildt_start = (
-    min(region["start_add"] for region in ildt_regions) if ildt_regions else 0
-)
-max_ildt_end = max(region["end_add"] for region in ildt_regions) if ildt_regions else 0
-total_space_required_ildt = max_ildt_end - min_ildt_start
-
-# # PRINT THE SUMMARY OF UTILIZATION
-print("Region \t Start \tEnd\tSz(kB)\tUsd(kB)\tReq(kB)\tUtilz(%) ")
 
 
-def safe_util(required, length):
-    return 0 if length == 0 else 100 * required / length
+def diff_symbols(old_symbols, new_symbols):
+    """
+    Compare the sizes of the symbols of two breakdowns, see diff_by. Symbols are matched by
+    name and section, and also by object for the names defined several times (e.g., static
+    functions), so renamed or moved object files do not hide the changes of the others.
+    """
+    ambiguous = set()
+    for symbols in (old_symbols, new_symbols):
+        seen = set()
+        for symbol in symbols:
+            key = (symbol["name"], symbol["section"])
+            if key in seen:
+                ambiguous.add(key)
+            seen.add(key)
+
+    objects = {}
+    keyed_symbols = ([], [])
+    for symbols, keyed in zip((old_symbols, new_symbols), keyed_symbols):
+        for symbol in symbols:
+            key = (symbol["name"], symbol["section"])
+            objects[key] = symbol["object"]
+            keyed.append(
+                dict(symbol, object=symbol["object"] if key in ambiguous else None)
+            )
+
+    changes = diff_by(*keyed_symbols, ["name", "section", "object"])
+    for change in changes:
+        if change["object"] is None:
+            change["object"] = objects[(change["name"], change["section"])]
+    return changes
+
+
+def get_usage_diff(old_elf_path, new_elf_path):
+    """
+    Compare the breakdowns of two builds, e.g. before and after a commit.
+
+    Returns a dictionary with the old and new ELF files, the total change of the allocated
+    sections (delta_B) and the lists of changes, largest first, of:
+        symbols   - name, section and object (None without linker map)
+        objects   - object and library
+        libraries - library
+        sections  - section
+    """
+    old = get_symbol_usage(old_elf_path)
+    new = get_symbol_usage(new_elf_path)
+    return {
+        "old": old_elf_path,
+        "new": new_elf_path,
+        "delta_B": sum(sec["size_B"] for sec in new["sections"])
+        - sum(sec["size_B"] for sec in old["sections"]),
+        "symbols": diff_symbols(old["symbols"], new["symbols"]),
+        "objects": diff_by(old["objects"], new["objects"], ["object", "library"]),
+        "libraries": diff_by(old["libraries"], new["libraries"], ["library"]),
+        "sections": diff_by(old["sections"], new["sections"], ["section"]),
+    }
 
 
-print(
-    f"Code:  \t{sections['code']['origin']/1024:5.1f}\t{(sections['code']['origin']+sections['code']['length'])/1024:5.1f}\t{sections['code']['length']/1024:5.1f}\t{total_space_used_code/1024:0.1f}\t{total_space_required_code/1024:5.1f}\t{safe_util(total_space_required_code, sections['code']['length']):0.1f}"
-)
-print(
-    f"Data:  \t{sections['data']['origin']/1024:5.1f}\t{(sections['data']['origin']+sections['data']['length'])/1024:5.1f}\t{sections['data']['length']/1024:5.1f}\t{total_space_used_data/1024:0.1f}\t{total_space_required_data/1024:5.1f}\t{safe_util(total_space_required_data, sections['data']['length']):0.1f}"
-)
-if num_il_banks:
-    print(
-        f"ILdata:\t{sections['ildt']['origin']/1024:5.1f}\t{(sections['ildt']['origin']+sections['ildt']['length'])/1024:5.1f}\t{sections['ildt']['length']/1024:5.1f}\t{total_space_used_ildt/1024:0.1f}\t{total_space_required_ildt/1024:5.1f}\t{safe_util(total_space_required_ildt, sections['ildt']['length']):0.1f}"
+def get_mem_usage(
+    elf_path,
+    ld_path,
+    mcu_header_path=MCU_HEADER_PATH,
+    symbols=False,
+    map_path=None,
+    layouts=None,
+):
+    """
+    Get the memory usage of an ELF file.
+
+    Returns a dictionary with:
+        elf, ld, header - The input files
+        total_size_B    - Total size of the banks (0 if unknown)
+        num_il_banks    - Number of interleaved banks
+        regions         - Code and data regions found in the ELF
+        sections        - For the "code", "data" and "ildt" regions of the linker script:
+                          origin, length, used_B, required_B and utilization_pct
+        banks           - Map and utilization of each bank, see get_bank_usage
+        breakdown       - Only with symbols=True, see get_breakdown. If map_path is None,
+                          the linker map next to the ELF is used
+    layouts caches the memory layouts across calls, see get_memory_layout.
+
+    Raises ValueError if the ELF, the linker script or the header cannot be read, or if the
+    linker script has no MEMORY regions.
+    """
+    # READ THE ELF AND PARSE TO OBTAIN THE DIFFERENT REGIONS
+    try:
+        elf = ElfFile(elf_path)
+    except OSError as e:
+        raise ValueError(f"Cannot read {elf_path} ({e})")
+    program_headers = parse_program_headers(elf)
+    section_to_segment = parse_section_to_segment(elf)
+    regions = get_regions(program_headers, section_to_segment)
+    section_headers = parse_section_headers(elf)
+    section_regions = get_regions_from_sections(section_headers)
+    if section_regions:
+        regions = section_regions
+    elif not regions:
+        raise ValueError("No regions could be identified in the ELF file.")
+
+    layout = get_memory_layout(ld_path, mcu_header_path, layouts)
+
+    # Compute the total space used and required (from the first to the last address) for
+    # code, data and IL data
+    sections = {}
+    for section_name, region_name in REGION_NAMES.items():
+        named_regions = [region for region in regions if region["name"] == region_name]
+        used_B = sum(region["size_B"] for region in named_regions)
+        min_start = (
+            min(region["start_add"] for region in named_regions) if named_regions else 0
+        )
+        max_end = (
+            max(region["end_add"] for region in named_regions) if named_regions else 0
+        )
+        origin = layout["sections"][section_name]["origin"]
+        length = layout["sections"][section_name]["length"]
+        sections[section_name] = {
+            "origin": origin,
+            "length": length,
+            "used_B": used_B,
+            "required_B": max_end - min_start,
+            "utilization_pct": safe_util(max_end - min_start, length),
+        }
+
+    usage = {
+        "elf": elf_path,
+        "ld": ld_path,
+        "header": mcu_header_path,
+        "total_size_B": sum(layout["bank_sizes_B"]),
+        "num_banks": layout["num_banks"],
+        "num_il_banks": layout["num_il_banks"],
+        "bank_sizes_B": layout["bank_sizes_B"],
+        "regions": regions,
+        "sections": sections,
+        "banks": get_bank_usage(layout["banks"], regions, layout["num_il_banks"]),
+    }
+    if symbols:
+        usage["breakdown"] = get_breakdown(elf, map_path or get_map_path(elf_path))
+    return usage
+
+
+def try_get_mem_usage(
+    elf_path, ld_path, mcu_header_path=MCU_HEADER_PATH, symbols=False, layouts=None
+):
+    """
+    Same as get_mem_usage, but returns {"elf", "ld", "header", "error"} instead of raising
+    an exception, so one broken ELF does not stop a batch.
+    """
+    try:
+        return get_mem_usage(
+            elf_path, ld_path, mcu_header_path, symbols, layouts=layouts
+        )
+    except ValueError as e:
+        return {
+            "elf": elf_path,
+            "ld": ld_path,
+            "header": mcu_header_path,
+            "error": str(e),
+        }
+
+
+def get_mem_usage_chunk(inputs, symbols=False):
+    """
+    Get the memory usage of a list of (elf, ld, header) tuples, parsing every (ld, header)
+    pair once.
+    """
+    layouts = {}
+    return [
+        try_get_mem_usage(*item, symbols=symbols, layouts=layouts) for item in inputs
+    ]
+
+
+def get_mem_usage_batch(inputs, jobs=1, symbols=False):
+    """
+    Get the memory usage of many ELF files.
+
+    inputs is a list of (elf, ld, header) tuples. With jobs > 1, they are split in chunks
+    processed by a pool of jobs processes. Every (ld, header) pair is parsed once per chunk
+    and nothing is kept across calls, so a rebuilt header or linker script is always
+    parsed again. With symbols, every result includes its breakdown.
+    Returns the results of try_get_mem_usage, in the order of the inputs.
+    """
+    if jobs <= 1 or len(inputs) <= 1:
+        return get_mem_usage_chunk(inputs, symbols)
+
+    chunk_size = max(len(inputs) // (4 * jobs), 1)
+    chunks = [
+        inputs[start : start + chunk_size]
+        for start in range(0, len(inputs), chunk_size)
+    ]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            functools.partial(get_mem_usage_chunk, symbols=symbols), chunks
+        )
+        return [usage for chunk in results for usage in chunk]
+
+
+def print_mem_usage(usage, file=sys.stdout, top=TOP_N):
+    """
+    Print the memory usage returned by get_mem_usage as a table and a map of the banks,
+    followed by the top contributors if it has a breakdown.
+    """
+    if "error" in usage:
+        print(usage["error"], file=file)
+        return
+
+    total_size_B = usage["total_size_B"]
+    num_banks = usage["num_banks"]
+    num_il_banks = usage["num_il_banks"]
+    bank_sizes_B = usage["bank_sizes_B"]
+    if total_size_B:
+        cont_sizes = [
+            int(s / 1024) for s in bank_sizes_B[: max(num_banks - num_il_banks, 0)]
+        ]
+        il_sizes = (
+            [int(s / 1024) for s in bank_sizes_B[-num_il_banks:]]
+            if num_il_banks
+            else []
+        )
+        print(
+            f"Total space: {total_size_B/1024:0.1f} kB = Continuous:",
+            cont_sizes,
+            "kB + Interleaved:",
+            il_sizes if il_sizes else [0],
+            "kB",
+            file=file,
+        )
+    else:
+        print(
+            "Could not determine SRAM bank sizes; proceeding with linker regions only.",
+            file=file,
+        )
+
+    # # PRINT THE SUMMARY OF UTILIZATION
+    print("Region \t Start \tEnd\tSz(kB)\tUsd(kB)\tReq(kB)\tUtilz(%) ", file=file)
+    labels = {"code": "Code:  ", "data": "Data:  ", "ildt": "ILdata:"}
+    for section_name, label in labels.items():
+        if section_name == "ildt" and not num_il_banks:
+            continue
+        section = usage["sections"][section_name]
+        print(
+            f"{label}\t{section['origin']/1024:5.1f}\t{(section['origin']+section['length'])/1024:5.1f}\t{section['length']/1024:5.1f}\t{section['used_B']/1024:0.1f}\t{section['required_B']/1024:5.1f}\t{section['utilization_pct']:0.1f}",
+            file=file,
+        )
+
+    # DISPLAY THE UTILIZATION BY SHOWING THE BANKS
+    # Cont for continuous, IntL for interleaved
+    # The utilization is shown at the end
+    print("", file=file)
+    for bank_idx, bank in enumerate(usage["banks"]):
+        print(
+            bank["type"],
+            bank_idx,
+            bank["use"],
+            f"\t{bank['utilization_pct']:0.1f}%",
+            file=file,
+        )
+
+    if "breakdown" in usage:
+        print("", file=file)
+        print_breakdown(usage["breakdown"], file, top)
+
+
+def print_breakdown(breakdown, file=sys.stdout, top=TOP_N):
+    """
+    Print the top contributors of a breakdown returned by get_breakdown.
+    """
+    print(f"Top {top} symbols:", file=file)
+    print("Sz(B)\tSection\tSymbol\tObject", file=file)
+    for symbol in breakdown["symbols"][:top]:
+        print(
+            f"{symbol['size_B']}\t{symbol['section']}\t{symbol['name']}\t{symbol['object'] or '-'}",
+            file=file,
+        )
+
+    if breakdown["map"] is None:
+        print(
+            "\nNo linker map found; objects and libraries are not available.", file=file
+        )
+    else:
+        print(f"\nTop {top} objects:", file=file)
+        print("Sz(B)\tObject\tLibrary", file=file)
+        for obj in breakdown["objects"][:top]:
+            print(
+                f"{obj['size_B']}\t{obj['object']}\t{obj['library'] or '-'}", file=file
+            )
+
+        print("\nLibraries:", file=file)
+        print("Sz(B)\tLibrary", file=file)
+        for library in breakdown["libraries"]:
+            print(f"{library['size_B']}\t{library['library'] or '(app)'}", file=file)
+
+    print("\nSections:", file=file)
+    print("Sz(B)\tSection", file=file)
+    for section in breakdown["sections"]:
+        print(f"{section['size_B']}\t{section['section']}", file=file)
+
+
+def print_usage_diff(diff, file=sys.stdout, top=TOP_N):
+    """
+    Print the changes returned by get_usage_diff, largest first.
+    """
+    print(f"{diff['old']} -> {diff['new']}: {diff['delta_B']:+d} B", file=file)
+
+    print("\nSections:", file=file)
+    print("Delta(B)\tOld(B)\tNew(B)\tSection", file=file)
+    for change in diff["sections"]:
+        print(
+            f"{change['delta_B']:+d}\t{change['old_size_B']}\t{change['new_size_B']}\t{change['section']}",
+            file=file,
+        )
+
+    print(f"\nTop {top} symbols:", file=file)
+    print("Delta(B)\tOld(B)\tNew(B)\tSection\tSymbol\tObject", file=file)
+    for change in diff["symbols"][:top]:
+        print(
+            f"{change['delta_B']:+d}\t{change['old_size_B']}\t{change['new_size_B']}\t{change['section']}\t{change['name']}\t{change['object'] or '-'}",
+            file=file,
+        )
+
+    print(f"\nTop {top} objects:", file=file)
+    print("Delta(B)\tOld(B)\tNew(B)\tObject\tLibrary", file=file)
+    for change in diff["objects"][:top]:
+        print(
+            f"{change['delta_B']:+d}\t{change['old_size_B']}\t{change['new_size_B']}\t{change['object']}\t{change['library'] or '-'}",
+            file=file,
+        )
+
+
+def write_csv(results, file):
+    """
+    Write one row per ELF with the size, usage and utilization of each region.
+    """
+    fields = ["elf"]
+    for section_name in REGION_NAMES:
+        fields += [
+            f"{section_name}_length_B",
+            f"{section_name}_used_B",
+            f"{section_name}_required_B",
+            f"{section_name}_utilization_pct",
+        ]
+    fields.append("error")
+
+    writer = csv.DictWriter(file, fieldnames=fields)
+    writer.writeheader()
+    for usage in results:
+        row = {"elf": usage["elf"], "error": usage.get("error", "")}
+        for section_name, section in usage.get("sections", {}).items():
+            row[f"{section_name}_length_B"] = section["length"]
+            row[f"{section_name}_used_B"] = section["used_B"]
+            row[f"{section_name}_required_B"] = section["required_B"]
+            row[f"{section_name}_utilization_pct"] = (
+                f"{section['utilization_pct']:0.1f}"
+            )
+        writer.writerow(row)
+
+
+def write_diff_csv(diff, file):
+    """
+    Write one row per symbol whose size changed between the two ELF files.
+    """
+    writer = csv.DictWriter(
+        file,
+        fieldnames=["name", "section", "object", "old_size_B", "new_size_B", "delta_B"],
     )
+    writer.writeheader()
+    for change in diff["symbols"]:
+        writer.writerow(change)
 
 
-# DISPLAY THE UTILIZATION BY SHOWING THE BANKS
-# Cont for continuous, IntL for interleaved
-# The area used by code is identified with a C
-# The area used by data is identified with a d
-# The utilization is shown at the end
-# The granularity stands for how many Bytes each character represents
-char = "."
-address = 0
-granularity_B = 32 * 1024 / 100  # To show 100 divisions per bank
-granularity_B = 1024  # To show each division having a value of 1kB
-start_IL_B = (
-    sum(bank_sizes_B[: max(len(bank_sizes_B) - num_il_banks, 0)])
-    if num_il_banks
-    else sum(bank_sizes_B)
-)
-
-print("")
-address = 0
-for bank_idx, bank in enumerate(banks):
-    bank["use"] = ["-"] * int((bank["size"] / granularity_B))
-    utilization = 0
-    bank_start_addr = address
-    bank_end_addr = address + bank["size"]
-
-    if bank["type"] == "Cont":
-        for piece in range(len(bank["use"])):
-            piece_start = bank_start_addr + piece * granularity_B
-            piece_end = piece_start + granularity_B
-
-            bank["use"][piece] = "-"
-            for region in regions:
-                # Check if this piece overlaps with the region
-                if piece_start < region["end_add"] and piece_end > region["start_add"]:
-                    bank["use"][piece] = region["symbol"]
-                    utilization += granularity_B
-                    break
-
-    if bank["type"] == "IntL":
-        for piece in range(len(bank["use"])):
-            piece_start = bank_start_addr + piece * granularity_B
-            piece_end = piece_start + granularity_B
-
-            bank["use"][piece] = "-"
-            for region in regions:
-                used_by_others = region["size_B"] * (num_il_banks - 1) / num_il_banks
-                if (
-                    piece_start >= region["start_add"]
-                    and piece_start < region["end_add"] - used_by_others
-                ):
-                    bank["use"][piece] = region["symbol"]
-                    utilization += granularity_B
-                    break
-
-    bank["use"] = "".join(["".join(sublist) for sublist in bank["use"]])
-    print(
-        bank["type"], bank_idx, bank["use"], f"\t{100*(utilization/bank['size']):0.1f}%"
+def main():
+    parser = argparse.ArgumentParser(
+        description="Memory usage report of the last built app, or of many ELF files"
+    )
+    parser.add_argument(
+        "--build-dir",
+        default="sw/build",
+        help="Folder holding main.elf and main.ld (default: sw/build)",
+    )
+    parser.add_argument(
+        "--elf",
+        nargs="+",
+        help="ELF files to report instead of the main.elf of --build-dir. Each one uses the main.ld next to it unless --ld is given",
+    )
+    parser.add_argument("--ld", help="Linker script shared by all the ELF files")
+    parser.add_argument(
+        "--header",
+        default=MCU_HEADER_PATH,
+        help=f"MCU header with the memory banks (default: {MCU_HEADER_PATH})",
     )
+    parser.add_argument(
+        "--format",
+        choices=["table", "json", "csv"],
+        default="table",
+        help="Output format (default: table)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of ELF files processed in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--output", help="File to write the report to (default: standard output)"
+    )
+    parser.add_argument(
+        "--symbols",
+        action="store_true",
+        help="Break the usage down by symbol, object file, library and section, using the .symtab of the ELF and the main.map next to it",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=TOP_N,
+        help=f"Number of symbols and objects listed by --symbols and --diff (default: {TOP_N})",
+    )
+    parser.add_argument(
+        "--diff",
+        nargs=2,
+        metavar=("OLD_ELF", "NEW_ELF"),
+        help="Report the growth per section, symbol and object file between two builds",
+    )
+    args = parser.parse_args()
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.diff:
+            success = write_diff(args, out)
+        else:
+            success = write_report(args, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if not success:
+        sys.exit(1)
+
+
+def write_diff(args, out):
+    """
+    Write the report of --diff in the --format of the command line.
+
+    Returns False if an ELF could not be read, which is reported on stderr.
+    """
+    try:
+        diff = get_usage_diff(*args.diff)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return False
+
+    if args.format == "json":
+        json.dump(diff, out, indent=2)
+        out.write("\n")
+    elif args.format == "csv":
+        write_diff_csv(diff, out)
+    else:
+        print_usage_diff(diff, out, args.top)
+    return True
+
+
+def write_report(args, out):
+    """
+    Write the memory usage of the ELF files of the command line in its --format.
 
-    # Update address for next bank
-    address = bank_end_addr
+    Returns False if any of them could not be reported. The errors are kept in the
+    report and also written to stderr, so they do not go unnoticed with --output.
+    """
+    elf_paths = args.elf or [os.path.join(args.build_dir, "main.elf")]
+    inputs = [
+        (
+            elf_path,
+            args.ld or os.path.join(os.path.dirname(elf_path), "main.ld"),
+            args.header,
+        )
+        for elf_path in elf_paths
+    ]
+    results = get_mem_usage_batch(inputs, args.jobs, args.symbols)
+
+    if args.format == "json":
+        json.dump(results, out, indent=2)
+        out.write("\n")
+    elif args.format == "csv":
+        write_csv(results, out)
+    else:
+        for usage in results:
+            if len(results) > 1:
+                print(f"\n{usage['elf']}:", file=out)
+            print_mem_usage(usage, out, args.top)
+
+    errors = [usage for usage in results if "error" in usage]
+    for usage in errors:
+        if args.format != "table" or out is not sys.stdout:
+            print(f"{usage['elf']}: {usage['error']}", file=sys.stderr)
+    return not errors
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
-import hjson
 from math import ceil
 import string
 import argparse
 import sys
+import re
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from regtool_cached import load_hjson, update_file  # noqa: E402
 
 ############################################################
 #  This module generates the structures for the registers  #
@@ -44,37 +51,48 @@ line_comment_end = "*/"
 struct_comment = "Structure used for bit access"
 word_comment = "Type used for word access"
 
+# Generation date written by the template, ignored when comparing with the existing file
+date_pattern = re.compile(r"\d{2}/\d{2}/\d{4}")
+
 
 def read_hjson(hjson_file):
     """
-    Opens the hjson file taken as input and returns its content
+    Opens the hjson file taken as input and returns its content, from the register
+    model cache shared with regtool_cached.py if it was already parsed
     """
-    # Open the hjson file #
-    f = open(hjson_file)
-    j_data = hjson.load(f)
-    f.close()
-    return j_data
+    return load_hjson(hjson_file)
 
 
-def write_template(tpl, structs, enums, struct_name):
+def read_template(tpl):
+    """
+    Opens the template file taken as input and returns it parsed
     """
-    Opens a given template and substitutes the structs and enums fields.
+    with open(tpl) as t:
+        return string.Template(t.read())
+
+
+def write_template(template, structs, enums, struct_name):
+    """
+    Substitutes the structs and enums fields in a template returned by read_template.
     Returns a string with the content of the updated template
     """
 
     lower_case_name = struct_name.lower()
     upper_case_name = struct_name.upper()
-    start_addr_def = "{}_peri ((volatile {} *) {}_START_ADDRESS)".format(
-        lower_case_name, struct_name, upper_case_name
-    )
+    if struct_name == "dma":
+        # One set of registers per channel, DMA_CH_SIZE bytes apart
+        start_addr_def = "{}_peri(channel) ((volatile {} *) ({}_START_ADDRESS + {}_CH_SIZE * channel))".format(
+            lower_case_name, struct_name, upper_case_name, upper_case_name
+        )
+    else:
+        start_addr_def = "{}_peri ((volatile {} *) {}_START_ADDRESS)".format(
+            lower_case_name, struct_name, upper_case_name
+        )
 
     today = date.today()
     today = today.strftime("%d/%m/%Y")
 
     # To print the final result into the template
-    with open(tpl) as t:
-        template = string.Template(t.read())
-
     return template.substitute(
         structures_definitions=structs,
         enums_definitions=enums,
@@ -87,11 +105,15 @@ def write_template(tpl, structs, enums, struct_name):
 
 def write_output(out_file, out_string):
     """
-    Writes the final out_string into the specified out_file
-    """
+    Writes the final out_string into the specified out_file, unless it is the same as
+    the file or as the last generated content apart from the generation date, so its
+    timestamp does not trigger rebuilds (see update_file of regtool_cached.py)
 
-    with open(out_file, "w") as f:
-        f.write(out_string)
+    :return: True if the file was written
+    """
+    return update_file(
+        out_file, out_string, normalize=lambda text: date_pattern.sub("", text)
+    )
 
 
 def generate_enum(enum_field, name):
@@ -102,48 +124,45 @@ def generate_enum(enum_field, name):
     :param name: name of the register field associated to the enum
     :return: the string containing the formatted enum
     """
-    enum = enum_start.format(name)
-
+    lines = []
     for key in enum_field:
-        enum += (
-            tab_spaces
-            + format(key["name"], "<15")
-            + "="
-            + tab_spaces
-            + str(key["value"])
-        )
-        enum += ","
+        line = tab_spaces + format(key["name"], "<15") + "=" + tab_spaces
+        line += str(key["value"]) + ","
         if "desc" in key:
-            enum += (
+            line += (
                 format("", "<25")
                 + line_comment_start
                 + format(key["desc"].replace("\n", " "), "<100")
                 + line_comment_end
             )
+        lines.append(line + "\n")
+
+    return enum_start.format(name) + "".join(lines) + enum_end.format(name)
 
-        enum += "\n"
 
-    enum += enum_end.format(name)
+def parse_bits(bits_range):
+    """
+    Parses the "bits_range" input string, that contains either a single bit index or a range of
+    bits with the following format "end_bit:start_bit".
+    Ex: "7:0" will correspond to 8 bits from 0 to 7.
 
-    return enum
+    :param bits_range: string containing the nuber of bit (or range or bits) of a specific field
+    :return: the index of the first bit and the amount of bits
+    """
+    end_bit, _, start_bit = str(bits_range).partition(":")
+    if not start_bit:
+        start_bit = end_bit
+    return int(start_bit), int(end_bit) - int(start_bit) + 1
 
 
 def count_bits(bits_range):
     """
-    Used to determine if the "bits_range" input string contains only a single bit index or a range of bits.
-    In the latter case the range is supposed to be identified with the following format "end_bit:start_bit".
-    Ex: "7:0" will correspond to 8 bits from 0 to 7.
-    It returns the amount of bits specified in the range
+    Used to determine the amount of bits of the "bits_range" input string, see parse_bits.
 
     :param bits_range: string containing the nuber of bit (or range or bits) of a specific field
     :return: the amount of bits
     """
-    if bits_range.find(":") != -1:
-        start_bit = bits_range.split(":")[1]
-        end_bit = bits_range.split(":")[0]
-        return int(end_bit) - int(start_bit) + 1
-    else:
-        return 1
+    return parse_bits(bits_range)[1]
 
 
 def select_type(amount_of_bits):
@@ -164,123 +183,59 @@ def select_type(amount_of_bits):
         return "uint64_t"
 
 
-def intr_regs_auto_gen():
+def format_entries(entries):
     """
-    Generate hardcoded registers for interrupts
+    Formats the entries of the register table of a peripheral as the lines of its struct,
+    each one with its comment aligned.
 
-    :return: string with the register varibles to be added to the struct
+    :param entries: list of (declaration, comment) tuples
+    :return: the string with the struct lines
     """
-    res = ""
-    line = tab_spaces + "uint32_t {};".format("INTR_STATE")
-    reg_comment = (
-        line_comment_start + "Interrupt State Register" + line_comment_end + "\n\n"
-    )
-    res += line.ljust(comment_align_space) + reg_comment
-
-    line = tab_spaces + "uint32_t {};".format("INTR_ENABLE")
-    reg_comment = (
-        line_comment_start + "Interrupt Enable Register" + line_comment_end + "\n\n"
+    return "".join(
+        (tab_spaces + declaration).ljust(comment_align_space)
+        + line_comment_start
+        + comment
+        + line_comment_end
+        + "\n\n"
+        for declaration, comment in entries
     )
-    res += line.ljust(comment_align_space) + reg_comment
 
-    line = tab_spaces + "uint32_t {};".format("INTR_TEST")
-    reg_comment = (
-        line_comment_start + "Interrupt Test Register" + line_comment_end + "\n\n"
-    )
-    res += line.ljust(comment_align_space) + reg_comment
-
-    return res
 
-
-def alert_regs_auto_gen():
+def intr_regs_auto_gen():
     """
-    Generate hardcoded registers for alerts
+    Generate hardcoded registers for interrupts
 
-    :return: string with the register varibles to be added to the struct
+    :return: list of the (declaration, comment) entries of the registers
     """
-    res = ""
-
-    line = tab_spaces + "uint32_t {};".format("ALERT_TEST")
-    reg_comment = line_comment_start + "Alert Test Register" + line_comment_end + "\n\n"
-    res += line.ljust(comment_align_space) + reg_comment
-
-    return res
+    return [
+        ("uint32_t INTR_STATE;", "Interrupt State Register"),
+        ("uint32_t INTR_ENABLE;", "Interrupt Enable Register"),
+        ("uint32_t INTR_TEST;", "Interrupt Test Register"),
+    ]
 
 
-def add_fields(register_hjson):
+def alert_regs_auto_gen():
     """
-    Loops through the fields of the hjson of a register, passed as parameter.
-    Returns the structs and enums entries relative to the register, already
-    indented.
+    Generate hardcoded registers for alerts
 
-    :param register_hjson: the hjson-like description of a register
-    :return: the strings of the the struct fields, the enum (if present)
+    :return: list of the (declaration, comment) entries of the registers
     """
+    return [("uint32_t ALERT_TEST;", "Alert Test Register")]
 
-    struct_fields = ""
-    enum = ""
-    bits_counter = 0  # to count the bits used for all the fields of the register
-
-    # loops through the fields of the register
-    for field in register_hjson["fields"]:
-        field_bits = count_bits(field["bits"])
-        field_type = select_type(field_bits)
-
-        # Check if there is an ENUM, if yes it generates it and set the type of the associated field
-        if "enum" in field:
-            field_type = "{}_t".format(field["name"])
-            enum += generate_enum(field["enum"], field["name"])
-
-        bits_counter += int(field_bits)
-
-        # Handles the case in which the field has no name (it's given the same name as the register)
-        if "name" in field:
-            field_name = field["name"]
-        else:
-            field_name = register_hjson["name"]
-
-        # insert a new struct in the structs string
-        struct_fields += struct_entry.format(
-            format(field_type, "<15"),
-            format(field_name, "<20"),
-            format(str(field_bits) + ";", "<5"),
-        )
-
-        # if there is a description, it adds a comment
-        if "desc" in field:
-            struct_fields += (
-                line_comment_start
-                + format("bit: {}".format(field["bits"]), "<10")
-                + format(field["desc"].replace("\n", " "), "<100")
-                + line_comment_end
-            )
-        struct_fields += "\n"
-
-    # add an entry for the reserved bits (if present)
-    if bits_counter < reg_length:
-        reserved_bits = reg_length - bits_counter
-        reserved_type = select_type(reserved_bits)
-        struct_fields += struct_entry.format(
-            format(reserved_type, "<15"),
-            format(reserved_name, "<20"),
-            format(str(reserved_bits) + ";", "<5"),
-        )
-        struct_fields += "\n"
 
-    return struct_fields, enum
-
-
-def add_registers(peripheral_hjson):
+def get_register_table(peripheral_hjson):
     """
-    Reads the hjson description of a peripheral and generates structures for every
-    register.
+    Builds the table of the registers of a peripheral, in the order of the struct. The
+    multiregs are expanded into as many registers as needed to pack their fields and
+    "skipto" keywords into arrays of reserved registers.
 
     :param peripheral_hjson: the hjson-like description of the registers of a peripheral
-    :return: the strings containing the indented structs and enums relative to the registers
+    :return: list of (declaration, comment) tuples
     """
+    table = []
 
-    reg_struct = "\n"
-    reg_enum = ""
+    # Default values of the parameters, to get the count of the multiregs
+    params = {p["name"]: p["default"] for p in peripheral_hjson.get("param_list", [])}
 
     # number of "reserved" fields. Used to name them with a progressive ID
     num_of_reserved = 0
@@ -293,12 +248,12 @@ def add_registers(peripheral_hjson):
     # To handle INTR specific registers #
     if "interrupt_list" in peripheral_hjson:
         if "no_auto_intr_regs" not in peripheral_hjson:
-            reg_struct += intr_regs_auto_gen()
+            table += intr_regs_auto_gen()
 
     # To handle the ALERT registers #
     if "alert_list" in peripheral_hjson:
         if "no_auto_alert_regs" not in peripheral_hjson:
-            reg_struct += alert_regs_auto_gen()
+            table += alert_regs_auto_gen()
 
     # loops through the registers of the hjson
     for elem in peripheral_hjson["registers"]:
@@ -306,115 +261,175 @@ def add_registers(peripheral_hjson):
         # check and handle the multireg case
         if "multireg" in elem:
             multireg = elem["multireg"]
-            count_var = multireg["count"]
 
-            # search the multireg count default value
-            # This is the number of bitfields needed
-            for p in peripheral_hjson["param_list"]:
-                if count_var == p["name"]:
-                    count = int(p["default"])
+            # The multireg count default value is the number of bitfields needed
+            count = int(params.get(multireg["count"], multireg["count"]))
 
             # counts the bits needed by the multireg register
-            n_bits = 0
-            for f in multireg["fields"]:
-                n_bits += count_bits(f["bits"])
+            n_bits = sum(count_bits(f["bits"]) for f in multireg["fields"])
 
             # computes the number of registers needed to pack all the bit fields needed
             n_multireg = ceil((count * n_bits) / int(peripheral_hjson["regwidth"]))
 
             # generate the multiregisters
-            for r in range(n_multireg):
-                reg_name = multireg["name"] + str(r)
-                line = tab_spaces + "uint32_t {};".format(reg_name)
-                reg_comment = (
-                    line_comment_start
-                    + multireg["desc"].replace("\n", " ")
-                    + line_comment_end
-                    + "\n\n"
-                )
-                reg_struct += line.ljust(comment_align_space) + reg_comment
-                bytes_offset += 4  # one register is 4 bytes
+            comment = multireg["desc"].replace("\n", " ")
+            table += [
+                ("uint32_t {}{};".format(multireg["name"], r), comment)
+                for r in range(n_multireg)
+            ]
+            bytes_offset += 4 * n_multireg  # one register is 4 bytes
 
         # check and handle the "window" case
         elif "window" in elem:
-
             window = elem["window"]
-
             validbits = int(window["validbits"])
-
-            line = tab_spaces + "{} {};".format(select_type(validbits), window["name"])
-            reg_comment = (
-                line_comment_start
-                + window["desc"].replace("\n", " ")
-                + line_comment_end
-                + "\n\n"
+            table.append(
+                (
+                    "{} {};".format(select_type(validbits), window["name"]),
+                    window["desc"].replace("\n", " "),
+                )
             )
-            reg_struct += line.ljust(comment_align_space) + reg_comment
 
         # if no multireg or window, just generate the reg
         elif "name" in elem:
-
-            line = tab_spaces + "uint32_t {};".format(elem["name"])
-            reg_comment = (
-                line_comment_start
-                + elem["desc"].replace("\n", " ")
-                + line_comment_end
-                + "\n\n"
-            )
-            reg_struct += line.ljust(comment_align_space) + reg_comment
-            bytes_offset += (
-                4  # in order to properly generate subsequent "multireg cases"
+            table.append(
+                ("uint32_t {};".format(elem["name"]), elem["desc"].replace("\n", " "))
             )
+            # in order to properly generate subsequent "multireg cases"
+            bytes_offset += 4
 
         if "skipto" in elem:
-            new_address = elem["skipto"]
-
-            # check if the new address is in hexadecimal or decimal
-            # and convert it to decimal
-            if new_address[:2] == "0x":
-                new_address = int(new_address, base=16)
-            else:
-                new_address = int(new_address)
+            # the new address can be in hexadecimal or decimal
+            new_address = int(elem["skipto"], base=0)
 
             offset_value = int((new_address - bytes_offset) / 4)
 
-            line = tab_spaces + "uint32_t _reserved_{}[{}];".format(
-                num_of_reserved, int(offset_value)
-            )
-            reg_comment = (
-                line_comment_start + "reserved addresses" + line_comment_end + "\n\n"
+            table.append(
+                (
+                    "uint32_t _reserved_{}[{}];".format(num_of_reserved, offset_value),
+                    "reserved addresses",
+                )
             )
-            reg_struct += line.ljust(comment_align_space) + reg_comment
             bytes_offset += offset_value * 4
             num_of_reserved += 1
 
-    return reg_struct, reg_enum
+    return table
 
 
-def format_dma_channels(file_path):
+def add_registers(peripheral_hjson):
     """
-    Formats the DMA peripheral file to support multiple channels.
-    :param file_path: The path to the DMA peripheral file.
+    Reads the hjson description of a peripheral and generates structures for every
+    register.
+
+    :param peripheral_hjson: the hjson-like description of the registers of a peripheral
+    :return: the strings containing the indented structs and enums relative to the registers
     """
-    try:
-        # Read the contents of the file
-        with open(file_path, "r") as file:
-            content = file.read()
+    return "\n" + format_entries(get_register_table(peripheral_hjson)), ""
 
-        # Replace 'DMA_START_ADDRESS' with 'new_address'
-        updated_content = content.replace(
-            "#define dma_peri ((volatile dma *) DMA_START_ADDRESS)",
-            "#define dma_peri(channel) ((volatile dma *) (DMA_START_ADDRESS + DMA_CH_SIZE * channel))",
-        )
 
-        # Write the updated content back to the file
-        with open(file_path, "w") as file:
-            file.write(updated_content)
+def generate_structs(template, hjson_file, output_file):
+    """
+    Generates the structs and enums of the registers described by a hjson file and
+    writes them into output_file, following the template.
+
+    :param template: the template returned by read_template
+    :param hjson_file: filename of the input hjson
+    :param output_file: filename of the generated header
+    :return: True if the output file was written, False if it was already up to date
+    """
+    data = read_hjson(hjson_file)
+
+    # Two strings used to store all the structs and enums #
+    structs_definitions = "typedef struct {\n"  # used to store all the struct definitions to write in the template in the end
+    enums_definitions = ""  # used to store all the enums definitions, if present
+
+    # START OF THE GENERATION #
+
+    reg_structs, reg_enums = add_registers(data)
+    structs_definitions += reg_structs
+    enums_definitions += reg_enums
+
+    structs_definitions += "}} {};".format(data["name"])
+
+    final_output = write_template(
+        template, structs_definitions, enums_definitions, data["name"]
+    )
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return write_output(output_file, final_output)
+
+
+def get_batch_entries(manifest, hjson_glob, output_pattern):
+    """
+    Lists the hjson files to generate in batch mode and their output files.
+
+    :param manifest: file with one hjson filename per line, optionally followed by its
+        output filename. Relative paths are relative to the manifest. Empty lines and
+        lines starting with # are ignored.
+    :param hjson_glob: glob pattern of more hjson files
+    :param output_pattern: output filename of the hjson files without one, where {name}
+        is replaced by the hjson filename without extension and {dir} by its directory
+    :return: the list of (hjson filename, output filename) tuples
+    """
+    hjson_files = []
+    if manifest:
+        manifest_dir = os.path.dirname(manifest)
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                paths = [os.path.join(manifest_dir, path) for path in line.split()]
+                hjson_files.append((paths[0], paths[1] if len(paths) > 1 else None))
+    if hjson_glob:
+        hjson_files += [
+            (hjson_file, None)
+            for hjson_file in sorted(glob.glob(hjson_glob, recursive=True))
+        ]
+
+    entries = []
+    for hjson_file, output_file in hjson_files:
+        if output_file is None:
+            if output_pattern is None:
+                raise ValueError(
+                    "no output filename for {}, give --output_pattern".format(
+                        hjson_file
+                    )
+                )
+            output_file = output_pattern.format(
+                name=os.path.splitext(os.path.basename(hjson_file))[0],
+                dir=os.path.dirname(hjson_file),
+            )
+        entries.append((hjson_file, output_file))
+    return entries
+
 
-    except FileNotFoundError:
-        print(f"The file {file_path} does not exist.")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+def generate_batch(template, entries, jobs=1):
+    """
+    Generates the headers of several hjson files with the same template, in a pool of
+    jobs processes if jobs is greater than 1.
+
+    :param template: the template returned by read_template
+    :param entries: the list of (hjson filename, output filename) tuples
+    :param jobs: the maximum number of headers generated at the same time
+    :return: the list of the output files that were written
+    """
+    generate = partial(generate_structs, template)
+    hjson_files = [hjson_file for hjson_file, _ in entries]
+    output_files = [output_file for _, output_file in entries]
+
+    if jobs > 1 and len(entries) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(entries))) as executor:
+            written = list(executor.map(generate, hjson_files, output_files))
+    else:
+        written = list(map(generate, hjson_files, output_files))
+
+    return [
+        output_file
+        for output_file, was_written in zip(output_files, written)
+        if was_written
+    ]
 
 
 def main(arg_vect):
@@ -423,7 +438,8 @@ def main(arg_vect):
         prog="Structure generator",
         description="Given a template and a hjson file as input, it generates "
         "suitable structs and enums and prints them into a file, following the "
-        "structure provided by the template.",
+        "structure provided by the template. With --manifest or --hjson_glob, it "
+        "generates the files of several hjson at once.",
     )
     parser.add_argument(
         "--template_filename",
@@ -438,34 +454,44 @@ def main(arg_vect):
         help="name of the file in which to write the final formatted template with the structs "
         "and enums generated",
     )
+    parser.add_argument(
+        "--manifest",
+        help="file listing one hjson filename per line, optionally followed by the name of "
+        "its output file",
+    )
+    parser.add_argument(
+        "--hjson_glob",
+        help="glob pattern of the hjson files to generate",
+    )
+    parser.add_argument(
+        "--output_pattern",
+        help="name of the output file of the hjson files of the batch without one, where "
+        "{name} is the hjson filename without extension and {dir} its directory",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of files generated in parallel in batch mode",
+    )
 
     args = parser.parse_args(arg_vect)
 
-    input_template = args.template_filename
-    input_hjson_file = args.hjson_filename
-    output_filename = args.output_filename
+    template = read_template(args.template_filename)
 
-    data = read_hjson(input_hjson_file)
-
-    # Two strings used to store all the structs and enums #
-    structs_definitions = "typedef struct {\n"  # used to store all the struct definitions to write in the template in the end
-    enums_definitions = ""  # used to store all the enums definitions, if present
-
-    # START OF THE GENERATION #
-
-    reg_structs, reg_enums = add_registers(data)
-    structs_definitions += reg_structs
-    enums_definitions += reg_enums
-
-    structs_definitions += "}} {};".format(data["name"])
-
-    final_output = write_template(
-        input_template, structs_definitions, enums_definitions, data["name"]
-    )
-    write_output(output_filename, final_output)
-
-    if data["name"].lower() == "dma":
-        format_dma_channels(output_filename)
+    if args.manifest or args.hjson_glob:
+        try:
+            entries = get_batch_entries(
+                args.manifest, args.hjson_glob, args.output_pattern
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        for output_file in generate_batch(template, entries, args.jobs):
+            print("Generated {}".format(output_file))
+    else:
+        if not args.hjson_filename or not args.output_filename:
+            parser.error("--hjson_filename and --output_filename are required")
+        generate_structs(template, args.hjson_filename, args.output_filename)
 
 
 if __name__ == "__main__":
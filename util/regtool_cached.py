@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# Copyright EPFL contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Info: Generates the RTL, the C defines header and the documentation of the registers of a
+# peripheral from a single parse of its hjson, like running regtool.py with -r, --cdefines
+# and -d. The parsed hjson and the validated reggen IpBlock are cached on disk, keyed on the
+# hjson content, the parameters and the reggen sources, so the generators of the same
+# peripheral (e.g. periph_structs_gen.py, with load_hjson) only parse it once.
+# Outputs are only written when their generated content changes.
+
+import argparse
+import copy
+import hashlib
+import io
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+
+import hjson
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+REGTOOL_DIR = os.path.join(
+    ROOT, "hw/vendor/pulp_platform/register_interface/vendor/lowrisc_opentitan/util"
+)
+sys.path.insert(0, REGTOOL_DIR)
+
+from reggen import gen_cheader, gen_md, gen_rtl  # noqa: E402
+from reggen.ip_block import IpBlock  # noqa: E402
+
+CACHE_DIR = "~/.cache/xalp/reg-models"
+
+# Version of the layout of the cache entries, to change when it changes
+CACHE_FORMAT_VERSION = 1
+
+# Hashes of the outputs as generated, before "make format" reformats them
+GENERATED_HASHES_DIR = os.path.join(ROOT, "build", ".generated-hashes")
+
+# Hash of the reggen sources, computed on first use
+reggen_version = None
+
+
+def get_reggen_version():
+    """
+    Hash the sources of reggen and the version of hjson, so that updating them invalidates
+    the cached models.
+    """
+    global reggen_version
+    if reggen_version is None:
+        hasher = hashlib.sha256(hjson.__version__.encode())
+        reggen_dir = os.path.join(REGTOOL_DIR, "reggen")
+        for name in sorted(os.listdir(reggen_dir)):
+            path = os.path.join(reggen_dir, name)
+            if os.path.isfile(path):
+                hasher.update(name.encode() + b"\0")
+                with open(path, "rb") as file:
+                    hasher.update(hashlib.sha256(file.read()).digest())
+        reggen_version = hasher.hexdigest()
+    return reggen_version
+
+
+def get_cache_key(text: str, params: list):
+    """
+    Get the key of the model of an hjson text with the parameters params.
+    """
+    hasher = hashlib.sha256(get_reggen_version().encode())
+    hasher.update(repr((CACHE_FORMAT_VERSION, params)).encode())
+    hasher.update(text.encode())
+    return hasher.hexdigest()
+
+
+def load_model(hjson_path: str, params=None, cache_dir=CACHE_DIR, validate=True):
+    """
+    Parse and validate the hjson of a peripheral, or load the result from the cache.
+
+    :param str hjson_path: The hjson description of the registers.
+    :param list params: The (name, value) parameter defaults to apply, like the --param
+        option of regtool.
+    :param str cache_dir: The cache folder. If None, nothing is cached.
+    :param bool validate: If False, only parse the hjson and do not build the IpBlock, so
+        descriptions that reggen does not accept can still be loaded.
+
+    :return: The text of the hjson, the hjson parsed as an OrderedDict and the IpBlock, or
+        None if validate is False and it was not cached yet.
+
+    :raises ValueError: If the hjson is not a valid register description.
+    """
+    params = params or []
+    with open(hjson_path) as file:
+        text = file.read()
+
+    raw = None
+    block = None
+    cache_path = None
+    if cache_dir is not None:
+        cache_dir = os.path.expanduser(cache_dir)
+        cache_path = os.path.join(cache_dir, get_cache_key(text, params) + ".pickle")
+        # An entry that cannot be loaded (e.g., pickled with other reggen or hjson
+        #   modules than the ones imported now) is parsed again and replaced
+        try:
+            with open(cache_path, "rb") as file:
+                raw, block = pickle.load(file)
+            if not isinstance(raw, dict) or not isinstance(
+                block, (IpBlock, type(None))
+            ):
+                raise TypeError(f"Unexpected entry types in {cache_path}")
+        except Exception:
+            raw, block = None, None
+        if raw is not None and (block is not None or not validate):
+            return text, raw, block
+
+    if raw is None:
+        raw = hjson.loads(text, use_decimal=True)
+    if validate:
+        # IpBlock keeps references to parts of the raw description, keep them separate
+        block = IpBlock.from_raw(params, copy.deepcopy(raw), hjson_path)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write a temporary file first, so other processes never load a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump((raw, block), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    return text, raw, block
+
+
+def load_hjson(hjson_path: str, cache_dir=CACHE_DIR):
+    """
+    Get the hjson of a peripheral parsed as an OrderedDict, from the cache if possible.
+    It is not validated by reggen.
+    """
+    return load_model(hjson_path, cache_dir=cache_dir, validate=False)[1]
+
+
+def get_license(text: str):
+    """
+    Get the license and copyright lines of the hjson, as regtool puts them in the C header.
+
+    :return: The license and the copyright strings.
+    """
+    src_lic = None
+    src_copy = ""
+    found_spdx = None
+    found_lunder = None
+    copyright_re = re.compile(r".*(copyright.*)|(.*\(c\).*)", re.IGNORECASE)
+    spdx_re = re.compile(r".*(SPDX-License-Identifier:.+)")
+    lunder_re = re.compile(r".*(Licensed under.+)", re.IGNORECASE)
+    for line in text.splitlines():
+        match = copyright_re.match(line)
+        if match is not None:
+            src_copy += match.group(1)
+        match = spdx_re.match(line)
+        if match is not None:
+            found_spdx = match.group(1)
+        match = lunder_re.match(line)
+        if match is not None:
+            found_lunder = match.group(1)
+    if found_lunder:
+        src_lic = found_lunder
+    if found_spdx:
+        if src_lic is None:
+            src_lic = "\n" + found_spdx
+        else:
+            src_lic += "\n" + found_spdx
+    return src_lic, src_copy
+
+
+def get_generated_hash_path(path: str):
+    """
+    Get the file holding the hash of the content last generated for path.
+    """
+    key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(GENERATED_HASHES_DIR, key)
+
+
+def update_file(path: str, content: str, normalize=None):
+    """
+    Write content to path, unless the file already has that content or content is what
+    was generated for it last time. "make format" reformats the outputs once they are
+    generated, so the hash of every output as generated is kept in GENERATED_HASHES_DIR
+    to compare with.
+
+    :param normalize: Called on the contents before comparing them, e.g. to drop the
+        generation date. If None, they are compared as they are.
+
+    :return: True if the file was written.
+    """
+    normalize = normalize or (lambda text: text)
+    digest = hashlib.sha256(normalize(content).encode()).hexdigest()
+    hash_path = get_generated_hash_path(path)
+
+    try:
+        with open(path) as file:
+            up_to_date = normalize(file.read()) == normalize(content)
+        if not up_to_date:
+            with open(hash_path) as file:
+                up_to_date = file.read() == digest
+    except FileNotFoundError:
+        up_to_date = False
+
+    if not up_to_date:
+        with open(path, "w") as file:
+            file.write(content)
+    os.makedirs(GENERATED_HASHES_DIR, exist_ok=True)
+    with open(hash_path, "w") as file:
+        file.write(digest)
+    return not up_to_date
+
+
+def generate(hjson_path: str, rtl_dir=None, cdefines=None, doc=None, params=None):
+    """
+    Generate the requested outputs of the registers of a peripheral.
+
+    :param str hjson_path: The hjson description of the registers.
+    :param str rtl_dir: The folder of the RTL (regtool -r). If None, it is not generated.
+    :param str cdefines: The C defines header (regtool --cdefines). If None, it is not
+        generated.
+    :param str doc: The markdown documentation (regtool -d). If None, it is not generated.
+    :param list params: The (name, value) parameter defaults to apply.
+
+    :return: The list of the files that were written.
+    """
+    text, _, block = load_model(hjson_path, params)
+    written = []
+
+    if rtl_dir is not None:
+        os.makedirs(rtl_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            if gen_rtl.gen_rtl(block, tmp_dir):
+                raise ValueError(f"Failed to generate the RTL of {hjson_path}")
+            for name in sorted(os.listdir(tmp_dir)):
+                with open(os.path.join(tmp_dir, name)) as file:
+                    path = os.path.join(rtl_dir, name)
+                    if update_file(path, file.read()):
+                        written.append(path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if cdefines is not None:
+        src_lic, src_copy = get_license(text)
+        output = io.StringIO()
+        if gen_cheader.gen_cdefines(block, output, src_lic, src_copy):
+            raise ValueError(f"Failed to generate the C header of {hjson_path}")
+        if update_file(cdefines, output.getvalue()):
+            written.append(cdefines)
+
+    if doc is not None:
+        output = io.StringIO()
+        gen_md.gen_md(block, output)
+        if update_file(doc, output.getvalue()):
+            written.append(doc)
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate the RTL, C header and documentation of the registers of a "
+        "peripheral from one parse of its hjson"
+    )
+    parser.add_argument("hjson", help="Hjson description of the registers")
+    parser.add_argument("--rtl", metavar="DIR", help="Folder of the RTL (regtool -r)")
+    parser.add_argument(
+        "--cdefines", metavar="FILE", help="C defines header (regtool --cdefines)"
+    )
+    parser.add_argument(
+        "--doc", metavar="FILE", help="Markdown documentation (regtool -d)"
+    )
+    parser.add_argument(
+        "--param",
+        "-p",
+        default="",
+        help="Parameter values, as ParamA=ValA;ParamB=ValB (regtool --param)",
+    )
+    parser.add_argument(
+        "--verbose", "-v", action="store_true", help="Print the files that changed"
+    )
+    args = parser.parse_args()
+
+    params = []
+    for raw_param in args.param.split(";") if args.param else []:
+        tokens = raw_param.split("=")
+        if len(tokens) != 2:
+            parser.error(f"Parameter {raw_param!r} is not of the form param=value")
+        params.append((tokens[0], tokens[1]))
+
+    try:
+        written = generate(args.hjson, args.rtl, args.cdefines, args.doc, params)
+    except ValueError as err:
+        print(f"ERROR: {err}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.verbose:
+        for path in written:
+            print(f"Updated {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,9 @@ https://docs.opentitan.org/doc/rm/vendor_in_tool).
 """
 
 import argparse
+import fcntl
 import fnmatch
+import hashlib
 import logging as log
 import os
 import re
@@ -23,6 +25,7 @@ import subprocess
 import sys
 import tempfile
 import textwrap
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import hjson
@@ -48,7 +51,13 @@ OVERRIDABLE_DESC_KEYS = [
     "upstream.ref",
 ]
 
+# Folder of the bare mirrors of the upstream repositories. Clones are made from the
+# mirrors, so only the new objects are downloaded and a locked revision can be
+# re-imported without network access. None disables the mirrors.
+MIRROR_CACHE_DIR = "~/.cache/xalp-vendor"
+
 verbose = False
+mirror_cache_dir = MIRROR_CACHE_DIR
 
 
 def git_is_clean_workdir(git_workdir):
@@ -588,11 +597,14 @@ class Desc:
         desc_file_stem = self.path.name.rsplit(".", 2)[0]
         return self.path.with_name(desc_file_stem + ".lock.hjson")
 
-    def import_from_upstream(self, upstream_path):
-        log.info("Copying upstream sources to {}".format(self.target_dir))
+    def import_from_upstream(self, upstream_path, target_dir=None):
+        """Import the upstream sources to target_dir (default: self.target_dir)"""
+        if target_dir is None:
+            target_dir = self.target_dir
+        log.info("Copying upstream sources to {}".format(target_dir))
 
         # Remove existing directories before importing them again
-        shutil.rmtree(str(self.target_dir), ignore_errors=True)
+        shutil.rmtree(str(target_dir), ignore_errors=True)
 
         items = (
             self.mapping.items
@@ -602,7 +614,7 @@ class Desc:
         for map1 in items:
             map1.import_from_upstream(
                 upstream_path,
-                self.target_dir,
+                target_dir,
                 self.exclude_from_upstream,
                 self.patch_dir,
             )
@@ -664,15 +676,200 @@ def ignore_patterns(base_dir, *patterns):
     return _ignore_patterns
 
 
-def clone_git_repo(repo_url, clone_dir, rev="master"):
-    log.info("Cloning upstream repository %s @ %s", repo_url, rev)
+def get_mirror_path(repo_url):
+    """Get the path of the bare mirror of a repository in the mirror cache
+
+    The scheme, the user and a trailing .git are dropped from the URL, so the
+    HTTPS and SSH URLs of a repository share the same mirror.
+    """
+    name = re.sub(r"^[A-Za-z][A-Za-z0-9+.-]*://", "", repo_url.strip())
+    name = re.sub(r"^[^/@]*@", "", name).rstrip("/")
+    if name.endswith(".git"):
+        name = name[: -len(".git")]
+    name = re.sub(r"[^A-Za-z0-9.-]+", "_", name.replace(":", "/")).strip("_")
+    return Path(os.path.expanduser(mirror_cache_dir)) / (name + ".git")
+
+
+def git_has_commit(git_dir, rev):
+    """Check if rev resolves to a commit in the repository git_dir"""
+    cmd = ["git", "-C", str(git_dir), "rev-parse", "-q", "--verify", rev + "^{commit}"]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
 
-    # Clone the whole repository
-    cmd = ["git", "clone", "--no-single-branch"]
+
+def update_mirror(repo_url, mirror_dir, rev):
+    """Create or update the bare mirror of a repository so it contains rev
+
+    The mirror only tracks the branches and tags of the upstream repository. A
+    revision given as a full commit hash which is already in the mirror is used
+    as is, without contacting the upstream repository. If the upstream
+    repository cannot be reached, the mirror is used as long as it contains
+    rev.
+    """
+    if not mirror_dir.exists():
+        log.info("Creating mirror of %s in %s", repo_url, mirror_dir)
+        tmp_dir = Path(tempfile.mkdtemp(dir=str(mirror_dir.parent), prefix=".tmp-"))
+        try:
+            subprocess.run(["git", "init", "-q", "--bare", str(tmp_dir)], check=True)
+            for cmd in [
+                ["remote", "add", "origin", repo_url],
+                ["config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"],
+                ["config", "--add", "remote.origin.fetch", "+refs/tags/*:refs/tags/*"],
+            ]:
+                subprocess.run(["git", "-C", str(tmp_dir)] + cmd, check=True)
+            os.rename(str(tmp_dir), str(mirror_dir))
+        except BaseException:
+            shutil.rmtree(str(tmp_dir), ignore_errors=True)
+            raise
+    elif re.fullmatch(r"[0-9a-f]{40}", rev) and git_has_commit(mirror_dir, rev):
+        log.info("Revision %s found in mirror %s", rev, mirror_dir)
+        return
+
+    log.info("Fetching %s into mirror %s", repo_url, mirror_dir)
+    cmd = ["git", "-C", str(mirror_dir), "fetch", "--prune"]
     if not verbose:
         cmd += ["-q"]
-    cmd += [repo_url, str(clone_dir)]
-    subprocess.run(cmd, check=True)
+    try:
+        subprocess.run(cmd + ["origin"], check=True)
+        # Commits which are not on a branch or tag must be fetched by their hash
+        if not git_has_commit(mirror_dir, rev):
+            subprocess.run(cmd + ["origin", rev], check=True)
+    except subprocess.CalledProcessError:
+        if not git_has_commit(mirror_dir, rev):
+            raise
+        log.warning(
+            "Unable to fetch %s, using revision %s from the mirror.", repo_url, rev
+        )
+
+
+def get_tree_manifest(base_dir):
+    """Get the content-hash manifest of the files in base_dir
+
+    Returns a dict with the path of every file relative to base_dir, in POSIX
+    form and sorted, as key and the SHA-256 hash of its content as value.
+    """
+    manifest = {}
+    for root, _, files in os.walk(str(base_dir)):
+        for name in files:
+            path = Path(root) / name
+            with open(str(path), "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            manifest[path.relative_to(base_dir).as_posix()] = digest
+    return dict(sorted(manifest.items()))
+
+
+def get_git_ignored(base_dir, rel_paths):
+    """Get the paths in rel_paths, relative to base_dir, which git ignores
+
+    Such files (e.g. the caches of the Python tools run from a vendored tree)
+    are never committed, so they are left out of the manifests. Tracked files
+    are never reported. Returns an empty set outside of a git work tree.
+    """
+    rel_paths = sorted(rel_paths)
+    if not rel_paths:
+        return set()
+    try:
+        result = subprocess.run(
+            ["git", "check-ignore", "--stdin", "-z"],
+            cwd=str(base_dir),
+            input="".join(path + "\0" for path in rel_paths).encode(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError:
+        return set()
+    # git check-ignore exits with 1 if no path is ignored, 128 on errors
+    if result.returncode != 0:
+        return set()
+    return {path for path in result.stdout.decode().split("\0") if path}
+
+
+def get_tree_dirs(base_dir):
+    """Get the paths of the directories in base_dir, relative to base_dir"""
+    return {
+        (Path(root) / name).relative_to(base_dir).as_posix()
+        for root, dirs, _ in os.walk(str(base_dir))
+        for name in dirs
+    }
+
+
+def is_executable(path):
+    return bool(os.stat(str(path)).st_mode & 0o111)
+
+
+def sync_tree(src_dir, dst_dir, src_manifest):
+    """Make dst_dir identical to src_dir, only touching the files that differ
+
+    Files which are new or whose content or executable bit changed are moved
+    from src_dir, so src_dir must not be used afterwards. Files which are not
+    in src_dir are deleted. Unchanged files are left alone, so their
+    modification time is kept. Returns the number of written and deleted
+    files.
+    """
+    if not dst_dir.is_dir():
+        shutil.rmtree(str(dst_dir), ignore_errors=True)
+        os.rename(str(src_dir), str(dst_dir))
+        return len(src_manifest), 0
+
+    dst_manifest = get_tree_manifest(dst_dir)
+
+    # Delete the files first, in case a directory replaces one of them
+    deleted = sorted(dst_manifest.keys() - src_manifest.keys())
+    for rel_path in deleted:
+        os.unlink(str(dst_dir / rel_path))
+
+    written = 0
+    for rel_path, digest in src_manifest.items():
+        src_path = src_dir / rel_path
+        dst_path = dst_dir / rel_path
+        unchanged = dst_manifest.get(rel_path) == digest
+        if unchanged and is_executable(src_path) == is_executable(dst_path):
+            continue
+        if dst_path.is_dir() and not dst_path.is_symlink():
+            shutil.rmtree(str(dst_path))
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(str(src_path), str(dst_path))
+        written += 1
+
+    # Remove the directories which are not in src_dir (they are empty now)
+    # and create its empty ones
+    src_dirs = get_tree_dirs(src_dir)
+    dst_dirs = get_tree_dirs(dst_dir)
+    for rel_path in sorted(dst_dirs - src_dirs, reverse=True):
+        shutil.rmtree(str(dst_dir / rel_path), ignore_errors=True)
+    for rel_path in sorted(src_dirs - dst_dirs):
+        (dst_dir / rel_path).mkdir(parents=True, exist_ok=True)
+
+    return written, len(deleted)
+
+
+def clone_git_repo(repo_url, clone_dir, rev="master"):
+    log.info("Cloning upstream repository %s @ %s", repo_url, rev)
+
+    if mirror_cache_dir is None:
+        # Clone the whole repository
+        cmd = ["git", "clone", "--no-single-branch"]
+        if not verbose:
+            cmd += ["-q"]
+        cmd += [repo_url, str(clone_dir)]
+        subprocess.run(cmd, check=True)
+    else:
+        # Clone from the mirror, sharing its objects instead of copying them. The
+        # mirror is locked so concurrent imports of the same repository do not
+        # fetch into it at the same time.
+        mirror_dir = get_mirror_path(repo_url)
+        mirror_dir.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(mirror_dir) + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            update_mirror(repo_url, mirror_dir, rev)
+
+            cmd = ["git", "clone", "--no-single-branch", "--shared"]
+            if not verbose:
+                cmd += ["-q"]
+            cmd += [str(mirror_dir), str(clone_dir)]
+            subprocess.run(cmd, check=True)
+        cmd = ["git", "-C", str(clone_dir), "remote", "set-url", "origin", repo_url]
+        subprocess.run(cmd, check=True)
 
     # Check out exactly the revision requested
     cmd = ["git", "-C", str(clone_dir), "checkout", "--force", rev]
@@ -748,8 +945,13 @@ def define_arg_type(arg):
     return (key, value)
 
 
-def process_vendor(desc, args):
-    """Process a single vendor entry: clone, copy, patch, lock, commit."""
+def load_lock(desc, update):
+    """Load the lock entry of a vendor entry and decide whether to update it
+
+    If the entry is not updated, the upstream field of desc is replaced with the
+    locked one. Returns a (lock, update, changed_url) tuple, where lock is None
+    if there is no lock entry yet.
+    """
     lock_file_path = desc.lock_file_path()
 
     # Try to load lock file
@@ -761,7 +963,6 @@ def process_vendor(desc, args):
     except (FileNotFoundError, KeyError):
         lock = None
 
-    update = args.update
     if lock is None and not update:
         log.warning("No lock entry for %s, so will update upstream repo.", desc.name)
         update = True
@@ -774,124 +975,243 @@ def process_vendor(desc, args):
         if not update:
             desc.upstream = lock.upstream
 
-    if args.refresh_patches:
+    return lock, update, changed_url
+
+
+def prepare_vendor(desc, lock, update, changed_url, refresh):
+    """Clone, copy and patch a vendor entry in a staging directory
+
+    The staging directory is created next to the target directory, so that the
+    patches apply with the same relative paths and finish_vendor() only has to
+    move it in place. Returns a (staging_dir, upstream_new_rev, sha_short,
+    shortlog, manifest) tuple. The imported tree is in the "tree" folder of
+    staging_dir and manifest is its content-hash manifest.
+    """
+    if refresh:
         refresh_patches(desc)
 
-    with tempfile.TemporaryDirectory() as clone_dir:
-        # clone upstream repository
-        upstream_new_rev = clone_git_repo(
-            desc.upstream.url, clone_dir, rev=desc.upstream.rev
+    desc.target_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging_dir = Path(
+        os.path.relpath(
+            tempfile.mkdtemp(
+                prefix=".{}-".format(desc.name), dir=str(desc.target_dir.parent)
+            )
         )
+    )
+    try:
+        with tempfile.TemporaryDirectory() as clone_dir:
+            # clone upstream repository
+            upstream_new_rev = clone_git_repo(
+                desc.upstream.url, clone_dir, rev=desc.upstream.rev
+            )
 
-        if not update:
-            if upstream_new_rev != lock.upstream.rev:
-                log.fatal(
-                    "Revision mismatch. Unable to re-clone locked version of repository."
-                )
-                log.fatal("Attempted revision: %s", desc.upstream.rev)
-                log.fatal("Re-cloned revision: %s", upstream_new_rev)
-                raise SystemExit(1)
-
-        clone_subdir = Path(clone_dir)
-        if desc.upstream.only_subdir is not None:
-            clone_subdir = clone_subdir / desc.upstream.only_subdir
-            if not clone_subdir.is_dir():
-                log.fatal(
-                    "subdir '{}' does not exist in repo".format(
-                        desc.upstream.only_subdir
+            if not update:
+                if upstream_new_rev != lock.upstream.rev:
+                    log.fatal(
+                        "Revision mismatch. Unable to re-clone locked version of repository."
                     )
-                )
-                raise SystemExit(1)
-
-        # copy selected files from upstream repo and apply patches as necessary
-        desc.import_from_upstream(clone_subdir)
-
-        # get shortlog
-        get_shortlog = update
-        if update:
-            if lock is None:
-                get_shortlog = False
-                log.warning(
-                    "No lock entry for %s: unable to summarize changes.",
-                    desc.name,
-                )
-            elif changed_url:
-                get_shortlog = False
-                log.warning(
-                    "The repository URL changed since the last run. "
-                    "Unable to get log of changes."
+                    log.fatal("Attempted revision: %s", desc.upstream.rev)
+                    log.fatal("Re-cloned revision: %s", upstream_new_rev)
+                    raise SystemExit(1)
+
+            clone_subdir = Path(clone_dir)
+            if desc.upstream.only_subdir is not None:
+                clone_subdir = clone_subdir / desc.upstream.only_subdir
+                if not clone_subdir.is_dir():
+                    log.fatal(
+                        "subdir '{}' does not exist in repo".format(
+                            desc.upstream.only_subdir
+                        )
+                    )
+                    raise SystemExit(1)
+
+            # copy selected files from upstream repo and apply patches as necessary
+            desc.import_from_upstream(clone_subdir, staging_dir / "tree")
+            manifest = get_tree_manifest(staging_dir / "tree")
+
+            # get shortlog
+            get_shortlog = update
+            if update:
+                if lock is None:
+                    get_shortlog = False
+                    log.warning(
+                        "No lock entry for %s: unable to summarize changes.",
+                        desc.name,
+                    )
+                elif changed_url:
+                    get_shortlog = False
+                    log.warning(
+                        "The repository URL changed since the last run. "
+                        "Unable to get log of changes."
+                    )
+
+            shortlog = None
+            if get_shortlog:
+                shortlog = produce_shortlog(
+                    clone_subdir, desc.mapping, lock.upstream.rev, upstream_new_rev
                 )
 
-        shortlog = None
-        if get_shortlog:
-            shortlog = produce_shortlog(
-                clone_subdir, desc.mapping, lock.upstream.rev, upstream_new_rev
-            )
+                # Ensure fully-qualified issue/PR references for GitHub repos
+                gh_repo_info = github_parse_url(desc.upstream.url)
+                if gh_repo_info:
+                    shortlog = github_qualify_references(
+                        shortlog, gh_repo_info[0], gh_repo_info[1]
+                    )
 
-            # Ensure fully-qualified issue/PR references for GitHub repos
-            gh_repo_info = github_parse_url(desc.upstream.url)
-            if gh_repo_info:
-                shortlog = github_qualify_references(
-                    shortlog, gh_repo_info[0], gh_repo_info[1]
+                log.info(
+                    "Changes since the last import of %s:\n%s",
+                    desc.name,
+                    format_list_to_str(shortlog),
                 )
 
-            log.info("Changes since the last import:\n" + format_list_to_str(shortlog))
-
-        # write lock file (append entry if file already exists)
-        if update:
-            lock_data = {}
-            if os.path.exists(str(lock_file_path)):
-                with open(str(lock_file_path), "r", encoding="UTF-8") as f:
-                    lock_data = hjson.loads(f.read(), use_decimal=True)
-            vendor_entry = desc.upstream.as_dict()
-            vendor_entry["rev"] = upstream_new_rev
-            if desc.use_named_lock_entry:
-                lock_data[desc.name] = {"upstream": vendor_entry}
-            else:
-                lock_data = {"upstream": vendor_entry}
-            with open(str(lock_file_path), "w", encoding="UTF-8") as f:
-                f.write(LOCK_FILE_HEADER)
-                hjson.dump(lock_data, f)
-                f.write("\n")
-                log.info("Wrote lock file %s", str(lock_file_path))
-
-        # Commit changes
-        if args.commit:
             sha_short = git_get_short_rev(clone_subdir, upstream_new_rev)
+    except BaseException:
+        shutil.rmtree(str(staging_dir), ignore_errors=True)
+        raise
 
-            repo_info = github_parse_url(desc.upstream.url)
-            if repo_info is not None:
-                sha_short = "%s/%s@%s" % (repo_info[0], repo_info[1], sha_short)
-
-            commit_msg_subject = "Update %s to %s" % (desc.name, sha_short)
-            intro = "Update code from {}upstream repository {} to revision {}".format(
-                (
-                    ""
-                    if desc.upstream.only_subdir is None
-                    else "subdir {} in ".format(desc.upstream.only_subdir)
-                ),
-                desc.upstream.url,
-                upstream_new_rev,
-            )
-            commit_msg_body = textwrap.fill(intro, width=70)
+    return staging_dir, upstream_new_rev, sha_short, shortlog, manifest
+
+
+def finish_vendor(desc, prepared, update, args):
+    """Sync a prepared vendor entry in place, write its lock entry and commit"""
+    staging_dir, upstream_new_rev, sha_short, shortlog, manifest = prepared
+    lock_file_path = desc.lock_file_path()
+
+    # Only rewrite the files that changed, so the unchanged ones keep their
+    # modification time and the tool caches depending on them stay valid
+    written, deleted = sync_tree(staging_dir / "tree", desc.target_dir, manifest)
+    shutil.rmtree(str(staging_dir), ignore_errors=True)
+    log.info(
+        "Synced upstream sources to %s: %d files written, %d files deleted",
+        desc.target_dir,
+        written,
+        deleted,
+    )
 
-            if shortlog:
-                commit_msg_body += "\n\n"
-                commit_msg_body += format_list_to_str(shortlog, width=70)
+    # write lock file (append entry if file already exists). With --manifest,
+    # or if the lock entry already has one, the manifest of the imported files
+    # is stored with the upstream revision, so util/check-vendor.py can check
+    # the vendored tree against it. The files git ignores are left out, as
+    # they are not committed.
+    ignored = get_git_ignored(desc.target_dir, manifest)
+    manifest = {
+        rel_path: digest
+        for rel_path, digest in manifest.items()
+        if rel_path not in ignored
+    }
+    lock_data = {}
+    if os.path.exists(str(lock_file_path)):
+        with open(str(lock_file_path), "r", encoding="UTF-8") as f:
+            lock_data = hjson.loads(f.read(), use_decimal=True)
+    if desc.use_named_lock_entry or "upstream" not in lock_data:
+        lock_entry = lock_data.get(desc.name, {})
+    else:
+        lock_entry = lock_data
+    store_manifest = args.manifest or "files" in lock_entry
+    manifest_changed = store_manifest and lock_entry.get("files") != manifest
+    if update:
+        vendor_entry = desc.upstream.as_dict()
+        vendor_entry["rev"] = upstream_new_rev
+        lock_entry = {"upstream": vendor_entry}
+    if update or manifest_changed:
+        if store_manifest:
+            lock_entry["files"] = manifest
+        if desc.use_named_lock_entry:
+            lock_data[desc.name] = lock_entry
+        else:
+            lock_data = lock_entry
+        with open(str(lock_file_path), "w", encoding="UTF-8") as f:
+            f.write(LOCK_FILE_HEADER)
+            hjson.dump(lock_data, f)
+            f.write("\n")
+            log.info("Wrote lock file %s", str(lock_file_path))
+
+    # Commit changes
+    if args.commit:
+        repo_info = github_parse_url(desc.upstream.url)
+        if repo_info is not None:
+            sha_short = "%s/%s@%s" % (repo_info[0], repo_info[1], sha_short)
+
+        commit_msg_subject = "Update %s to %s" % (desc.name, sha_short)
+        intro = "Update code from {}upstream repository {} to revision {}".format(
+            (
+                ""
+                if desc.upstream.only_subdir is None
+                else "subdir {} in ".format(desc.upstream.only_subdir)
+            ),
+            desc.upstream.url,
+            upstream_new_rev,
+        )
+        commit_msg_body = textwrap.fill(intro, width=70)
+
+        if shortlog:
+            commit_msg_body += "\n\n"
+            commit_msg_body += format_list_to_str(shortlog, width=70)
 
-            commit_msg = commit_msg_subject + "\n\n" + commit_msg_body
+        commit_msg = commit_msg_subject + "\n\n" + commit_msg_body
 
-            commit_paths = []
-            commit_paths.append(desc.target_dir)
-            if args.refresh_patches:
-                commit_paths.append(desc.patch_dir)
-            commit_paths.append(lock_file_path)
+        commit_paths = []
+        commit_paths.append(desc.target_dir)
+        if args.refresh_patches:
+            commit_paths.append(desc.patch_dir)
+        commit_paths.append(lock_file_path)
 
-            git_add_commit(commit_paths, commit_msg)
+        git_add_commit(commit_paths, commit_msg)
 
     log.info("Import of %s finished", desc.name)
 
 
+def process_vendor(desc, args):
+    """Process a single vendor entry: clone, copy, patch, lock, commit."""
+    lock, update, changed_url = load_lock(desc, args.update)
+    prepared = prepare_vendor(desc, lock, update, changed_url, args.refresh_patches)
+    finish_vendor(desc, prepared, update, args)
+
+
+def init_worker(worker_verbose, worker_mirror_cache_dir):
+    """Set up the options and the logging of a worker process of process_vendors()"""
+    global verbose, mirror_cache_dir
+    verbose = worker_verbose
+    mirror_cache_dir = worker_mirror_cache_dir
+    log.basicConfig(
+        format="%(levelname)s: %(message)s",
+        level=log.DEBUG if verbose else log.WARNING,
+    )
+
+
+def process_vendors(descs, args):
+    """Process several vendor entries, preparing up to args.jobs at the same time
+
+    The entries are cloned, copied and patched in worker processes. They are
+    then moved in place, locked and committed one at a time, in the order of
+    descs, so the result does not depend on which one is prepared first.
+    """
+    locks = [load_lock(desc, args.update) for desc in descs]
+    with ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=init_worker,
+        initargs=(verbose, mirror_cache_dir),
+    ) as executor:
+        futures = [
+            executor.submit(
+                prepare_vendor, desc, lock, update, changed_url, args.refresh_patches
+            )
+            for desc, (lock, update, changed_url) in zip(descs, locks)
+        ]
+        try:
+            for desc, (_, update, _), future in zip(descs, locks, futures):
+                finish_vendor(desc, future.result(), update, args)
+        except BaseException:
+            # Drop the entries which are not prepared yet and the staging
+            # directories of the ones which are prepared but not finished
+            for future in futures:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled() and future.exception() is None:
+                    shutil.rmtree(str(future.result()[0]), ignore_errors=True)
+            raise
+
+
 def main(argv):
     parser = argparse.ArgumentParser(prog="vendor", description=__doc__)
     parser.add_argument(
@@ -932,11 +1252,42 @@ def main(argv):
         default=None,
         help="Only process the specified module from the vendor file.",
     )
+    parser.add_argument(
+        "--mirror-cache",
+        metavar="DIR",
+        default=MIRROR_CACHE_DIR,
+        help="Folder of the local mirrors of the upstream repositories "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-mirror-cache",
+        dest="mirror_cache",
+        action="store_const",
+        const=None,
+        help="Clone the upstream repositories directly, without local mirrors",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of vendor entries to clone, copy and patch at the same time",
+    )
+    parser.add_argument(
+        "--manifest",
+        action="store_true",
+        help="Store the hashes of the imported files in the lock entry, so "
+        "util/check-vendor.py can detect local modifications. Entries that "
+        "already have them are always kept up to date",
+    )
     parser.add_argument("--verbose", "-v", action="store_true", help="Verbose")
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
 
-    global verbose
+    global verbose, mirror_cache_dir
     verbose = args.verbose
+    mirror_cache_dir = args.mirror_cache
     if verbose:
         log.basicConfig(format="%(levelname)s: %(message)s", level=log.DEBUG)
     else:
@@ -962,12 +1313,15 @@ def main(argv):
             )
             raise SystemExit(1)
 
-    for desc in descs:
-        try:
-            process_vendor(desc, args)
-        except (JsonError, ValueError) as err:
-            log.fatal(str(err))
-            raise SystemExit(1)
+    try:
+        if args.jobs > 1 and len(descs) > 1:
+            process_vendors(descs, args)
+        else:
+            for desc in descs:
+                process_vendor(desc, args)
+    except (JsonError, ValueError) as err:
+        log.fatal(str(err))
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":